@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Benchmark searching and exporting several accounts: one after another vs fanned out.
+
+Each account is a separate FakeGmailAPI (its own mailbox, latency and quota),
+reached through its own services. Searching or exporting them in parallel
+should take about as long as the slowest account rather than the sum, and an
+account that fails or is throttled should not affect the others' results.
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import query_cache, ratelimit, search_index
+from gmail_extractor.accounts import list_account_messages
+from gmail_extractor.export import export_messages
+from gmail_extractor.query_cache import QueryCache
+
+QUERY = 'newsletter'
+
+
+def run(accounts: int, messages: int, max_results: int, latency: float):
+    apis, urls = {}, {}
+    for index in range(accounts):
+        name = f'account{index}'
+        # The last account is the slowest; mailboxes interleave in time
+        apis[name] = FakeGmailAPI(message_count=messages, latency=latency * (2 if index == accounts - 1 else 1))
+        for message in apis[name].messages:
+            message['internalDate'] = str(int(message['internalDate']) - index * 20_000)
+        urls[name] = apis[name].start()
+    local = threading.local()
+
+    def service(account: str):
+        services = local.__dict__.setdefault('services', {})
+        if account not in services:
+            if account == 'broken':
+                raise ConnectionError("token revoked")
+            services[account] = apis[account].build_service(urls[account])
+            services[account]._http.gmail_account = account
+        return services[account]
+
+    for name in [*apis, 'broken']:
+        ratelimit._account_schedulers[name] = ratelimit.GmailScheduler(units_per_second=1e9)
+
+    def measure(label: str, func):
+        requests = sum(api.requests for api in apis.values())
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<44} {elapsed * 1000:8.0f} ms  {sum(api.requests for api in apis.values()) - requests:5} requests")
+        return result
+
+    work_dir = tempfile.TemporaryDirectory()
+    try:
+        # ttl=0: every search is a real list + metadata fetch; each account's index stays out of private/
+        for name in [*apis, 'broken']:
+            query_cache._account_query_caches[name] = QueryCache(ttl=0, history_id=lambda: '1')
+            search_index._account_indexes[name] = search_index.SearchIndex(
+                Path(work_dir.name) / f'search-{name}.sqlite3', name)
+
+        names = list(apis)
+        print(f"{accounts} accounts, search '{QUERY}' max_results={max_results}, {latency * 1000:.0f} ms latency "
+              f"({latency * 2000:.0f} ms for {names[-1]})")
+        for name in names:
+            measure(f"search {name} alone", lambda: list_account_messages([name], QUERY, max_results, service))
+        measure("search accounts one after another",
+                lambda: [list_account_messages([name], QUERY, max_results, service) for name in names])
+        entries, errors = measure("search fanned out, merged",
+                                  lambda: list_account_messages(names + ['broken'], QUERY, max_results, service))
+        dates = [int(message['internalDate']) for _, _, message in entries]
+        print(f"  {len(entries)} results from {len({account for account, _, _ in entries})} accounts, "
+              f"newest first: {dates == sorted(dates, reverse=True)}, failed accounts: {list(errors)}")
+
+        def factory(account: str):
+            return lambda: service(account)
+
+        export_path = Path(work_dir.name) / 'export.csv'
+        measure(f"export {messages} per account, one after another",
+                lambda: [export_messages(factory(name), export_path, max_results=messages) for name in names])
+        stats = measure("export fanned out, merged",
+                        lambda: export_messages({name: factory(name) for name in names + ['broken']},
+                                                export_path, max_results=messages * accounts))
+        print(f"  {stats['exported']} rows; " + ', '.join(
+            f"{name}: {counts.get('error') or counts['exported']}" for name, counts in stats['accounts'].items()))
+    finally:
+        for api in apis.values():
+            api.stop()
+        work_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-a', '--accounts', type=int, default=4, help='Number of accounts (default: 4)')
+    parser.add_argument('-n', '--messages', type=int, default=500, help='Messages per mailbox (default: 500)')
+    parser.add_argument('-m', '--max-results', type=int, default=20, help='max_results of the search (default: 20)')
+    parser.add_argument('-l', '--latency', type=float, default=0.05,
+                        help='Simulated per-request latency in seconds (default: 0.05)')
+    args = parser.parse_args()
+
+    run(args.accounts, args.messages, args.max_results, args.latency)
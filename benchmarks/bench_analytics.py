@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark mailbox analytics over a large mirrored mailbox.
+
+Compares aggregating mirrored metadata row by row in Python (Counters over
+parsed senders, months and labels) with analyze_mailbox()'s path: pages of
+raw rows streamed into the columnar buffer, then vectorized aggregation.
+The mirror is filled directly, with a few thousand distinct senders, so no
+API traffic is involved; the size of the tool response is reported too.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from email.utils import parseaddr
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import project_message, synthesize_mailbox
+from gmail_extractor.analytics import MetadataColumns, format_analysis, summarize
+from gmail_extractor.sync import MIRROR_HEADERS, MailboxMirror
+
+
+def fill_mirror(mirror: MailboxMirror, count: int, senders: int):
+    mailbox = synthesize_mailbox(count)
+    for start in range(0, count, 10_000):
+        messages = []
+        for index, message in enumerate(mailbox[start:start + 10_000], start):
+            metadata = project_message(message, 'metadata', MIRROR_HEADERS)
+            sender = index * 7919 % senders
+            metadata['payload']['headers'] = [
+                {'name': 'From', 'value': f"Sender {sender} <sender{sender}@domain{sender % 300}.example>"}
+                if header['name'] == 'From' else header for header in metadata['payload']['headers']]
+            messages.append(metadata)
+        mirror.upsert(messages)
+
+
+def row_by_row(mirror: MailboxMirror):
+    senders, months, labels = Counter(), Counter(), Counter()
+    for message in mirror.iter_messages():
+        senders[parseaddr(message['From'] or '')[1].lower()] += 1
+        months[datetime.fromtimestamp(message['Internal Date'] / 1000, timezone.utc).strftime('%Y-%m')] += 1
+        labels.update(message['Labels'])
+    return senders.most_common(10), sorted(months.items()), labels.most_common()
+
+
+def columnar(mirror: MailboxMirror):
+    buffer = MetadataColumns()
+    for rows in mirror.iter_metadata():
+        buffer.extend(rows)
+    return buffer
+
+
+def measure(label: str, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<40} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def run(count: int, senders: int):
+    with tempfile.TemporaryDirectory() as work_dir:
+        mirror = MailboxMirror(Path(work_dir) / 'mirror.sqlite3')
+        measure(f"fill mirror ({count:,} messages)", lambda: fill_mirror(mirror, count, senders))
+
+        measure("row by row (Counters)", lambda: row_by_row(mirror))
+        buffer = measure("columnar: stream rows into buffer", lambda: columnar(mirror))
+        tracemalloc.start()
+        columnar(mirror)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        analysis = measure("columnar: vectorized aggregates", lambda: summarize(buffer, interval='week'))
+        arrays = sum(column.nbytes for column in buffer.columns())
+        print(f"buffer arrays {arrays / 1048576:.1f} MiB, peak while streaming {peak / 1048576:.1f} MiB")
+        print(f"tool response {len(format_analysis(analysis)):,} chars")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--messages', type=int, default=100_000, help='Mailbox size (default: 100000)')
+    parser.add_argument('-s', '--senders', type=int, default=5000, help='Distinct senders (default: 5000)')
+    args = parser.parse_args()
+
+    run(args.messages, args.senders)
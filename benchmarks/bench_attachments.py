@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Benchmark attachment downloads: a serial whole-file loop vs. download_message_attachments.
+
+Peak memory is measured with tracemalloc and includes the in-process fake
+server's response buffers, which are bounded by concurrency as well; what
+matters is that it stays flat as the number of messages grows.
+"""
+
+import argparse
+import base64
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import cache, ratelimit
+from gmail_extractor.attachments import download_message_attachments
+
+
+def serial_download(service, message_ids, output_dir: Path) -> int:
+    """The straightforward approach: one message and one attachment at a time, decoded whole."""
+    saved = 0
+    for message_id in message_ids:
+        message = service.users().messages().get(userId='me', id=message_id, format='full').execute()
+        for part in message['payload'].get('parts', []):
+            attachment_id = part.get('body', {}).get('attachmentId')
+            if not attachment_id:
+                continue
+            data = service.users().messages().attachments().get(
+                userId='me', messageId=message_id, id=attachment_id).execute()['data']
+            (output_dir / f"{message_id}_{part['filename']}").write_bytes(base64.urlsafe_b64decode(data))
+            saved += 1
+    return saved
+
+
+def measure(label: str, func) -> float:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<34} {elapsed:7.2f}s  peak {peak / 2**20:7.1f} MiB  {result}")
+    return elapsed
+
+
+def run(message_counts: list[int], attachment_size: int, variants: int, latency: float, concurrency: int):
+    ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=1e9)
+    cache._cache = cache.MessageCache(db_path=None)
+    for count in message_counts:
+        api = FakeGmailAPI(message_count=count, latency=latency, attachment_every=1,
+                           attachment_size=attachment_size, attachment_variants=variants)
+        base_url = api.start()
+        message_ids = [message['id'] for message in api.messages]
+        print(f"\n{count} messages, one {attachment_size // 1024} KiB attachment each"
+              f"{f', {variants} distinct contents' if variants else ''}")
+        try:
+            with tempfile.TemporaryDirectory() as serial_dir, tempfile.TemporaryDirectory() as output_dir:
+                serial = measure("serial loop", lambda: f"{serial_download(api.build_service(base_url), message_ids, Path(serial_dir))} saved")
+
+                def concurrent():
+                    stats = download_message_attachments(lambda: api.build_service(base_url), message_ids,
+                                                         Path(output_dir), max_concurrency=concurrency)
+                    return f"{stats['downloaded']} saved, {stats['duplicates']} duplicates"
+
+                new = measure(f"download_message_attachments x{concurrency}", concurrent)
+                print(f"{'':<34} {serial / new:7.1f}x faster")
+
+                requests = api.requests
+                measure("re-run (manifest)", concurrent)
+                print(f"{'':<34} {api.requests - requests} requests")
+        finally:
+            api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--messages', type=int, nargs='+', default=[50, 200],
+                        help='Message counts to benchmark (default: 50 200)')
+    parser.add_argument('-s', '--size', type=int, default=1024 * 1024, help='Attachment size in bytes (default: 1 MiB)')
+    parser.add_argument('-v', '--variants', type=int, default=0,
+                        help='Distinct attachment contents, to exercise deduplication (default: all distinct)')
+    parser.add_argument('-l', '--latency', type=float, default=0.02,
+                        help='Simulated per-request latency in seconds (default: 0.02)')
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help='Parallel downloads (default: 8)')
+    args = parser.parse_args()
+
+    run(args.messages, args.size, args.variants, args.latency, args.concurrency)
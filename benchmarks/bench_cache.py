@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Compare uncached, disk-tier and memory-tier message reads through get_message()."""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor.cache import MessageCache, get_message
+
+
+def timed(label: str, func, message_ids: list[str]):
+    start = time.perf_counter()
+    for message_id in message_ids:
+        func(message_id)
+    per_call = (time.perf_counter() - start) / len(message_ids)
+    print(f"{label:<24} {per_call * 1e6:12.1f} us/read")
+
+
+def run(message_count: int, latency: float):
+    api = FakeGmailAPI(message_count=message_count, latency=latency)
+    base_url = api.start()
+    service = api.build_service(base_url)
+    message_ids = [message['id'] for message in api.messages]
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / 'messages.sqlite3'
+            cache = MessageCache(db_path=db_path)
+            timed("network (cold cache)", lambda i: get_message(service, i, cache=cache), message_ids)
+            timed("memory tier", lambda i: get_message(service, i, cache=cache), message_ids)
+
+            # A fresh process only has the disk tier
+            cache = MessageCache(db_path=db_path)
+            timed("disk tier", lambda i: get_message(service, i, cache=cache), message_ids)
+            print(f"\n{cache.stats()}")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--messages', type=int, default=200, help='Messages to read (default: 200)')
+    parser.add_argument('-l', '--latency', type=float, default=0.05,
+                        help='Simulated per-request latency in seconds (default: 0.05)')
+    args = parser.parse_args()
+    run(args.messages, args.latency)
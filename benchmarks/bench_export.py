@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Measure streaming CSV export: time to first row, throughput, bytes downloaded and peak traced memory."""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor.export import SNIPPET_SOURCES, iter_export_rows, write_csv
+
+
+def run(sizes: list[int], latency: float, concurrency: int, snippet_sources: list[str]):
+    api = FakeGmailAPI(message_count=max(sizes), latency=latency)
+    base_url = api.start()
+
+    try:
+        for snippet_source, size in ((source, size) for source in snippet_sources for size in sizes):
+            first_row_at = None
+            bytes_before = api.bytes_sent
+            start = time.perf_counter()
+
+            def timed_rows():
+                nonlocal first_row_at
+                for row in iter_export_rows(lambda: api.build_service(base_url), max_results=size,
+                                            max_concurrency=concurrency, snippet_source=snippet_source):
+                    if first_row_at is None:
+                        first_row_at = time.perf_counter() - start
+                    yield row
+
+            tracemalloc.start()
+            with tempfile.TemporaryDirectory() as tmp:
+                written = write_csv(timed_rows(), Path(tmp) / 'export.csv')
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            elapsed = time.perf_counter() - start
+            downloaded = api.bytes_sent - bytes_before
+            print(f"{snippet_source:<5} {size:>8} msgs  first row {first_row_at or 0:6.2f}s  total {elapsed:7.2f}s"
+                  f"  {written / elapsed:7.1f} rows/s  downloaded {downloaded / 2**20:8.1f} MiB"
+                  f"  peak traced {peak / 2**20:7.1f} MiB")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[100, 1000, 5000],
+                        help='Export sizes to measure (default: 100 1000 5000)')
+    parser.add_argument('-l', '--latency', type=float, default=0.01,
+                        help='Simulated per-request latency in seconds (default: 0.01)')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='Worker pool size (default: 16)')
+    parser.add_argument('-s', '--snippet-source', choices=SNIPPET_SOURCES, nargs='+', default=list(SNIPPET_SOURCES),
+                        help='Snippet sources to compare (default: api body)')
+    args = parser.parse_args()
+    run(args.sizes, args.latency, args.concurrency, args.snippet_source)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Compare export formats: write time, file size and typed load time for a large export."""
+
+import argparse
+import csv
+import gzip
+import json
+import sys
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import synthesize_mailbox
+from gmail_extractor.export import EXPORT_FORMATS, export_fieldnames, message_to_row, write_rows
+
+
+def make_rows(count: int, include_labels: bool, parse_dates: bool) -> list[dict]:
+    templates = [message_to_row(m['id'], m, include_labels=include_labels, parse_dates=parse_dates)
+                 for m in synthesize_mailbox(50)]
+    return [{**templates[i % len(templates)], 'Message ID': f"{0x19a0000000000000 + i:016x}"}
+            for i in range(count)]
+
+
+def load(path: Path, output_format: str) -> int:
+    """Load an export into typed Python/Arrow values the way an analyst would."""
+    if output_format == 'csv':
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            rows = [{**row, 'Date': parsedate_to_datetime(row['Date']), 'Labels': row['Labels'].split(',')}
+                    for row in csv.DictReader(csvfile)]
+        return len(rows)
+    if output_format == 'jsonl.gz':
+        with gzip.open(path, 'rt', encoding='utf-8') as jsonfile:
+            return sum(1 for line in jsonfile if json.loads(line))
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pq.read_table(path) if output_format == 'parquet' else pa.ipc.open_file(path).read_all()
+    return table.num_rows
+
+
+def run(count: int, formats: list[str]):
+    fieldnames = export_fieldnames(include_labels=True)
+    typed_rows = make_rows(count, include_labels=True, parse_dates=True)
+    string_rows = make_rows(count, include_labels=True, parse_dates=False)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for output_format in formats:
+            path = Path(tmp) / f"export{EXPORT_FORMATS[output_format]}"
+            rows = string_rows if output_format == 'csv' else typed_rows
+            start = time.perf_counter()
+            write_rows(iter(rows), path, output_format, fieldnames)
+            written = time.perf_counter() - start
+
+            start = time.perf_counter()
+            loaded = load(path, output_format)
+            loaded_in = time.perf_counter() - start
+            assert loaded == count
+            print(f"{output_format:<9} write {written:6.2f}s  size {path.stat().st_size / 2**20:7.1f} MiB"
+                  f"  load {loaded_in:6.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--rows', type=int, default=200_000, help='Rows to export (default: 200000)')
+    parser.add_argument('-f', '--formats', choices=list(EXPORT_FORMATS), nargs='+', default=list(EXPORT_FORMATS),
+                        help='Formats to compare (default: all)')
+    args = parser.parse_args()
+    run(args.rows, args.formats)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Benchmark serial vs. concurrent full-message fetches against the fake Gmail API."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor.fetch import fetch_messages
+
+
+def run(message_count: int, latency: float, concurrency_levels: list[int]):
+    api = FakeGmailAPI(message_count=message_count, latency=latency)
+    base_url = api.start()
+    message_ids = [message['id'] for message in api.messages]
+
+    try:
+        # Baseline: the original one-at-a-time loop on a single service
+        service = api.build_service(base_url)
+        start = time.perf_counter()
+        for message_id in message_ids:
+            service.users().messages().get(userId='me', id=message_id, format='full').execute()
+        serial = time.perf_counter() - start
+        print(f"serial loop            {serial:8.2f}s  {message_count / serial:8.1f} msg/s")
+
+        for concurrency in concurrency_levels:
+            start = time.perf_counter()
+            fetched = sum(1 for _ in fetch_messages(
+                lambda: api.build_service(base_url), message_ids,
+                max_concurrency=concurrency, format='full'))
+            elapsed = time.perf_counter() - start
+            assert fetched == message_count
+            print(f"fetch_messages x{concurrency:<4}  {elapsed:8.2f}s  {message_count / elapsed:8.1f} msg/s"
+                  f"  speedup {serial / elapsed:5.1f}x")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--messages', type=int, default=1000, help='Mailbox size (default: 1000)')
+    parser.add_argument('-l', '--latency', type=float, default=0.05,
+                        help='Simulated per-request latency in seconds (default: 0.05)')
+    parser.add_argument('-c', '--concurrency', type=int, nargs='+', default=[4, 8, 16, 32],
+                        help='Worker pool sizes to try (default: 4 8 16 32)')
+    args = parser.parse_args()
+    run(args.messages, args.latency, args.concurrency)
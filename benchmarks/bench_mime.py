@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Microbenchmark the shared MIME walker against the recursive body extractors it replaced."""
+
+import argparse
+import base64
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import load_fixtures, synthesize_mailbox
+from gmail_extractor.mime import get_body, get_body_snippet
+
+
+def legacy_get_body(payload):
+    """The recursive extractor previously inlined in get_message_content."""
+    if 'body' in payload and 'data' in payload['body']:
+        return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
+    elif 'parts' in payload:
+        for part in payload['parts']:
+            body = legacy_get_body(part)
+            if body:
+                return body
+    return ""
+
+
+def legacy_get_body_snippet(payload, max_chars=200):
+    """The recursive snippet extractor previously used by the CSV exports."""
+    if 'body' in payload and 'data' in payload['body'] and payload['body']['data']:
+        try:
+            body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
+            return body[:max_chars].replace('\n', ' ').replace('\r', ' ')
+        except Exception:
+            return ""
+    elif 'parts' in payload:
+        for part in payload['parts']:
+            snippet = legacy_get_body_snippet(part, max_chars)
+            if snippet:
+                return snippet
+    return ""
+
+
+def build_payloads(scale: int) -> list[dict]:
+    """One message per fixture, each body repeated `scale` times, with a PDF attachment part."""
+    fixtures = [{'headers': f['headers'], 'body': f['body'] * scale} for f in load_fixtures()]
+    payloads = []
+    for message in synthesize_mailbox(len(fixtures), fixtures):
+        payload = message['payload']
+        payloads.append({
+            'mimeType': 'multipart/mixed',
+            'headers': payload['headers'],
+            'parts': [payload, {'mimeType': 'application/pdf', 'filename': 'statement.pdf',
+                                'body': {'attachmentId': 'ANGjdJ8', 'size': 250_000}}],
+        })
+    return payloads
+
+
+def report(label: str, func, payloads: list[dict], repeat: int) -> float:
+    per_call = min(timeit.repeat(lambda: [func(p) for p in payloads], number=1, repeat=repeat)) / len(payloads)
+    print(f"{label:<28} {per_call * 1e6:10.1f} us/message")
+    return per_call
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-s', '--scale', type=int, default=1,
+                        help='Repeat each fixture body this many times (default: 1)')
+    parser.add_argument('-r', '--repeat', type=int, default=20, help='Timing repetitions (default: 20)')
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.scale)
+    sizes = [sum(len(part['body'].get('data', '')) for part in p['parts'][0]['parts']) for p in payloads]
+    print(f"{len(payloads)} messages, {min(sizes) // 1024}-{max(sizes) // 1024} KB of encoded body each")
+
+    for max_chars in (200, 500):
+        old = report(f"legacy snippet ({max_chars})", lambda p: legacy_get_body_snippet(p, max_chars),
+                     payloads, args.repeat)
+        new = report(f"get_body_snippet ({max_chars})", lambda p: get_body_snippet(p, max_chars),
+                     payloads, args.repeat)
+        print(f"{'':<28} {old / new:10.1f}x faster")
+
+    old = report("legacy full body", legacy_get_body, payloads, args.repeat)
+    new = report("get_body", get_body, payloads, args.repeat)
+    print(f"{'':<28} {old / new:10.1f}x")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark create_csv_from_emails parsing over the results/ samples, scaled up to a large directory."""
+
+import argparse
+import importlib.util
+import os
+import re
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLES_DIR = ROOT / 'results'
+
+spec = importlib.util.spec_from_file_location('create_csv_from_emails', ROOT / 'scripts' / 'create_csv_from_emails.py')
+create_csv = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(create_csv)
+
+
+def legacy_extract_email_info(file_path):
+    """The previous whole-file, six-regex extractor."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    message_id_match = re.search(r'^Message ID: (.+)$', content, re.MULTILINE)
+    from_match = re.search(r'^From: (.+)$', content, re.MULTILINE)
+    to_match = re.search(r'^To: (.+)$', content, re.MULTILINE)
+    subject_match = re.search(r'^Subject: (.+)$', content, re.MULTILINE)
+    date_match = re.search(r'^Date: (.+)$', content, re.MULTILINE)
+    body_match = re.search(r'EMAIL BODY:\n\n(.+?)\n={80}', content, re.DOTALL)
+    body = body_match.group(1).strip() if body_match else ''
+    snippet = body[:200].replace('\n', ' ').replace('\r', ' ') if body else ''
+
+    return {
+        'Message ID': message_id_match.group(1) if message_id_match else 'N/A',
+        'From': from_match.group(1) if from_match else 'N/A',
+        'To': to_match.group(1) if to_match else 'N/A',
+        'Subject': subject_match.group(1) if subject_match else 'N/A',
+        'Date': date_match.group(1) if date_match else 'N/A',
+        'Snippet': snippet
+    }
+
+
+def populate(directory: Path, count: int) -> list[Path]:
+    samples = sorted(SAMPLES_DIR.glob('*.txt'))
+    files = []
+    for index in range(count):
+        target = directory / f"email_{index:06d}.txt"
+        shutil.copyfile(samples[index % len(samples)], target)
+        files.append(target)
+    return files
+
+
+def timed(label: str, func, files: list[Path], baseline: float | None = None) -> float:
+    start = time.perf_counter()
+    func(files)
+    elapsed = time.perf_counter() - start
+    speedup = f"  {baseline / elapsed:5.1f}x" if baseline else ''
+    print(f"{label:<22} {elapsed:7.2f}s  {len(files) / elapsed:9,.0f} files/sec{speedup}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--files', type=int, default=20_000, help='Number of email files (default: 20000)')
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Process pool size (default: CPU count)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = populate(Path(tmp), args.files)
+        total_mb = sum(f.stat().st_size for f in files) / 2**20
+        print(f"{len(files)} files, {total_mb:,.0f} MiB")
+
+        # Same rows as the old extractor
+        for path in files[:len(list(SAMPLES_DIR.glob('*.txt')))]:
+            assert create_csv.extract_email_info(path) == legacy_extract_email_info(path), path
+
+        baseline = timed("legacy regex", lambda fs: [legacy_extract_email_info(f) for f in fs], files)
+        timed("streaming, 1 process", lambda fs: list(create_csv.iter_email_info(fs, workers=1)), files, baseline)
+        timed("streaming, pool", lambda fs: list(create_csv.iter_email_info(fs, workers=args.workers or os.cpu_count())),
+              files, baseline)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Benchmark repeated list/search queries with and without the coalescing query cache.
+
+An agent issuing the same query again (or several times at once) used to
+repeat the list call and every metadata fetch. With the query cache a repeat
+is an in-memory lookup, a repeat after the freshness window costs one
+getProfile call, and concurrent identical calls share one fetch.
+"""
+
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import query_cache, ratelimit, search_index
+from gmail_extractor.query_cache import QueryCache, list_message_metadata
+
+QUERY = 'newsletter'
+
+
+def run(repeats: int, burst: int, max_results: int, latency: float):
+    ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=1e9)
+    api = FakeGmailAPI(message_count=1000, latency=latency)
+    base_url = api.start()
+    local = threading.local()
+
+    def service():
+        if not hasattr(local, 'service'):
+            local.service = api.build_service(base_url)
+        return local.service
+
+    def history_id():
+        return ratelimit.execute(service().users().getProfile(userId='me', fields='historyId'))['historyId']
+
+    def measure(label: str, func, calls: int):
+        requests = api.requests
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<36} {elapsed / calls * 1000:9.3f} ms/call  {(api.requests - requests) / calls:5.1f} requests/call")
+
+    def repeat():
+        for _ in range(repeats):
+            list_message_metadata(service(), QUERY, max_results)
+
+    def concurrent():
+        threads = [threading.Thread(target=lambda: list_message_metadata(service(), QUERY, max_results))
+                   for _ in range(burst)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    print(f"'{QUERY}', max_results={max_results}, {latency * 1000:.0f} ms latency")
+    work_dir = tempfile.TemporaryDirectory()
+    search_index._index = search_index.SearchIndex(Path(work_dir.name) / 'search.sqlite3')
+    try:
+        # ttl=0: every call misses, as without the cache (identical overlapping calls still coalesce)
+        query_cache._query_cache = QueryCache(ttl=0, history_id=history_id)
+        measure("uncached", repeat, repeats)
+        query_cache._query_cache = QueryCache(ttl=0, history_id=history_id)
+        measure(f"{burst} concurrent, coalesced", concurrent, burst)
+
+        query_cache._query_cache = QueryCache(history_id=history_id)
+        list_message_metadata(service(), QUERY, max_results)
+        measure("repeat within freshness window", repeat, repeats)
+        query_cache._query_cache.fresh_seconds = 0
+        measure("repeat, revalidated by historyId", repeat, repeats)
+    finally:
+        api.stop()
+        work_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-r', '--repeats', type=int, default=20, help='Repeated calls per measurement (default: 20)')
+    parser.add_argument('-b', '--burst', type=int, default=8, help='Concurrent identical calls (default: 8)')
+    parser.add_argument('-m', '--max-results', type=int, default=20, help='max_results of the query (default: 20)')
+    parser.add_argument('-l', '--latency', type=float, default=0.02,
+                        help='Simulated per-request latency in seconds (default: 0.02)')
+    args = parser.parse_args()
+
+    run(args.repeats, args.burst, args.max_results, args.latency)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Benchmark concurrent fetches against a quota-enforcing fake Gmail API, with and without the scheduler."""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import ratelimit
+from gmail_extractor.fetch import fetch_messages
+
+
+def fetch_all(api: FakeGmailAPI, base_url: str, concurrency: int) -> tuple[float, int]:
+    message_ids = [message['id'] for message in api.messages]
+    start = time.perf_counter()
+    failed = sum(1 for _, message in fetch_messages(
+        lambda: api.build_service(base_url), message_ids,
+        max_concurrency=concurrency, format='metadata') if isinstance(message, Exception))
+    return time.perf_counter() - start, failed
+
+
+def run(message_count: int, latency: float, quota: int, concurrency: int):
+    api = FakeGmailAPI(message_count=message_count, latency=latency, quota_per_second=quota)
+    base_url = api.start()
+    try:
+        # Baseline: no metering and no retries, as the call sites behaved before
+        ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=10**9, max_retries=0)
+        elapsed, failed = fetch_all(api, base_url, concurrency)
+        print(f"unmanaged    {elapsed:7.2f}s  failed {failed:5d}/{message_count}  "
+              f"429s {api.throttled}")
+
+        for label, units_per_second in (('metered', quota), ('overcommit', quota * 2)):
+            time.sleep(1.0)
+            api.throttled = 0
+            scheduler = ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=units_per_second)
+            elapsed, failed = fetch_all(api, base_url, concurrency)
+            print(f"{label:<12} {elapsed:7.2f}s  failed {failed:5d}/{message_count}  "
+                  f"429s {api.throttled:4d}  retries {scheduler.retries:4d}  "
+                  f"limit {scheduler.limiter.limit:3d}  {message_count / elapsed:6.1f} msg/s "
+                  f"(quota allows {quota / 5:.0f})")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--messages', type=int, default=300, help='Mailbox size (default: 300)')
+    parser.add_argument('-l', '--latency', type=float, default=0.02,
+                        help='Simulated per-request latency in seconds (default: 0.02)')
+    parser.add_argument('-q', '--quota', type=int, default=500,
+                        help='Quota units per second the fake enforces (default: 500)')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='Worker pool size (default: 16)')
+    args = parser.parse_args()
+    run(args.messages, args.latency, args.quota, args.concurrency)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Benchmark the memory held per message by the bulk paths: header dicts vs slotted records.
+
+Messages are decoded from JSON one at a time, as the API client does, so no
+objects are shared between them except through interning. For each
+representation, all N messages are kept alive and the traced memory is
+divided by N:
+
+    response + dicts   the decoded resource plus the {name: value} header dict
+                       and row dict the bulk paths used to build from it
+    MessageRecord      the __slots__ record, senders/recipients/labels interned
+
+A Parquet export of N rows is also traced end to end, buffering record
+batches as lists of row dicts (before) and as column lists (now).
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import project_message, synthesize_mailbox
+from gmail_extractor.export import (EXPORT_HEADERS, RECORD_BATCH_ROWS, arrow_schema, message_to_record,
+                                    parse_message_date, record_to_row, write_columnar)
+from gmail_extractor.records import InternPool
+
+
+def encoded_messages(count: int, senders: int) -> list[str]:
+    """Metadata-format responses as the API sends them, with `senders` distinct senders."""
+    encoded = []
+    for index, message in enumerate(synthesize_mailbox(count)):
+        projected = project_message(message, 'metadata', EXPORT_HEADERS)
+        sender = index * 7919 % senders
+        projected['payload']['headers'] = [
+            {'name': 'From', 'value': f"Sender {sender} <sender{sender}@domain{sender % 300}.example>"}
+            if header['name'] == 'From' else header for header in projected['payload']['headers']]
+        encoded.append(json.dumps(projected))
+    return encoded
+
+
+def dict_row(message: dict) -> tuple:
+    """What the bulk paths held per message before: the resource, its header dict and the row dict."""
+    headers = {h['name']: h['value'] for h in message['payload'].get('headers', [])}
+    row = {
+        'Message ID': message['id'],
+        'From': headers.get('From', 'N/A'),
+        'To': headers.get('To', 'N/A'),
+        'Subject': headers.get('Subject', 'N/A'),
+        'Date': headers.get('Date', 'N/A'),
+        'Snippet': message.get('snippet', '')[:200],
+    }
+    return message, headers, row
+
+
+def footprint(label: str, encoded: list[str], build) -> float:
+    tracemalloc.start()
+    kept = [build(json.loads(text)) for text in encoded]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_message = current / len(kept)
+    print(f"{label:<34} {per_message:8.0f} bytes/message  {current / 1048576:8.1f} MiB for {len(kept):,}")
+    del kept
+    return per_message
+
+
+def write_parquet_row_buffer(rows, output_path: Path, batch_rows: int = RECORD_BATCH_ROWS):
+    """The columnar writer as it was: record batches buffered as lists of row dicts."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    buffer = []
+    with pq.ParquetWriter(str(output_path), schema, compression='zstd') as writer:
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= batch_rows:
+                writer.write_batch(pa.RecordBatch.from_pylist(buffer, schema=schema))
+                buffer = []
+        if buffer:
+            writer.write_batch(pa.RecordBatch.from_pylist(buffer, schema=schema))
+
+
+def export_peak(label: str, encoded: list[str], write, rows):
+    with tempfile.TemporaryDirectory() as work_dir:
+        start = time.perf_counter()
+        tracemalloc.start()
+        write(rows(encoded), Path(work_dir) / 'export.parquet')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<34} peak {peak / 1048576:8.1f} MiB  {time.perf_counter() - start:6.2f} s")
+
+
+def run(count: int, senders: int):
+    encoded = encoded_messages(count, senders)
+    print(f"{count:,} metadata-format messages, {senders:,} distinct senders")
+    before = footprint("response + header/row dicts", encoded, dict_row)
+    footprint("row dict only", encoded, lambda message: dict_row(message)[2])
+    pool = InternPool()
+    after = footprint("MessageRecord (interned)", encoded, lambda message: message_to_record(message, intern=pool))
+    print(f"{before / after:.1f}x smaller per message\n")
+
+    def old_rows(texts):
+        for text in texts:
+            message, headers, row = dict_row(json.loads(text))
+            row['Date'] = parse_message_date(headers.get('Date'), message.get('internalDate'))
+            yield row
+
+    def new_rows(texts):
+        intern = InternPool()
+        for text in texts:
+            yield record_to_row(message_to_record(json.loads(text), intern=intern), parse_dates=True)
+
+    export_peak("Parquet export, row-dict batches", encoded, write_parquet_row_buffer, old_rows)
+    export_peak("Parquet export, records + columns", encoded, write_columnar, new_rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--messages', type=int, default=100_000, help='Messages (default: 100000)')
+    parser.add_argument('-s', '--senders', type=int, default=2000, help='Distinct senders (default: 2000)')
+    args = parser.parse_args()
+
+    run(args.messages, args.senders)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Measure per-call Gmail service setup overhead: rebuild-per-call vs. the shared factory."""
+
+import argparse
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gmail_extractor import service as gmail_service
+
+
+def timed(label: str, func, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    per_call = (time.perf_counter() - start) / iterations
+    print(f"{label:<40} {per_call * 1000:9.3f} ms/call")
+    return per_call
+
+
+def run(iterations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        token_path = Path(tmp) / 'token.pickle'
+        with open(token_path, 'wb') as token:
+            pickle.dump(Credentials(token='benchmark-token'), token)
+        gmail_service.TOKEN_PATH = token_path
+
+        def rebuild_per_call():
+            # What get_gmail_service() used to do on every tool call
+            with open(token_path, 'rb') as token:
+                creds = pickle.load(token)
+            build('gmail', 'v1', credentials=creds)
+
+        before = timed("unpickle + build() per call", rebuild_per_call, iterations)
+        timed("build_gmail_service() (new thread)", gmail_service.build_gmail_service, iterations)
+        after = timed("get_gmail_service() (same thread)", gmail_service.get_gmail_service, iterations * 100)
+        print(f"\nper-call overhead reduced {before / after:,.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-i', '--iterations', type=int, default=50, help='Calls per measurement (default: 50)')
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""Benchmark MCP server cold start: time until `initialize` and `tools/list` are answered.
+
+The server is launched the way an MCP client launches it (a fresh Python
+process speaking JSON-RPC over stdio), so the times include interpreter
+startup and every import. The bare interpreter and the imports the server
+defers to first use are timed too, for reference.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SERVER = ROOT / 'scripts' / 'gmail_mcp_server.py'
+
+# Imported on first use (or by the background warm-up), not at server startup
+DEFERRED_IMPORTS = 'import googleapiclient.discovery, google_auth_oauthlib.flow, google.auth.transport.requests'
+
+INITIALIZE = {
+    'jsonrpc': '2.0', 'id': 1, 'method': 'initialize',
+    'params': {'protocolVersion': '2024-11-05', 'capabilities': {},
+               'clientInfo': {'name': 'bench_startup', 'version': '0'}},
+}
+INITIALIZED = {'jsonrpc': '2.0', 'method': 'notifications/initialized'}
+LIST_TOOLS = {'jsonrpc': '2.0', 'id': 2, 'method': 'tools/list'}
+
+
+def send(process, message: dict):
+    process.stdin.write(json.dumps(message) + '\n')
+    process.stdin.flush()
+
+
+def receive(process, request_id: int) -> dict:
+    """Read stdout until the response to request_id arrives."""
+    while True:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"server exited: {process.stderr.read()[-2000:]}")
+        message = json.loads(line)
+        if message.get('id') == request_id:
+            return message
+
+
+def cold_start() -> tuple[float, float, int]:
+    """Launch the server once; return seconds until initialize and tools/list are answered, and the tool count."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(SERVER)], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, cwd=ROOT)
+    try:
+        send(process, INITIALIZE)
+        receive(process, 1)
+        initialized = time.perf_counter() - start
+        send(process, INITIALIZED)
+        send(process, LIST_TOOLS)
+        tools = receive(process, 2)['result']['tools']
+        return initialized, time.perf_counter() - start, len(tools)
+    finally:
+        process.stdin.close()
+        process.terminate()
+        process.wait()
+
+
+def python_time(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=ROOT)
+    return time.perf_counter() - start
+
+
+def report(label: str, samples: list[float]):
+    print(f"{label:<34} median {statistics.median(samples) * 1000:6.0f} ms   min {min(samples) * 1000:6.0f} ms")
+
+
+def run(runs: int):
+    cold_start()  # populate __pycache__ so every measured run is alike
+    report("python -c pass", [python_time('pass') for _ in range(runs)])
+    report("deferred Google imports", [python_time(DEFERRED_IMPORTS) for _ in range(runs)])
+    results = [cold_start() for _ in range(runs)]
+    report("initialize answered", [initialized for initialized, _, _ in results])
+    report(f"tools/list answered ({results[0][2]} tools)", [listed for _, listed, _ in results])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--runs', type=int, default=10, help='Server launches to time (default: 10)')
+    args = parser.parse_args()
+
+    run(args.runs)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Benchmark reading conversations: one get_message_content call per message vs. one threads.get.
+
+Each thread in the fake mailbox is a reply chain in which every reply quotes
+the conversation below it, so the output size shows what collapsing saves.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import cache, ratelimit, search_index
+from gmail_extractor.mime import read_body
+from gmail_extractor.threads import format_thread, get_thread
+
+
+def per_message(service, message_ids) -> int:
+    """Read a conversation the way the tools did before: every message separately."""
+    chars = 0
+    for message_id in message_ids:
+        message = ratelimit.execute(service.users().messages().get(userId='me', id=message_id, format='full'))
+        chars += len(read_body(message['payload'])[0])
+    return chars
+
+
+def run(threads: int, thread_size: int, latency: float):
+    ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=1e9)
+    api = FakeGmailAPI(message_count=threads * thread_size, latency=latency, thread_size=thread_size)
+    base_url = api.start()
+    service = api.build_service(base_url)
+    conversations = {}
+    for message in api.messages:
+        conversations.setdefault(message['threadId'], []).append(message['id'])
+    print(f"{threads} threads of {thread_size} messages, {latency * 1000:.0f} ms latency")
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            search_index._index = search_index.SearchIndex(Path(work_dir) / 'search.sqlite3')
+            for label, read in (
+                    ('per message', lambda thread_id: per_message(service, conversations[thread_id])),
+                    ('threads.get', lambda thread_id: len(format_thread(get_thread(service, thread_id), False, 0))),
+                    ('threads.get, quotes collapsed', lambda thread_id: len(format_thread(get_thread(service, thread_id), True, 0)))):
+                cache._cache = cache.MessageCache(db_path=None)
+                requests = api.requests
+                start = time.perf_counter()
+                chars = sum(read(thread_id) for thread_id in conversations)
+                elapsed = time.perf_counter() - start
+                print(f"{label:<32} {elapsed:7.2f}s  {api.requests - requests:5d} requests  {chars:9,d} chars")
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-t', '--threads', type=int, default=50, help='Number of threads (default: 50)')
+    parser.add_argument('-s', '--thread-size', type=int, default=8, help='Messages per thread (default: 8)')
+    parser.add_argument('-l', '--latency', type=float, default=0.02,
+                        help='Simulated per-request latency in seconds (default: 0.02)')
+    args = parser.parse_args()
+
+    run(args.threads, args.thread_size, args.latency)
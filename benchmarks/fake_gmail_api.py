@@ -0,0 +1,544 @@
+"""Local HTTP stand-in for the Gmail v1 API used by the benchmarks."""
+import base64
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email import policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import httplib2
+import googleapiclient
+from googleapiclient.discovery import build_from_document
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent / 'results'
+DISCOVERY_PATH = Path(googleapiclient.__file__).parent / 'discovery_cache' / 'documents' / 'gmail.v1.json'
+
+# Quota units charged per resource, mirroring Gmail's per-method costs
+QUOTA_COSTS = {'profile': 1, 'history': 2, 'labels': 1, 'messages': 5, 'threads': 10}
+
+# Label ID -> (name, type); user labels include the spaces and nesting real mailboxes have
+LABELS = {
+    'INBOX': ('INBOX', 'system'),
+    'UNREAD': ('UNREAD', 'system'),
+    'SENT': ('SENT', 'system'),
+    'IMPORTANT': ('IMPORTANT', 'system'),
+    'Label_1': ('payments', 'user'),
+    'Label_2': ('AI Development', 'user'),
+    'Label_3': ('Projects/Gmail MCP', 'user'),
+}
+# Every n-th message carries the user label
+USER_LABEL_EVERY = {'Label_1': 5, 'Label_2': 7, 'Label_3': 11}
+
+# Every synthesized attachment has this ID within its message
+ATTACHMENT_ID = 'ANGjdJ_attachment_0'
+
+HEADER_RE = re.compile(r'^(Message ID|From|To|Subject|Date): (.*)$', re.MULTILINE)
+
+
+def _b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def load_fixtures(fixtures_dir: Path = FIXTURES_DIR) -> list[dict]:
+    """Parse the saved `results/*.txt` emails into header/body fixtures."""
+    fixtures = []
+    for path in sorted(fixtures_dir.glob('*.txt')):
+        content = path.read_text(encoding='utf-8')
+        headers = {name: value for name, value in HEADER_RE.findall(content)}
+        body = content.split('EMAIL BODY:\n\n', 1)[-1].rsplit('\n' + '=' * 80, 1)[0]
+        fixtures.append({'headers': headers, 'body': body})
+    return fixtures
+
+
+def synthetic_message_id(index: int) -> str:
+    """ID of the index-th synthesized message (0 is the newest)."""
+    return f"{0x19a0000000000000 + index:016x}"
+
+
+def _fixture_payload(fixture: dict) -> tuple[dict, str, int]:
+    """Build the (shared, read-only) multipart/alternative payload for one fixture."""
+    body = fixture['body']
+    headers = [
+        {'name': name, 'value': fixture['headers'].get(name, 'N/A')}
+        for name in ('From', 'To', 'Subject', 'Date')
+    ]
+    plain = re.sub(r'<[^>]+>', ' ', body) if body.lstrip().startswith('<') else body
+    payload = {
+        'partId': '',
+        'mimeType': 'multipart/alternative',
+        'headers': headers,
+        'body': {'size': 0},
+        'parts': [
+            {'partId': '0', 'mimeType': 'text/plain', 'filename': '',
+             'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'}],
+             'body': {'size': len(plain), 'data': _b64(plain)}},
+            {'partId': '1', 'mimeType': 'text/html', 'filename': '',
+             'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="UTF-8"'}],
+             'body': {'size': len(body), 'data': _b64(body)}},
+        ],
+    }
+    return payload, ' '.join(plain.split())[:200], len(body) + len(plain)
+
+
+def _with_attachment(payload: dict, attachment_size: int) -> dict:
+    """Wrap a payload in multipart/mixed with one PDF attachment (fetched via attachments.get)."""
+    return {
+        'partId': '',
+        'mimeType': 'multipart/mixed',
+        'headers': payload['headers'],
+        'body': {'size': 0},
+        'parts': [
+            {**payload, 'partId': '0', 'headers': []},
+            {'partId': '1', 'mimeType': 'application/pdf', 'filename': 'statement.pdf',
+             'headers': [{'name': 'Content-Type', 'value': 'application/pdf; name="statement.pdf"'},
+                         {'name': 'Content-Disposition', 'value': 'attachment; filename="statement.pdf"'}],
+             'body': {'size': attachment_size, 'attachmentId': ATTACHMENT_ID}},
+        ],
+    }
+
+
+def _reply_payload(fixture: dict, quoted: str, position: int) -> tuple[dict, str, str]:
+    """Build a text/plain reply that quotes the previous message of its thread, Gmail style."""
+    sender = fixture['headers'].get('From', 'N/A')
+    me = 'Benchmark User <benchmark@example.com>'
+    own = f"Reply {position}: thanks, that works for me. A few notes on the points below."
+    attribution = f"On {fixture['headers'].get('Date', 'Mon, 1 Jan 2024 09:00:00 +0000')}, " \
+                  f"{me if position % 2 == 0 else sender} wrote:"
+    text = own + '\n\n' + attribution + '\n' + '\n'.join('> ' + line if line else '>' for line in quoted.split('\n'))
+    payload = {
+        'partId': '',
+        'mimeType': 'text/plain',
+        'headers': [
+            {'name': 'From', 'value': sender if position % 2 == 0 else me},
+            {'name': 'To', 'value': me if position % 2 == 0 else sender},
+            {'name': 'Subject', 'value': 'Re: ' + fixture['headers'].get('Subject', 'N/A')},
+            {'name': 'Date', 'value': fixture['headers'].get('Date', 'N/A')},
+            {'name': 'Content-Type', 'value': 'text/plain; charset="UTF-8"'},
+        ],
+        'body': {'size': len(text), 'data': _b64(text)},
+    }
+    return payload, own, text
+
+
+def synthesize_mailbox(count: int, fixtures: list[dict] | None = None, attachment_every: int = 0,
+                       attachment_size: int = 64 * 1024, thread_size: int = 1) -> list[dict]:
+    """
+    Build `count` full-format message resources, newest first.
+
+    Payloads are shared between messages made from the same fixture, so even
+    100k-message mailboxes stay small; treat them as read-only.
+
+    Args:
+        count: Number of messages
+        fixtures: Header/body fixtures (default: parsed from results/*.txt)
+        attachment_every: Give every n-th message a PDF attachment (0: none)
+        attachment_size: Size in bytes of each attachment
+        thread_size: Group consecutive messages into threads of this many; every
+            message after a thread's first is a reply quoting the one before it
+    """
+    fixtures = fixtures or load_fixtures()
+    templates = [_fixture_payload(fixture) for fixture in fixtures]
+    with_attachment = [(_with_attachment(payload, attachment_size), snippet, size + attachment_size)
+                       for payload, snippet, size in templates] if attachment_every else []
+    # Reply chains are shared by all threads starting from the same fixture
+    replies: dict[tuple[int, int], tuple[dict, str, int]] = {}
+
+    def reply(template: int, position: int) -> tuple[dict, str, int]:
+        if (template, position) not in replies:
+            fixture = fixtures[template]
+            quoted = reply(template, position - 1)[3] if position > 1 else \
+                (re.sub(r'<[^>]+>', ' ', fixture['body']) if fixture['body'].lstrip().startswith('<')
+                 else fixture['body'])
+            payload, own, text = _reply_payload(fixture, quoted, position)
+            replies[template, position] = (payload, own, len(text), text)
+        return replies[template, position]
+
+    now_ms = int(time.time() * 1000)
+    messages = []
+    thread_size = max(1, thread_size)
+    for index in range(count):
+        message_id = synthetic_message_id(index)
+        # Index 0 is the newest message, so a thread's first message is its highest index
+        first = min(count, index - index % thread_size + thread_size) - 1
+        position = first - index
+        if position:
+            payload, snippet, size = reply(first % len(templates), position)[:3]
+        elif attachment_every and index % attachment_every == 0:
+            payload, snippet, size = with_attachment[index % len(templates)]
+        else:
+            payload, snippet, size = templates[index % len(templates)]
+        label_ids = ['INBOX', 'UNREAD'] if index % 3 == 0 else ['INBOX']
+        label_ids += [label_id for label_id, every in USER_LABEL_EVERY.items() if index % every == 0]
+        messages.append({
+            'id': message_id,
+            'threadId': synthetic_message_id(first),
+            'labelIds': label_ids,
+            'snippet': snippet,
+            'historyId': str(1000 + index),
+            'internalDate': str(now_ms - index * 60_000),
+            'sizeEstimate': size,
+            'payload': payload,
+        })
+    return messages
+
+
+def project_message(message: dict, fmt: str, metadata_headers: list[str]) -> dict:
+    """Return the view of a message the real API sends for `format=fmt`."""
+    if fmt == 'full':
+        return message
+    projected = {key: value for key, value in message.items() if key != 'payload'}
+    if fmt == 'minimal':
+        return projected
+    headers = message['payload']['headers']
+    if metadata_headers:
+        wanted = {name.lower() for name in metadata_headers}
+        headers = [h for h in headers if h['name'].lower() in wanted]
+    projected['payload'] = {'mimeType': message['payload']['mimeType'], 'headers': headers}
+    return projected
+
+
+def _parse_fields(mask: str) -> dict:
+    """Parse a partial-response mask ("a,b/c,d(e,f)") into a nested dict; {} selects everything."""
+    selection: dict = {}
+    stack = [selection]
+    token = ''
+
+    def add(name):
+        node = stack[-1]
+        for key in name.split('/'):
+            node = node.setdefault(key, {})
+        return node
+
+    for char in mask + ',':
+        if char == '(':
+            stack.append(add(token.strip()))
+            token = ''
+        elif char in ',)':
+            if token.strip():
+                add(token.strip())
+            token = ''
+            if char == ')':
+                stack.pop()
+        else:
+            token += char
+    return selection
+
+
+def apply_fields(resource, selection: dict):
+    """Keep only the selected fields of a resource, as the real API does for `fields=`."""
+    if not selection:
+        return resource
+    if isinstance(resource, list):
+        return [apply_fields(item, selection) for item in resource]
+    if not isinstance(resource, dict):
+        return resource
+    return {key: apply_fields(resource[key], sub) for key, sub in selection.items() if key in resource}
+
+
+class FakeGmailAPI:
+    """In-process Gmail API fake with per-request latency, fault injection and counters."""
+
+    def __init__(self, message_count: int = 100, latency: float = 0.0, quota_per_second: int | None = None,
+                 error_rate: float = 0.0, attachment_every: int = 0, attachment_size: int = 64 * 1024,
+                 attachment_variants: int = 0, thread_size: int = 1, seed: int = 0):
+        """
+        Args:
+            message_count: Mailbox size
+            latency: Seconds added to every HTTP request
+            quota_per_second: Quota units per second before calls get 429 rateLimitExceeded (None: unlimited)
+            error_rate: Fraction of calls (including batch sub-requests) failing with 503 backendError
+            attachment_every: Give every n-th message a PDF attachment (0: none)
+            attachment_size: Size in bytes of each attachment
+            attachment_variants: Number of distinct attachment contents, repeated across
+                messages (0: every attachment is different)
+            thread_size: Messages per conversation thread; replies quote earlier messages
+            seed: Seed for the error injection
+        """
+        self.messages = synthesize_mailbox(message_count, attachment_every=attachment_every,
+                                           attachment_size=attachment_size, thread_size=thread_size)
+        self.by_id = {message['id']: message for message in self.messages}
+        self.latency = latency
+        self.quota_per_second = quota_per_second
+        self.error_rate = error_rate
+        self.attachment_size = attachment_size
+        self.attachment_variants = attachment_variants
+        self._random = random.Random(seed)
+        self.throttled = 0
+        self.errors = 0
+        self._quota_window = 0
+        self._quota_used = 0
+        self.lock = threading.Lock()
+        self.history_id = 1000 + message_count
+        self.history: list[dict] = []
+        self.history_floor = self.history_id
+        self.requests = 0
+        self.bytes_sent = 0
+        self._server = None
+        self._thread = None
+
+    # --- mailbox mutations (recorded in history) ----------------------------
+
+    def _record(self, kind: str, message: dict, **extra):
+        self.history_id += 1
+        message['historyId'] = str(self.history_id)
+        entry = {'message': {'id': message['id'], 'threadId': message['threadId'],
+                             'labelIds': list(message['labelIds'])}, **extra}
+        self.history.append({'id': str(self.history_id), kind: [entry]})
+
+    def add_message(self) -> dict:
+        """Deliver a new message (a copy of a fixture) at the top of the mailbox."""
+        with self.lock:
+            template = self.messages[len(self.by_id) % len(self.messages)] if self.messages else \
+                synthesize_mailbox(1)[0]
+            message = {**template, 'id': f"{0x19b0000000000000 + self.history_id:016x}",
+                       'labelIds': ['INBOX', 'UNREAD'], 'internalDate': str(int(time.time() * 1000))}
+            message['threadId'] = message['id']
+            self.messages.insert(0, message)
+            self.by_id[message['id']] = message
+            self._record('messagesAdded', message)
+            return message
+
+    def delete_message(self, message_id: str):
+        with self.lock:
+            message = self.by_id.pop(message_id)
+            self.messages.remove(message)
+            self._record('messagesDeleted', message)
+
+    def modify_labels(self, message_id: str, add: list[str] = (), remove: list[str] = ()):
+        with self.lock:
+            message = self.by_id[message_id]
+            message['labelIds'] = [label for label in message['labelIds'] if label not in remove]
+            message['labelIds'] += [label for label in add if label not in message['labelIds']]
+            if add:
+                self._record('labelsAdded', message, labelIds=list(add))
+            if remove:
+                self._record('labelsRemoved', message, labelIds=list(remove))
+
+    def expire_history(self):
+        """Forget all history records, as Gmail does after about a week."""
+        with self.lock:
+            self.history.clear()
+            self.history_floor = self.history_id
+
+    # --- request dispatch -------------------------------------------------
+
+    def _charge(self, parts: list[str]) -> bool:
+        """Charge a call against the per-second quota; False if it must be throttled."""
+        if self.quota_per_second is None:
+            return True
+        units = QUOTA_COSTS.get(parts[4], 5)
+        with self.lock:
+            window = int(time.monotonic())
+            if window != self._quota_window:
+                self._quota_window, self._quota_used = window, 0
+            if self._quota_used + units > self.quota_per_second:
+                self.throttled += 1
+                return False
+            self._quota_used += units
+            return True
+
+    def dispatch(self, method: str, path: str, query: dict[str, list[str]]) -> tuple[int, dict]:
+        """Route one (non-batch) API call and return (status, json_body)."""
+        parts = path.strip('/').split('/')
+        if parts[:3] != ['gmail', 'v1', 'users'] or len(parts) < 5:
+            return 404, {'error': {'code': 404, 'message': f'Unknown path {path}'}}
+        if not self._charge(parts):
+            return 429, {'error': {'code': 429, 'message': 'Rate limit exceeded',
+                                   'errors': [{'reason': 'rateLimitExceeded'}]}}
+        if self.error_rate and self._random.random() < self.error_rate:
+            with self.lock:
+                self.errors += 1
+            return 503, {'error': {'code': 503, 'message': 'Backend Error',
+                                   'errors': [{'reason': 'backendError'}]}}
+        if parts[4] == 'profile':
+            return 200, {'emailAddress': 'benchmark@example.com', 'messagesTotal': len(self.messages),
+                         'threadsTotal': len(self.messages), 'historyId': str(self.history_id)}
+        if parts[4] == 'history':
+            return self._history(query)
+        # gmail/v1/users/{userId}/labels[/{id}]
+        if parts[4] == 'labels':
+            return self._labels(parts[5] if len(parts) == 6 else None)
+        # gmail/v1/users/{userId}/threads/{id}
+        if parts[4] == 'threads' and len(parts) == 6:
+            return self._get_thread(parts[5], query)
+        # gmail/v1/users/{userId}/messages[/{id}]
+        if parts[4] != 'messages':
+            return 404, {'error': {'code': 404, 'message': f'Unknown path {path}'}}
+        if len(parts) == 5:
+            return 200, self._list(query)
+        message = self.by_id.get(parts[5])
+        if message is None:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        # gmail/v1/users/{userId}/messages/{id}/attachments/{attachmentId}
+        if len(parts) == 8 and parts[6] == 'attachments':
+            return self._attachment(message, parts[7])
+        fmt = query.get('format', ['full'])[0]
+        projected = project_message(message, fmt, query.get('metadataHeaders', []))
+        if 'fields' in query:
+            projected = apply_fields(projected, _parse_fields(query['fields'][0]))
+        return 200, projected
+
+    def _get_thread(self, thread_id: str, query: dict[str, list[str]]) -> tuple[int, dict]:
+        # Oldest message first, as the real API returns them
+        messages = [m for m in reversed(self.messages) if m['threadId'] == thread_id]
+        if not messages:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        fmt = query.get('format', ['full'])[0]
+        thread = {
+            'id': thread_id,
+            'historyId': max(m['historyId'] for m in messages),
+            'messages': [project_message(m, fmt, query.get('metadataHeaders', [])) for m in messages],
+        }
+        if 'fields' in query:
+            thread = apply_fields(thread, _parse_fields(query['fields'][0]))
+        return 200, thread
+
+    def _attachment(self, message: dict, attachment_id: str) -> tuple[int, dict]:
+        if message['payload']['mimeType'] != 'multipart/mixed' or attachment_id != ATTACHMENT_ID:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        # Deterministic content, generated on demand so large mailboxes cost no memory
+        if self.attachment_variants:
+            seed = f"variant-{int(message['id'], 16) % self.attachment_variants:08d}".encode('ascii')
+        else:
+            seed = message['id'].encode('ascii')
+        data = (seed * (self.attachment_size // len(seed) + 1))[:self.attachment_size]
+        return 200, {'size': len(data), 'data': base64.urlsafe_b64encode(data).decode('ascii')}
+
+    def _labels(self, label_id: str | None) -> tuple[int, dict]:
+        if label_id is None:
+            return 200, {'labels': [{'id': label_id, 'name': name, 'type': kind}
+                                    for label_id, (name, kind) in LABELS.items()]}
+        if label_id not in LABELS:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        name, kind = LABELS[label_id]
+        with self.lock:
+            labelled = [m for m in self.messages if label_id in m['labelIds']]
+        unread = [m for m in labelled if 'UNREAD' in m['labelIds']]
+        return 200, {'id': label_id, 'name': name, 'type': kind,
+                     'messagesTotal': len(labelled), 'messagesUnread': len(unread),
+                     'threadsTotal': len({m['threadId'] for m in labelled}),
+                     'threadsUnread': len({m['threadId'] for m in unread})}
+
+    def _list(self, query: dict[str, list[str]]) -> dict:
+        max_results = min(int(query.get('maxResults', ['100'])[0]), 500)
+        start = int(query.get('pageToken', ['0'])[0])
+        messages = self.messages
+        for label_id in query.get('labelIds', []):
+            messages = [m for m in messages if label_id in m['labelIds']]
+        # The only search operator the fake understands
+        if 'has:attachment' in query.get('q', [''])[0]:
+            messages = [m for m in messages if m['payload']['mimeType'] == 'multipart/mixed']
+        page = messages[start:start + max_results]
+        response = {
+            'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page],
+            'resultSizeEstimate': len(messages),
+        }
+        if start + max_results < len(messages):
+            response['nextPageToken'] = str(start + max_results)
+        return response
+
+    def _history(self, query: dict[str, list[str]]) -> tuple[int, dict]:
+        start = int(query['startHistoryId'][0])
+        if start < self.history_floor:
+            return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+        record_keys = {'messageAdded': 'messagesAdded', 'messageDeleted': 'messagesDeleted',
+                       'labelAdded': 'labelsAdded', 'labelRemoved': 'labelsRemoved'}
+        types = {record_keys[kind] for kind in query.get('historyTypes', [])} or None
+        records = []
+        for record in self.history:
+            if int(record['id']) <= start:
+                continue
+            if types is None or types & record.keys():
+                records.append(record)
+        max_results = int(query.get('maxResults', ['100'])[0])
+        offset = int(query.get('pageToken', ['0'])[0])
+        response = {'history': records[offset:offset + max_results], 'historyId': str(self.history_id)}
+        if offset + max_results < len(records):
+            response['nextPageToken'] = str(offset + max_results)
+        if not response['history']:
+            del response['history']
+        return 200, response
+
+    def dispatch_batch(self, content_type: str, body: bytes) -> tuple[str, bytes]:
+        """Answer a multipart/mixed batch request the way the real endpoint does."""
+        envelope = BytesParser(policy=policy.HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        boundary = 'batch_fake_boundary'
+        chunks = []
+        for part in envelope.iter_parts():
+            request_line = part.get_payload(decode=True).decode('utf-8').split('\n', 1)[0]
+            method, target, _ = request_line.split(' ', 2)
+            parsed = urlparse(target)
+            status, payload = self.dispatch(method, parsed.path, parse_qs(parsed.query))
+            data = json.dumps(payload)
+            content_id = part['Content-ID'].strip('<>')
+            chunks.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n\r\n{data}\r\n"
+            )
+        chunks.append(f"--{boundary}--\r\n")
+        return f'multipart/mixed; boundary={boundary}', ''.join(chunks).encode('utf-8')
+
+    # --- server lifecycle -------------------------------------------------
+
+    def start(self) -> str:
+        """Serve on an ephemeral localhost port and return the base URL."""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, content_type: str, data: bytes):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with api.lock:
+                    api.requests += 1
+                    api.bytes_sent += len(data)
+
+            def do_GET(self):
+                if api.latency:
+                    time.sleep(api.latency)
+                parsed = urlparse(self.path)
+                status, payload = api.dispatch('GET', parsed.path, parse_qs(parsed.query))
+                self._send(status, 'application/json; charset=UTF-8', json.dumps(payload).encode('utf-8'))
+
+            def do_POST(self):
+                if api.latency:
+                    time.sleep(api.latency)
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlparse(self.path).path != '/batch':
+                    self._send(404, 'application/json', b'{}')
+                    return
+                content_type, data = api.dispatch_batch(self.headers['Content-Type'], body)
+                self._send(200, content_type, data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def build_service(self, base_url: str):
+        """Build a googleapiclient Gmail service that talks to this fake."""
+        document = json.loads(DISCOVERY_PATH.read_text(encoding='utf-8'))
+        document['rootUrl'] = base_url
+        document['mtlsRootUrl'] = base_url
+        return build_from_document(document, http=httplib2.Http())
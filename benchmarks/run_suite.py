@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Benchmark suite: every ADK and MCP tool against the fake Gmail API at several mailbox sizes.
+
+Each scenario runs in a fresh Python process pointed at a local FakeGmailAPI,
+so its peak RSS is its own. Wall time is measured inside that process;
+request and byte counts come from the fake server. Results are written as
+JSON and can be compared against an earlier run with --compare.
+
+    python benchmarks/run_suite.py --sizes 10 1000 100000
+    python benchmarks/run_suite.py --sizes 10 1000 --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import pickle
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from benchmarks.fake_gmail_api import FakeGmailAPI, synthetic_message_id
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+DEFAULT_SIZES = [10, 1000, 100_000]
+
+# Messages opened one by one in the get_message_content / get_gmail_message scenarios
+SAMPLE_MESSAGES = 10
+
+# Gmail caps messages.list at 500 per page
+LIST_PAGE = 500
+
+
+def sample_ids(size: int) -> list[str]:
+    """Message IDs spread across the mailbox."""
+    count = min(size, SAMPLE_MESSAGES)
+    return [synthetic_message_id(i * size // count) for i in range(count)]
+
+
+# --- scenarios (run in the child process) -----------------------------------
+
+def adk_scenarios(ctx: dict) -> dict:
+    from gmail_extractor import gmail_tools
+
+    size, work_dir = ctx['size'], ctx['work_dir']
+    return {
+        'list_messages': lambda: gmail_tools.list_messages(max_results=min(size, LIST_PAGE)),
+        'list_labels': lambda: gmail_tools.list_labels(),
+        'get_message_content': lambda: '\n'.join(
+            gmail_tools.get_message_content(message_id) for message_id in sample_ids(size)),
+        'export_to_csv': lambda: gmail_tools.export_to_csv(
+            max_results=size, output_filename=str(work_dir / 'adk_export.csv')),
+        'search_messages': lambda: gmail_tools.search_messages('newsletter', max_results=20),
+        'analyze_gmail': lambda: gmail_tools.analyze_gmail(max_results=size),
+    }
+
+
+def load_mcp_server():
+    spec = importlib.util.spec_from_file_location('gmail_mcp_server', ROOT / 'scripts' / 'gmail_mcp_server.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def mcp_arguments(ctx: dict) -> dict:
+    """Arguments each MCP tool is benchmarked with; tools missing here are reported as skipped."""
+    size, work_dir = ctx['size'], ctx['work_dir']
+    return {
+        'list_gmail_messages': [{'max_results': min(size, LIST_PAGE)}],
+        'list_gmail_labels': [{'include_system': True}],
+        'get_gmail_message': [{'message_id': message_id} for message_id in sample_ids(size)],
+        # Thread IDs equal message IDs in the suite's mailbox, whose threads hold one message each
+        'get_gmail_thread': [{'thread_id': thread_id} for thread_id in sample_ids(size)],
+        'search_gmail': [{'query': 'newsletter', 'max_results': 20, 'mode': 'remote'}],
+        'analyze_gmail': [{'max_results': size}],
+        'export_gmail_to_csv': [{'max_results': size, 'output_filename': str(work_dir / 'mcp_export.csv')}],
+        'download_gmail_attachments': [{'max_results': min(size, 1000), 'output_dir': str(work_dir / 'attachments')}],
+        'gmail_server_stats': [{'format': 'text'}, {'format': 'prometheus'}],
+    }
+
+
+def mcp_tool_names() -> list[str]:
+    server = load_mcp_server()
+    return [tool.name for tool in asyncio.run(server.handle_list_tools())]
+
+
+def run_child(args) -> dict:
+    """Configure the package for the fake server, run one scenario and measure it."""
+    from google.oauth2.credentials import Credentials
+
+    from gmail_extractor import cache, ratelimit, search_index, service
+
+    work_dir = Path(args.work_dir)
+    token_path = work_dir / 'token.pickle'
+    with open(token_path, 'wb') as token:
+        pickle.dump(Credentials(token='benchmark-token'), token)
+    service.TOKEN_PATH = token_path
+    document = json.loads(json.dumps(service.get_discovery_document()))
+    document['rootUrl'] = document['mtlsRootUrl'] = args.base_url
+    service._discovery_document = document
+
+    # Keep caches out of private/; the search index persists across one size's scenarios
+    search_index._index = search_index.SearchIndex(work_dir / 'search.sqlite3')
+    cache._cache = cache.MessageCache(db_path=None)
+    ratelimit._scheduler = ratelimit.GmailScheduler(units_per_second=args.client_quota)
+
+    ctx = {'size': args.size, 'work_dir': work_dir}
+    family, _, name = args.child.partition(':')
+    if family == 'adk':
+        scenario = adk_scenarios(ctx)[name]
+    else:
+        server = load_mcp_server()
+        calls = mcp_arguments(ctx)[name]
+
+        def scenario():
+            texts = []
+            for arguments in calls:
+                contents = asyncio.run(server.handle_call_tool(name, arguments))
+                texts.extend(content.text for content in contents)
+            return '\n'.join(texts)
+
+    start = time.perf_counter()
+    output = scenario()
+    wall_time = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+    return {
+        'wall_time': wall_time,
+        'peak_rss': peak_rss,
+        'ok': not output.lstrip().startswith('Error'),
+        'output_chars': len(output),
+        'retries': ratelimit.get_scheduler().retries,
+    }
+
+
+# --- orchestration (parent process) -----------------------------------------
+
+def scenario_names(only: list[str] | None) -> list[str]:
+    names = [f'adk:{name}' for name in adk_scenarios({'size': 1, 'work_dir': Path('.')})]
+    names += [f'mcp:{name}' for name in mcp_tool_names()]
+    if only:
+        names = [name for name in names if any(part in name for part in only)]
+    return names
+
+
+def run_suite(args) -> list[dict]:
+    results = []
+    for size in args.sizes:
+        api = FakeGmailAPI(message_count=size, latency=args.latency, quota_per_second=args.server_quota,
+                           error_rate=args.error_rate, attachment_every=4)
+        base_url = api.start()
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                for scenario in scenario_names(args.only):
+                    family, _, name = scenario.partition(':')
+                    if family == 'mcp' and name not in mcp_arguments({'size': size, 'work_dir': Path(work_dir)}):
+                        results.append({'scenario': scenario, 'size': size, 'skipped': 'no benchmark arguments'})
+                        continue
+
+                    before = (api.requests, api.bytes_sent, api.throttled, api.errors)
+                    proc = subprocess.run(
+                        [sys.executable, __file__, '--child', scenario, '--size', str(size),
+                         '--base-url', base_url, '--work-dir', work_dir,
+                         '--client-quota', str(args.client_quota)],
+                        capture_output=True, text=True, cwd=ROOT
+                    )
+                    if proc.returncode != 0:
+                        result = {'ok': False, 'error': proc.stderr.strip().splitlines()[-1:]}
+                    else:
+                        result = json.loads(proc.stdout.strip().splitlines()[-1])
+                    result.update({
+                        'scenario': scenario,
+                        'size': size,
+                        'requests': api.requests - before[0],
+                        'bytes': api.bytes_sent - before[1],
+                        'throttled': api.throttled - before[2],
+                        'injected_errors': api.errors - before[3],
+                    })
+                    results.append(result)
+                    print_result(result)
+        finally:
+            api.stop()
+    return results
+
+
+def print_result(result: dict, baseline: dict | None = None):
+    if 'skipped' in result:
+        print(f"{result['scenario']:<28} {result['size']:>7}  skipped: {result['skipped']}")
+        return
+    if 'wall_time' not in result:
+        print(f"{result['scenario']:<28} {result['size']:>7}  FAILED {result.get('error')}")
+        return
+    line = (f"{result['scenario']:<28} {result['size']:>7}  {result['wall_time']:8.2f}s"
+            f"  {result['requests']:>7} req  {result['bytes'] / 2**20:8.1f} MiB"
+            f"  rss {result['peak_rss'] / 2**20:6.0f} MiB{'' if result['ok'] else '  ERROR'}")
+    if baseline and 'wall_time' in baseline:
+        deltas = []
+        for key in ('wall_time', 'requests', 'bytes', 'peak_rss'):
+            if baseline[key]:
+                deltas.append(f"{key} {100 * (result[key] - baseline[key]) / baseline[key]:+.0f}%")
+        line += '  [' + ', '.join(deltas) + ']'
+    print(line)
+
+
+def compare(results: list[dict], baseline_path: Path):
+    baseline = {(r['scenario'], r['size']): r for r in json.loads(baseline_path.read_text())['results']}
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        print_result(result, baseline.get((result['scenario'], result['size'])))
+
+
+def git_revision() -> str:
+    proc = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=ROOT)
+    return proc.stdout.strip() or 'unknown'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Mailbox sizes (default: 10 1000 100000)')
+    parser.add_argument('-l', '--latency', type=float, default=0.01,
+                        help='Simulated per-request latency in seconds (default: 0.01)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of calls failing with 503 (default: 0)')
+    parser.add_argument('--server-quota', type=int, default=None,
+                        help="Quota units/s the fake enforces with 429s (default: unlimited; Gmail's is 250)")
+    parser.add_argument('--client-quota', type=float, default=None,
+                        help='Quota units/s the client scheduler meters (default: --server-quota, else unlimited)')
+    parser.add_argument('-k', '--only', nargs='+', help='Run only scenarios whose name contains one of these')
+    parser.add_argument('-o', '--output', type=Path, help='Results JSON (default: benchmarks/results/suite-TIMESTAMP.json)')
+    parser.add_argument('--compare', type=Path, help='Earlier results JSON to compare against')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client_quota is None:
+        args.client_quota = args.server_quota or 1e9
+
+    if args.child:
+        print(json.dumps(run_child(args)))
+        sys.exit(0)
+
+    started = datetime.now()
+    results = run_suite(args)
+    report = {
+        'meta': {
+            'started': started.isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'server_quota': args.server_quota,
+            'client_quota': args.client_quota,
+        },
+        'results': results,
+    }
+    output = args.output or RESULTS_DIR / f"suite-{started.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
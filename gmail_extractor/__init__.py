@@ -1 +1,9 @@
-from . import agent
+import importlib
+
+
+def __getattr__(name):
+    # The ADK agent (and google.adk behind it) is imported on first access rather
+    # than with the package, so the MCP server and scripts don't pay for it
+    if name == 'agent':
+        return importlib.import_module(f'{__name__}.agent')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,172 @@
+"""Fan-out of list and search calls across several Gmail accounts.
+
+Each account is queried from its own thread through its own services, and so
+with its own connections, quota scheduler and caches (see service.py), which
+makes N accounts take about as long as the slowest one. An account failing
+or being throttled leaves the other accounts' results intact. Gmail lists
+messages newest first, so the per-account results are combined with a k-way
+heap merge on internalDate rather than a full sort.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Callable, Iterable, Iterator
+
+from .query_cache import list_message_metadata
+from .search_index import search_local
+from .service import DEFAULT_ACCOUNT, get_gmail_service, list_accounts
+
+# Accounts argument selecting every account with a saved token
+ALL_ACCOUNTS = 'all'
+# Accounts queried at the same time
+MAX_PARALLEL_ACCOUNTS = 16
+
+_account_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_ACCOUNTS, thread_name_prefix='gmail-account')
+
+
+def resolve_accounts(accounts: str | list[str] = "") -> list[str]:
+    """
+    Turn a tool's accounts argument into account names.
+
+    Args:
+        accounts: "" for the default account, "all" for every account with a
+            saved token, or comma-separated account names (or a list of them)
+
+    Raises:
+        ValueError: A named account has no saved token
+    """
+    names = accounts.split(',') if isinstance(accounts, str) else accounts
+    names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+    if not names:
+        return [DEFAULT_ACCOUNT]
+    known = list_accounts()
+    if ALL_ACCOUNTS in names:
+        return known
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown Gmail account(s): {', '.join(unknown)} (known: {', '.join(known)})")
+    return names
+
+
+def fan_out(accounts: list[str], func: Callable[[str], Any]) -> dict[str, Any]:
+    """
+    Run func(account) for every account in parallel.
+
+    Returns:
+        Account name -> func's result, or the exception it raised
+    """
+    if len(accounts) == 1:
+        try:
+            return {accounts[0]: func(accounts[0])}
+        except Exception as e:
+            return {accounts[0]: e}
+
+    futures = {account: _account_executor.submit(func, account) for account in accounts}
+    results = {}
+    for account, future in futures.items():
+        try:
+            results[account] = future.result()
+        except Exception as e:
+            results[account] = e
+    return results
+
+
+def _dated(account: str, fetched: Iterable[tuple[str, dict | Exception]]) -> Iterator[tuple]:
+    """Tag list results with their account and internalDate; failed fetches keep their place in the list."""
+    date = float('inf')
+    for message_id, message in fetched:
+        if not isinstance(message, Exception):
+            date = int(message.get('internalDate', 0))
+        yield date, account, message_id, message
+
+
+def list_account_messages(accounts: list[str], query: str, max_results: int,
+                          service_factory: Callable[[str], Any] = get_gmail_service
+                          ) -> tuple[list[tuple[str, str, dict | Exception]], dict[str, Exception]]:
+    """
+    List the newest messages matching a query across accounts.
+
+    Every account lists (through its query cache) up to max_results messages
+    in parallel; the lists are merged newest first and cut to max_results.
+
+    Args:
+        accounts: Account names
+        query: Gmail search query
+        max_results: Maximum number of messages to return in total
+        service_factory: Returns the calling thread's service for an account
+
+    Returns:
+        (account, message ID, metadata resource or the exception its fetch raised)
+        triples newest first, and the exception of each account that failed as a whole
+    """
+    results = fan_out(accounts, lambda account: list_message_metadata(service_factory(account), query, max_results))
+    errors = {account: result for account, result in results.items() if isinstance(result, Exception)}
+    merged = heapq.merge(*(_dated(account, fetched) for account, fetched in results.items()
+                           if account not in errors), key=itemgetter(0), reverse=True)
+    return [entry[1:] for entry in islice(merged, max_results)], errors
+
+
+def list_messages_text(max_results: int, query: str = "", accounts: str | list[str] = "") -> str:
+    """
+    List the messages matching a query for a tool response, given a tool's accounts argument.
+
+    Repeated and concurrent identical queries are served from each account's
+    query cache; failures are reported in the text rather than raised.
+    """
+    try:
+        names = resolve_accounts(accounts)
+        entries, errors = list_account_messages(names, query, max_results)
+        if len(names) == 1 and errors:
+            raise errors[names[0]]
+        return format_account_messages(entries, errors, show_accounts=len(names) > 1)
+    except Exception as e:
+        return f"Error listing messages: {str(e)}"
+
+
+def search_account_index(accounts: str | list[str], query: str, max_results: int) -> str:
+    """
+    Search one account's local index, given a tool's accounts argument (see resolve_accounts).
+
+    Each account's index only holds messages fetched from its own mailbox, so
+    a local search covers a single account.
+    """
+    try:
+        names = resolve_accounts(accounts)
+    except ValueError as e:
+        return f"Error searching local index: {str(e)}"
+    if len(names) > 1:
+        return "Error searching local index: local search covers one account at a time"
+    return search_local(query, max_results, None if names[0] == DEFAULT_ACCOUNT else names[0])
+
+
+def format_account_errors(errors: dict[str, Any]) -> list[str]:
+    """Describe per-account failures, one line each."""
+    return [f"Error from account '{account}': {str(error)}" for account, error in errors.items()]
+
+
+def format_account_messages(entries: list[tuple[str, str, dict | Exception]], errors: dict[str, Exception],
+                            show_accounts: bool = False) -> str:
+    """Describe list_account_messages() results for a tool response."""
+    if not entries and not errors:
+        return "No messages found."
+
+    output = []
+    for account, message_id, message in entries:
+        output.append(f"ID: {message_id}")
+        if show_accounts:
+            output.append(f"Account: {account}")
+        if isinstance(message, Exception):
+            output.append(f"Error: {str(message)}")
+            output.append("-" * 80)
+            continue
+
+        headers = {h['name']: h['value'] for h in message['payload']['headers']}
+        output.append(f"From: {headers.get('From', 'N/A')}")
+        output.append(f"Subject: {headers.get('Subject', 'N/A')}")
+        output.append(f"Date: {headers.get('Date', 'N/A')}")
+        output.append("-" * 80)
+    if not entries:
+        output.append("No messages found.")
+    output.extend(format_account_errors(errors))
+    return "\n".join(output)
@@ -1,16 +1,22 @@
 from google.adk.agents.llm_agent import Agent
-from .gmail_tools import list_messages, get_message_content, search_messages, export_to_csv
+from .gmail_tools import (list_messages, get_message_content, get_gmail_thread, search_messages, export_to_csv,
+                          download_attachments, gmail_server_stats, list_labels, analyze_gmail)
 
 root_agent = Agent(
     model='gemini-2.5-flash',
     name='gmail_extractor',
-    description='A Gmail extraction assistant that can list, search, retrieve, and export email messages to CSV.',
+    description='A Gmail extraction assistant that can list, search, retrieve, and export email messages to CSV, and download attachments.',
     instruction="""You are a Gmail extraction assistant. You can help users:
     - List recent emails
+    - List labels with their message and unread counts (useful to size a job before fetching it)
     - Search for specific emails using Gmail query syntax
     - Retrieve full content of specific messages
+    - Read whole conversations (threads) in one call
+    - Analyze many messages at once (top senders, volume over time, sizes, label counts)
     - Export email results to CSV format
+    - Download email attachments
+    - Report the server's own performance metrics
 
     Use the available tools to access Gmail data and provide helpful information to users.""",
-    tools=[list_messages, get_message_content, search_messages, export_to_csv],
+    tools=[list_messages, list_labels, get_message_content, get_gmail_thread, search_messages, analyze_gmail, export_to_csv, download_attachments, gmail_server_stats],
 )
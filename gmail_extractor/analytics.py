@@ -0,0 +1,382 @@
+"""Mailbox analytics computed locally, returning only small aggregate tables.
+
+Answering "who emails me most" from list output ships every message's
+headers to the model. analyze_mailbox() instead streams metadata pages into
+a columnar buffer of NumPy arrays (interned sender ID, internalDate, label
+set ID, sizeEstimate per message) and computes the counts, histograms and
+top-K lists with vectorized operations. Metadata comes either from the API
+(any Gmail query) or from the local mirror kept current by sync.py, which
+makes whole-mailbox questions a matter of seconds after the first sync.
+"""
+import json
+from dataclasses import dataclass
+from email.utils import parseaddr
+from typing import Iterable, Iterator
+
+from .batching import MAX_BATCH_SIZE, batch_get_messages
+from .defaults import ANALYSIS_GROUPS, ANALYSIS_INTERVALS, ANALYSIS_SOURCES, DEFAULT_ANALYSIS_RESULTS, DEFAULT_TOP
+from .fetch import iter_message_ids
+from .labels import get_label_cache
+from .ratelimit import account_of
+from .service import get_gmail_service
+
+# Histogram rows shown; older periods are summed into one row
+MAX_PERIODS = 24
+
+# Only the columns analyzed, for metadata fetched from the API
+ANALYSIS_FIELDS = 'id,labelIds,internalDate,sizeEstimate,payload/headers'
+# Rows buffered in Python lists before they are packed into arrays
+CHUNK_ROWS = 65_536
+
+UNKNOWN_SENDER = '(unknown sender)'
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Mailbox analytics need numpy from the 'analytics' extra: "
+                          "uv sync --extra analytics (or pip install numpy)") from None
+    return numpy
+
+
+class MetadataColumns:
+    """
+    Append-only columnar buffer of message metadata.
+
+    Senders and label sets repeat heavily, so each is interned once and the
+    per-message columns hold small integer IDs: sender (int32), internalDate
+    in ms (int64), label set (int32) and sizeEstimate (int64). A label set is
+    a row of the membership matrix returned by label_matrix(), so per-label
+    counts work for any number of labels, not just the 64 of a bitmask word.
+    """
+
+    def __init__(self):
+        self.sender_keys: list[str] = []     # sender ID -> lowercased address
+        self.sender_names: list[str] = []    # sender ID -> "Name <address>" as first seen
+        self.label_sets: list[tuple[str, ...]] = []  # label set ID -> label IDs
+        self.label_ids: dict[str, int] = {}  # label ID -> column of label_matrix()
+        self._senders: dict[str, int] = {}   # raw From header and address -> sender ID
+        self._sets: dict = {}                # label IDs (tuple or mirror JSON) -> label set ID
+        self._pending: tuple[list, list, list, list] = ([], [], [], [])
+        self._chunks: list[tuple] = []
+        self.failed = 0
+
+    def _sender_id(self, header: str | None) -> int:
+        header = header or ''
+        sender_id = self._senders.get(header)
+        if sender_id is None:
+            name, address = parseaddr(header)
+            key = address.lower() or header.strip().lower() or UNKNOWN_SENDER
+            sender_id = self._senders.get(key)
+            if sender_id is None:
+                sender_id = self._senders[key] = len(self.sender_keys)
+                self.sender_keys.append(key)
+                self.sender_names.append(f"{name} <{address}>" if name and address else address or key)
+            self._senders[header] = sender_id
+        return sender_id
+
+    def _label_set_id(self, label_ids: Iterable[str] | str) -> int:
+        set_id = self._sets.get(label_ids)
+        if set_id is None:
+            labels = tuple(sorted(json.loads(label_ids) if isinstance(label_ids, str) else label_ids))
+            set_id = self._sets.get(labels)
+            if set_id is None:
+                set_id = self._sets[labels] = len(self.label_sets)
+                self.label_sets.append(labels)
+                for label_id in labels:
+                    self.label_ids.setdefault(label_id, len(self.label_ids))
+            self._sets[label_ids] = set_id
+        return set_id
+
+    def append(self, sender: str | None, internal_date: int | str | None, label_ids: Iterable[str] | str,
+               size: int | None):
+        """
+        Add one message.
+
+        Args:
+            sender: Raw From header
+            internal_date: internalDate in ms since the epoch
+            label_ids: Label IDs, as a tuple or as the mirror's JSON array text
+            size: sizeEstimate in bytes
+        """
+        senders, dates, sets, sizes = self._pending
+        senders.append(self._sender_id(sender))
+        dates.append(int(internal_date or 0))
+        sets.append(self._label_set_id(label_ids if isinstance(label_ids, str) else tuple(label_ids)))
+        sizes.append(int(size or 0))
+        if len(senders) >= CHUNK_ROWS:
+            self._flush()
+
+    def extend(self, rows: list[tuple]):
+        """Add a page of (sender, internal_date, label_ids, size) rows, as append() takes them."""
+        if not rows:
+            return
+        senders, dates, sets, sizes = zip(*rows)
+        pending = self._pending
+        pending[0].extend(map(self._sender_id, senders))
+        pending[1].extend(int(date or 0) for date in dates)
+        pending[2].extend(self._label_set_id(labels if isinstance(labels, str) else tuple(labels)) for labels in sets)
+        pending[3].extend(int(size or 0) for size in sizes)
+        if len(pending[0]) >= CHUNK_ROWS:
+            self._flush()
+
+    def _flush(self):
+        np = _import_numpy()
+        senders, dates, sets, sizes = self._pending
+        if senders:
+            self._chunks.append((np.array(senders, dtype=np.int32), np.array(dates, dtype=np.int64),
+                                 np.array(sets, dtype=np.int32), np.array(sizes, dtype=np.int64)))
+            self._pending = ([], [], [], [])
+
+    def columns(self) -> tuple:
+        """Return the (sender, internal_date, label_set, size) arrays."""
+        np = _import_numpy()
+        self._flush()
+        if len(self._chunks) != 1:
+            dtypes = (np.int32, np.int64, np.int32, np.int64)
+            self._chunks = [tuple(np.concatenate([chunk[i] for chunk in self._chunks]) if self._chunks
+                                  else np.empty(0, dtype=dtypes[i]) for i in range(4))]
+        return self._chunks[0]
+
+    def label_matrix(self):
+        """Return the (label sets x labels) boolean membership matrix."""
+        np = _import_numpy()
+        matrix = np.zeros((len(self.label_sets), len(self.label_ids)), dtype=bool)
+        for set_id, labels in enumerate(self.label_sets):
+            matrix[set_id, [self.label_ids[label_id] for label_id in labels]] = True
+        return matrix
+
+
+@dataclass
+class MailboxAnalysis:
+    """Aggregates of a MetadataColumns buffer; every table is at most a few dozen rows."""
+    messages: int
+    failed: int
+    senders: int
+    first: str | None
+    last: str | None
+    total_bytes: int
+    unread: int
+    group_by: str
+    top: list[tuple[str, int, int]]        # (sender or domain, messages, bytes)
+    interval: str
+    periods: list[tuple[str, int, int]]    # (period, messages, bytes), newest first
+    earlier: tuple[int, int] | None        # (messages, bytes) before the periods shown
+    labels: list[tuple[str, int, int]]     # (label name, messages, unread), most used first
+
+
+def _period_starts(np, dates, interval: str):
+    """Return the start of the day/week/month/year of each ms timestamp, as datetime64."""
+    days = dates.astype('datetime64[ms]').astype('datetime64[D]')
+    if interval == 'day':
+        return days
+    if interval == 'week':
+        # Weeks start on Monday; 1970-01-01 was a Thursday (weekday 3)
+        ordinals = days.astype(np.int64)
+        return (ordinals - (ordinals + 3) % 7).astype('datetime64[D]')
+    return days.astype('datetime64[M]' if interval == 'month' else 'datetime64[Y]')
+
+
+def summarize(buffer: MetadataColumns, top: int = DEFAULT_TOP, interval: str = 'month',
+              group_by: str = 'sender', label_names: dict[str, str] | None = None) -> MailboxAnalysis:
+    """
+    Compute the aggregate tables of a metadata buffer.
+
+    Args:
+        buffer: Streamed message metadata
+        top: Number of senders (or domains) to list
+        interval: Histogram bucket: day, week (from Monday), month or year
+        group_by: Rank senders by address ("sender") or by domain ("domain")
+        label_names: Label ID -> name, for the label table (IDs are shown otherwise)
+    """
+    if interval not in ANALYSIS_INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(ANALYSIS_INTERVALS)}")
+    if group_by not in ANALYSIS_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(ANALYSIS_GROUPS)}")
+    np = _import_numpy()
+    senders, dates, sets, sizes = buffer.columns()
+    count = len(senders)
+
+    # Top senders (or domains): counts and bytes per group, partial sort of the K largest
+    names = buffer.sender_names
+    groups = senders
+    if group_by == 'domain':
+        domains: dict[str, int] = {}
+        sender_domains = np.array([domains.setdefault(key.rpartition('@')[2] or key, len(domains))
+                                   for key in buffer.sender_keys], dtype=np.int32)
+        names = list(domains)
+        groups = sender_domains[senders] if count else senders
+    group_counts = np.bincount(groups, minlength=len(names))
+    group_bytes = np.bincount(groups, weights=sizes, minlength=len(names))
+    k = min(max(top, 0), len(names))
+    ranked = np.argpartition(-group_counts, k - 1)[:k] if k else np.empty(0, dtype=np.intp)
+    ranked = ranked[np.lexsort((ranked, -group_counts[ranked]))]
+    top_rows = [(names[i], int(group_counts[i]), int(group_bytes[i])) for i in ranked]
+
+    # Time histogram: bucket starts, then counts and bytes per distinct bucket
+    periods, earlier = [], None
+    if count:
+        starts, inverse = np.unique(_period_starts(np, dates, interval), return_inverse=True)
+        period_counts = np.bincount(inverse, minlength=len(starts))
+        period_bytes = np.bincount(inverse, weights=sizes, minlength=len(starts))
+        unit = {'day': 'D', 'week': 'D', 'month': 'M', 'year': 'Y'}[interval]
+        labels = np.datetime_as_string(starts, unit=unit)
+        shown = range(len(starts) - 1, max(len(starts) - MAX_PERIODS, 0) - 1, -1)
+        periods = [(str(labels[i]), int(period_counts[i]), int(period_bytes[i])) for i in shown]
+        if len(starts) > MAX_PERIODS:
+            cut = len(starts) - MAX_PERIODS
+            earlier = (int(period_counts[:cut].sum()), int(period_bytes[:cut].sum()))
+
+    # Per-label counts: messages per label set, times the set/label membership matrix
+    membership = buffer.label_matrix()
+    set_counts = np.bincount(sets, minlength=len(buffer.label_sets))
+    label_counts = set_counts @ membership
+    unread_column = buffer.label_ids.get('UNREAD')
+    if unread_column is None:
+        unread_sets = np.zeros(len(buffer.label_sets), dtype=bool)
+    else:
+        unread_sets = membership[:, unread_column]
+    label_unread = (set_counts * unread_sets) @ membership
+    label_names = label_names or {}
+    label_rows = sorted(((label_names.get(label_id, label_id), int(label_counts[i]), int(label_unread[i]))
+                         for label_id, i in buffer.label_ids.items() if label_counts[i]),
+                        key=lambda row: (-row[1], row[0]))
+
+    first = last = None
+    if count:
+        first, last = np.datetime_as_string(dates.astype('datetime64[ms]')[[dates.argmin(), dates.argmax()]], unit='D')
+    return MailboxAnalysis(
+        messages=count,
+        failed=buffer.failed,
+        senders=len(buffer.sender_keys),
+        first=None if first is None else str(first),
+        last=None if last is None else str(last),
+        total_bytes=int(sizes.sum()),
+        unread=int(set_counts[unread_sets].sum()),
+        group_by=group_by,
+        top=top_rows,
+        interval=interval,
+        periods=periods,
+        earlier=earlier,
+        labels=label_rows,
+    )
+
+
+def iter_remote_metadata(service, query: str = "", max_results: int | None = DEFAULT_ANALYSIS_RESULTS,
+                         label_ids: list[str] | None = None) -> Iterator[list[dict | Exception]]:
+    """
+    Yield pages of metadata-format messages matching a query, 100 per batch round-trip.
+
+    Only the analyzed fields are requested, and only the From header.
+    """
+    list_kwargs = {'labelIds': label_ids} if label_ids else {}
+    page = []
+    for message_id in iter_message_ids(service, query, max_results, **list_kwargs):
+        page.append(message_id)
+        if len(page) == MAX_BATCH_SIZE:
+            yield batch_get_messages(service, page, format='metadata', metadataHeaders=['From'],
+                                     fields=ANALYSIS_FIELDS)
+            page = []
+    if page:
+        yield batch_get_messages(service, page, format='metadata', metadataHeaders=['From'], fields=ANALYSIS_FIELDS)
+
+
+def analyze_mailbox(service, query: str = "", label: str = "", max_results: int | None = DEFAULT_ANALYSIS_RESULTS,
+                    source: str = 'remote', top: int = DEFAULT_TOP, interval: str = 'month',
+                    group_by: str = 'sender', mirror=None) -> MailboxAnalysis:
+    """
+    Stream message metadata into a columnar buffer and summarize it.
+
+    Args:
+        service: Authorized Gmail API service
+        query: Gmail search query (remote source only)
+        label: Restrict to a label, by name or ID
+        max_results: Newest messages analyzed; None or 0 for all
+        source: "remote" lists and fetches metadata through the API; "mirror"
+            syncs the local mirror incrementally and reads it (the first
+            sync copies the whole mailbox's metadata)
+        top: Number of senders (or domains) to list
+        interval: Histogram bucket: day, week, month or year
+        group_by: Rank by "sender" address or by "domain"
+        mirror: MailboxMirror to use (default: private/cache/mirror.sqlite3)
+
+    Raises:
+        ValueError: Unknown source, interval, group_by or label, or a query given with the mirror source
+    """
+    if source not in ANALYSIS_SOURCES:
+        raise ValueError(f"source must be one of {', '.join(ANALYSIS_SOURCES)}")
+    if interval not in ANALYSIS_INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(ANALYSIS_INTERVALS)}")
+    if group_by not in ANALYSIS_GROUPS:
+        raise ValueError(f"group_by must be one of {', '.join(ANALYSIS_GROUPS)}")
+    label_cache = get_label_cache(account_of(service))
+    label_id = label_cache.resolve(service, label) if label else None
+    buffer = MetadataColumns()
+
+    if source == 'mirror':
+        if query.strip():
+            raise ValueError("The mirror source supports label filters only; use source='remote' for queries")
+        from .sync import MailboxMirror, sync_mailbox
+
+        if mirror is None:
+            mirror = MailboxMirror()
+        sync_mailbox(service, mirror)
+        for rows in mirror.iter_metadata(label_id, max_results or None):
+            buffer.extend(rows)
+    else:
+        for page in iter_remote_metadata(service, query, max_results or None, [label_id] if label_id else None):
+            for message in page:
+                if isinstance(message, Exception):
+                    buffer.failed += 1
+                    continue
+                headers = message.get('payload', {}).get('headers', [])
+                sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), None)
+                buffer.append(sender, message.get('internalDate'), message.get('labelIds', ()),
+                              message.get('sizeEstimate'))
+
+    label_names = {label['id']: label['name'] for label in label_cache.labels(service)}
+    return summarize(buffer, top, interval, group_by, label_names)
+
+
+def _mib(size: int) -> str:
+    return f"{size / 1048576:,.1f} MiB"
+
+
+def format_analysis(analysis: MailboxAnalysis) -> str:
+    """Describe a MailboxAnalysis for a tool response."""
+    if not analysis.messages:
+        failed = f" ({analysis.failed} could not be fetched)" if analysis.failed else ""
+        return f"No messages found{failed}."
+
+    output = [f"Analyzed {analysis.messages:,} messages from {analysis.first} to {analysis.last}: "
+              f"{_mib(analysis.total_bytes)}, {analysis.unread:,} unread, {analysis.senders:,} distinct senders"]
+    if analysis.failed:
+        output.append(f"({analysis.failed} messages could not be fetched and are not counted)")
+
+    output.append(f"\nTop {len(analysis.top)} {'domains' if analysis.group_by == 'domain' else 'senders'}:")
+    for name, count, size in analysis.top:
+        output.append(f"  {count:>7,}  {count / analysis.messages:6.1%}  {_mib(size):>12}  {name}")
+
+    output.append(f"\nMessages per {analysis.interval} (newest first):")
+    for period, count, size in analysis.periods:
+        output.append(f"  {period:<10}  {count:>7,}  {_mib(size):>12}")
+    if analysis.earlier:
+        count, size = analysis.earlier
+        output.append(f"  {'earlier':<10}  {count:>7,}  {_mib(size):>12}")
+
+    output.append("\nLabels:")
+    for name, count, unread in analysis.labels:
+        output.append(f"  {count:>7,}  {unread:>7,} unread  {name}")
+    return "\n".join(output)
+
+
+def analyze_text(query: str = "", label: str = "", max_results: int | None = DEFAULT_ANALYSIS_RESULTS,
+                 source: str = 'remote', top: int = DEFAULT_TOP, interval: str = 'month',
+                 group_by: str = 'sender') -> str:
+    """Analyze the default account's matching messages for a tool response (see analyze_mailbox)."""
+    try:
+        analysis = analyze_mailbox(get_gmail_service(), query, label, max_results, source, top, interval, group_by)
+        return format_analysis(analysis)
+    except Exception as e:
+        return f"Error analyzing messages: {str(e)}"
@@ -0,0 +1,308 @@
+"""Concurrent, memory-bounded attachment downloads with content-hash deduplication.
+
+Attachments are located in message payloads (parts with a filename or an
+attachmentId), fetched with messages.attachments.get on a pool of worker
+threads (small ones arrive inline with the payload) and decoded from
+base64url in fixed-size chunks straight into a temporary file, hashing as
+they go. A byte budget caps how much attachment
+data is in flight at once, so memory stays flat however many messages are
+processed. Identical files (same SHA-256) are stored once per output
+directory, and a manifest there makes re-runs skip what is already saved.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from .fetch import DEFAULT_MAX_CONCURRENCY, fetch_messages, iter_message_ids
+from .mime import is_attachment
+from .ratelimit import execute
+from .service import get_gmail_service
+
+# Attachment bytes allowed in flight (fetched but not yet written) at once
+DEFAULT_MAX_BYTES_IN_FLIGHT = 64 * 2**20
+
+# base64 characters decoded and written per step (a multiple of 4)
+DECODE_CHUNK_CHARS = 256 * 1024
+
+MANIFEST_NAME = 'attachments.json'
+
+# Partial-response mask for the MIME part tree. Large attachments only carry an
+# attachmentId, but small ones come inline as body data (with no attachmentId), so
+# data is selected too; the mask cannot tell them apart from inline text bodies.
+PART_FIELDS = 'partId,mimeType,filename,headers,body(attachmentId,size,data)'
+# How deep multipart nesting is followed (mixed > alternative > related > ... )
+MAX_PART_DEPTH = 5
+
+# Characters kept in saved filenames; anything else becomes '_'
+UNSAFE_FILENAME_RE = re.compile(r'[^\w.\- ]+')
+MAX_FILENAME_CHARS = 120
+
+
+def iter_attachments(payload: dict) -> Iterator[dict]:
+    """Yield the attachment parts of a payload, in document order."""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            stack.extend(reversed(part['parts']))
+        elif is_attachment(part) and (part.get('body', {}).get('attachmentId') or part.get('body', {}).get('data')):
+            yield part
+
+
+def part_tree_fields(depth: int = MAX_PART_DEPTH) -> str:
+    """Return the fields mask selecting a message's part tree down to `depth` levels."""
+    fields = PART_FIELDS
+    for _ in range(depth):
+        fields = f"{PART_FIELDS},parts({fields})"
+    return f"id,payload({fields})"
+
+
+def safe_filename(message_id: str, part: dict) -> str:
+    """Return a filesystem-safe name for an attachment, prefixed with its message ID."""
+    name = UNSAFE_FILENAME_RE.sub('_', part.get('filename') or f"part-{part.get('partId', '0')}").strip(' .')
+    if len(name) > MAX_FILENAME_CHARS:
+        stem, dot, suffix = name.rpartition('.')
+        name = (stem[:MAX_FILENAME_CHARS - len(suffix) - 1] + dot + suffix) if dot else name[:MAX_FILENAME_CHARS]
+    return f"{message_id}_{name or 'attachment'}"
+
+
+def write_base64(data: str, file, chunk_chars: int = DECODE_CHUNK_CHARS) -> tuple[str, int]:
+    """
+    Decode base64url data into an open binary file chunk by chunk.
+
+    Returns:
+        (SHA-256 hex digest, number of bytes written)
+    """
+    digest = hashlib.sha256()
+    written = 0
+    chunk_chars -= chunk_chars % 4
+    for start in range(0, len(data), chunk_chars):
+        chunk = data[start:start + chunk_chars]
+        if start + chunk_chars >= len(data):
+            chunk += '=' * (-len(chunk) % 4)
+        raw = base64.urlsafe_b64decode(chunk)
+        digest.update(raw)
+        file.write(raw)
+        written += len(raw)
+    return digest.hexdigest(), written
+
+
+class ByteBudget:
+    """Counting semaphore over bytes; a request larger than the budget waits for all of it."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(1, int(max_bytes))
+        self._available = self.max_bytes
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        """Block until size bytes (capped at the budget) are free; return the amount taken."""
+        size = min(max(1, size), self.max_bytes)
+        with self._condition:
+            while self._available < size:
+                self._condition.wait()
+            self._available -= size
+        return size
+
+    def release(self, size: int):
+        with self._condition:
+            self._available += size
+            self._condition.notify_all()
+
+
+class AttachmentStore:
+    """Output directory of attachments, deduplicated by content hash and tracked in a manifest."""
+
+    def __init__(self, output_dir: Path):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path = self.output_dir / MANIFEST_NAME
+        self._lock = threading.Lock()
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+        except (FileNotFoundError, ValueError):
+            manifest = {}
+        # Content hash -> filename, dropping files deleted since the last run
+        self.files = {digest: name for digest, name in manifest.get('files', {}).items()
+                      if (self.output_dir / name).exists()}
+        # "messageId/partId" -> content hash
+        self.parts = {key: digest for key, digest in manifest.get('parts', {}).items() if digest in self.files}
+
+    def has(self, message_id: str, part: dict) -> bool:
+        with self._lock:
+            return f"{message_id}/{part.get('partId', '')}" in self.parts
+
+    def temp_file(self):
+        return tempfile.NamedTemporaryFile('wb', dir=self.output_dir, prefix='.download-', suffix='.tmp', delete=False)
+
+    def commit(self, message_id: str, part: dict, temp_path: str, digest: str) -> tuple[Path, bool]:
+        """
+        Move a downloaded temp file into place, unless identical content is already stored.
+
+        Returns:
+            (path of the stored file, True if it was a duplicate)
+        """
+        with self._lock:
+            self.parts[f"{message_id}/{part.get('partId', '')}"] = digest
+            existing = self.files.get(digest)
+            if existing is not None:
+                os.unlink(temp_path)
+                return self.output_dir / existing, True
+
+            name = safe_filename(message_id, part)
+            path = self.output_dir / name
+            os.replace(temp_path, path)
+            self.files[digest] = name
+            return path, False
+
+    def save_manifest(self):
+        with self._lock:
+            text = json.dumps({'files': self.files, 'parts': self.parts}, indent=2, sort_keys=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.output_dir, prefix=f'.{MANIFEST_NAME}.',
+                                         suffix='.tmp', delete=False) as f:
+            f.write(text)
+        os.replace(f.name, self.manifest_path)
+
+
+def download_message_attachments(service_factory: Callable[[], Any], message_ids: Iterable[str],
+                                 output_dir: Path, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                                 max_bytes_in_flight: int = DEFAULT_MAX_BYTES_IN_FLIGHT,
+                                 mime_types: Iterable[str] | None = None) -> dict:
+    """
+    Download the attachments of several messages into output_dir.
+
+    Message payloads are fetched concurrently with fetch_messages; each
+    attachment is then downloaded on its own worker, decoded in chunks to a
+    temporary file and moved into place, or discarded when a file with the
+    same content is already stored.
+
+    Args:
+        service_factory: Callable returning a new authorized Gmail API service
+        message_ids: IDs of the messages whose attachments to download
+        output_dir: Directory to save attachments (and the manifest) in
+        max_concurrency: Number of parallel requests (default: 8)
+        max_bytes_in_flight: Attachment bytes held in memory at once (default: 64 MiB)
+        mime_types: Only download attachments of these MIME types (default: all)
+
+    Returns:
+        Counts: messages, attachments found, downloaded, duplicates (identical
+        content already stored), skipped (saved by an earlier run), failed,
+        and bytes written; plus the saved paths and the failures
+    """
+    store = AttachmentStore(output_dir)
+    budget = ByteBudget(max_bytes_in_flight)
+    mime_types = set(mime_types) if mime_types else None
+    local = threading.local()
+    stats = {'messages': 0, 'attachments': 0, 'downloaded': 0, 'duplicates': 0, 'skipped': 0,
+             'failed': 0, 'bytes': 0, 'files': [], 'errors': []}
+    stats_lock = threading.Lock()
+
+    def download(message_id: str, part: dict, reserved: int):
+        try:
+            body = part['body']
+            data = body.get('data')
+            if data is None:
+                service = getattr(local, 'service', None)
+                if service is None:
+                    service = local.service = service_factory()
+                data = execute(service.users().messages().attachments().get(
+                    userId='me',
+                    messageId=message_id,
+                    id=body['attachmentId']
+                ))['data']
+
+            with store.temp_file() as temp:
+                try:
+                    digest, size = write_base64(data, temp)
+                except BaseException:
+                    temp.close()
+                    os.unlink(temp.name)
+                    raise
+            del data
+            path, duplicate = store.commit(message_id, part, temp.name, digest)
+            with stats_lock:
+                stats['duplicates' if duplicate else 'downloaded'] += 1
+                if not duplicate:
+                    stats['bytes'] += size
+                    stats['files'].append(str(path))
+        except Exception as e:
+            with stats_lock:
+                stats['failed'] += 1
+                stats['errors'].append(f"{message_id}/{part.get('filename') or part.get('partId')}: {e}")
+        finally:
+            budget.release(reserved)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(max_concurrency)),
+                                thread_name_prefix='gmail-attachment') as pool:
+            for message_id, message in fetch_messages(service_factory, message_ids,
+                                                      max_concurrency=max_concurrency,
+                                                      format='full', fields=part_tree_fields()):
+                stats['messages'] += 1
+                if isinstance(message, Exception):
+                    with stats_lock:
+                        stats['failed'] += 1
+                        stats['errors'].append(f"{message_id}: {message}")
+                    continue
+
+                for part in iter_attachments(message['payload']):
+                    if mime_types is not None and part.get('mimeType') not in mime_types:
+                        continue
+                    stats['attachments'] += 1
+                    if store.has(message_id, part):
+                        stats['skipped'] += 1
+                        continue
+                    # base64 text is 4/3 the decoded size; wait here rather than in the pool so the queue stays short
+                    reserved = budget.acquire(part['body'].get('size', 0) * 4 // 3)
+                    pool.submit(download, message_id, part, reserved)
+    finally:
+        store.save_manifest()
+    return stats
+
+
+def format_download_summary(stats: dict, output_dir: Path, max_listed: int = 20) -> str:
+    """Describe a download_message_attachments result for a tool response."""
+    if not stats['attachments'] and not stats['failed']:
+        return f"No matching attachments found in {stats['messages']} message(s)."
+
+    output = [f"Downloaded {stats['downloaded']} attachment(s) ({stats['bytes'] / 2**20:.1f} MiB) "
+              f"from {stats['messages']} message(s) to: {output_dir}"]
+    if stats['duplicates']:
+        output.append(f"{stats['duplicates']} duplicate(s) of files already saved were not stored again")
+    if stats['skipped']:
+        output.append(f"{stats['skipped']} attachment(s) were already saved by an earlier run")
+    if stats['failed']:
+        output.append(f"Warning: {stats['failed']} download(s) failed; re-run to retry them")
+        output.extend(f"  {error}" for error in stats['errors'][:max_listed])
+    if stats['files']:
+        output.append("")
+        output.append("Files:")
+        output.extend(f"  {path}" for path in stats['files'][:max_listed])
+        if len(stats['files']) > max_listed:
+            output.append(f"  ... and {len(stats['files']) - max_listed} more")
+    return "\n".join(output)
+
+
+def download_attachments_text(output_dir: Path, query: str = "", max_results: int | None = 10, mime_type: str = "",
+                              max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> str:
+    """Download the attachments of the default account's matching messages and describe the result."""
+    try:
+        message_ids = iter_message_ids(get_gmail_service(), query=f"{query} has:attachment".strip(),
+                                       max_results=max_results)
+        stats = download_message_attachments(
+            get_gmail_service,
+            message_ids,
+            output_dir,
+            max_concurrency=max_concurrency,
+            mime_types=[mime_type] if mime_type else None
+        )
+        return format_download_summary(stats, output_dir)
+    except Exception as e:
+        return f"Error downloading attachments: {str(e)}"
@@ -0,0 +1,75 @@
+"""Batched Gmail API requests shared by the ADK tools and the MCP server."""
+import time
+from typing import Any, Callable
+
+from .ratelimit import QUOTA_UNITS, account_of, backoff_delay, get_scheduler, is_retryable
+
+# Gmail accepts at most 100 sub-requests in one batch HTTP call
+MAX_BATCH_SIZE = 100
+
+
+def batch_get(service, ids: list[str], make_request: Callable[[str], Any], method: str,
+              batch_size: int = MAX_BATCH_SIZE) -> list[dict | Exception]:
+    """
+    Run one request per ID through the Gmail batch endpoint, retrying throttled sub-requests.
+
+    Args:
+        service: Authorized Gmail API service
+        ids: IDs of the resources to fetch
+        make_request: Returns the (unexecuted) request for an ID
+        method: API method ID of the requests, for quota accounting (e.g. 'gmail.users.labels.get')
+        batch_size: Maximum number of sub-requests per round-trip (default: 100)
+
+    Returns:
+        A list aligned with ids holding, for each ID, either the response or
+        the exception raised for that sub-request
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    results: list[dict | Exception | None] = [None] * len(ids)
+    scheduler = get_scheduler(account_of(service))
+
+    def handle_response(request_id, response, exception):
+        index = int(request_id)
+        results[index] = exception if exception is not None else response
+
+    pending = list(range(len(ids)))
+    for attempt in range(scheduler.max_retries + 1):
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = service.new_batch_http_request(callback=handle_response)
+            for index in chunk:
+                batch.add(make_request(ids[index]), request_id=str(index))
+            scheduler.call(batch.execute, QUOTA_UNITS[method] * len(chunk), f'{method} (batch)')
+
+        # Sub-requests can be throttled individually; retry just those
+        pending = [index for index in pending if is_retryable(results[index])]
+        if not pending or attempt == scheduler.max_retries:
+            break
+        scheduler.note_failure(results[pending[0]])
+        time.sleep(backoff_delay(attempt, results[pending[0]]))
+
+    return results
+
+
+def batch_get_messages(service, message_ids: list[str], batch_size: int = MAX_BATCH_SIZE,
+                       **get_kwargs: Any) -> list[dict | Exception]:
+    """
+    Fetch several messages through the Gmail batch endpoint.
+
+    Args:
+        service: Authorized Gmail API service
+        message_ids: IDs of the messages to fetch
+        batch_size: Maximum number of sub-requests per round-trip (default: 100)
+        **get_kwargs: Extra arguments for messages().get() (e.g. format='metadata')
+
+    Returns:
+        A list aligned with message_ids holding, for each ID, either the message
+        resource or the exception raised for that sub-request
+    """
+    return batch_get(
+        service,
+        message_ids,
+        lambda message_id: service.users().messages().get(userId='me', id=message_id, **get_kwargs),
+        'gmail.users.messages.get',
+        batch_size
+    )
@@ -0,0 +1,243 @@
+"""Two-tier (memory LRU + SQLite) cache of immutable Gmail message content.
+
+A message's payload never changes once it has an ID, so full-format
+responses are cached by message ID. Mutable state (labelIds, historyId) is
+stripped before caching and refreshed separately with a cheap minimal fetch
+when a caller needs it. Message IDs are only unique within a mailbox, so each
+additional account has its own cache.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+from .mime import read_body
+from .ratelimit import account_of, execute
+from .search_index import index_messages
+from .service import DEFAULT_ACCOUNT, PRIVATE_DIR, account_store_path, get_gmail_service
+
+CACHE_DB_PATH = PRIVATE_DIR / 'cache' / 'messages.sqlite3'
+
+# Fields of a message resource that can change after it is created
+MUTABLE_FIELDS = ('labelIds', 'historyId')
+
+DEFAULT_MEMORY_BYTES = 64 * 2**20
+DEFAULT_DISK_BYTES = 512 * 2**20
+
+
+class MessageCache:
+    """Size-bounded in-memory LRU in front of a size-bounded SQLite store."""
+
+    def __init__(self, db_path: Path | None = CACHE_DB_PATH,
+                 max_memory_bytes: int = DEFAULT_MEMORY_BYTES,
+                 max_disk_bytes: int = DEFAULT_DISK_BYTES):
+        """
+        Args:
+            db_path: SQLite file for the disk tier, or None for memory only
+            max_memory_bytes: Budget for the in-memory tier (serialized size)
+            max_disk_bytes: Budget for the disk tier (compressed size)
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        self._db = None
+        self._disk_bytes = 0
+        if db_path is not None:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                ' id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS messages_accessed ON messages (accessed)')
+            self._disk_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM messages').fetchone()[0]
+
+    def get(self, message_id: str) -> dict | None:
+        """Return the cached immutable message content, or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(message_id)
+            if entry is not None:
+                self._memory.move_to_end(message_id)
+                self._counts['memory_hits'] += 1
+                return entry[0]
+
+            if self._db is not None:
+                row = self._db.execute('SELECT data FROM messages WHERE id = ?', (message_id,)).fetchone()
+                if row is not None:
+                    self._db.execute('UPDATE messages SET accessed = ? WHERE id = ?', (time.time(), message_id))
+                    data = zlib.decompress(row[0])
+                    message = json.loads(data)
+                    self._remember(message_id, message, len(data))
+                    self._counts['disk_hits'] += 1
+                    return message
+
+            self._counts['misses'] += 1
+            return None
+
+    def put(self, message: dict):
+        """Cache a full-format message resource (mutable fields are dropped)."""
+        message = {key: value for key, value in message.items() if key not in MUTABLE_FIELDS}
+        data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+        with self._lock:
+            self._remember(message['id'], message, len(data))
+            if self._db is not None:
+                blob = zlib.compress(data, 1)
+                old = self._db.execute('SELECT size FROM messages WHERE id = ?', (message['id'],)).fetchone()
+                self._db.execute(
+                    'INSERT OR REPLACE INTO messages (id, data, size, accessed) VALUES (?, ?, ?, ?)',
+                    (message['id'], blob, len(blob), time.time())
+                )
+                self._disk_bytes += len(blob) - (old[0] if old else 0)
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+
+    def stats(self) -> dict:
+        """Return hit/miss counts, the hit ratio and the size of each tier."""
+        with self._lock:
+            hits = self._counts['memory_hits'] + self._counts['disk_hits']
+            lookups = hits + self._counts['misses']
+            return {
+                **self._counts,
+                'hit_ratio': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+            }
+
+    def _remember(self, message_id: str, message: dict, size: int):
+        previous = self._memory.pop(message_id, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        if size > self.max_memory_bytes:
+            return
+        self._memory[message_id] = (message, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+    def _evict_disk(self):
+        # Drop least recently used rows until the store is back under 90% of budget
+        target = int(self.max_disk_bytes * 0.9)
+        for message_id, size in self._db.execute(
+                'SELECT id, size FROM messages ORDER BY accessed').fetchall():
+            if self._disk_bytes <= target:
+                break
+            self._db.execute('DELETE FROM messages WHERE id = ?', (message_id,))
+            self._disk_bytes -= size
+
+
+_cache = None
+_account_caches: dict[str, MessageCache] = {}
+_cache_lock = threading.Lock()
+
+
+def get_message_cache(account: str | None = None) -> MessageCache:
+    """Return the message cache of a named additional account, or the process-wide one (None: the default account)."""
+    global _cache
+
+    if account is not None:
+        with _cache_lock:
+            if account not in _account_caches:
+                _account_caches[account] = MessageCache(account_store_path(account, 'messages.sqlite3'))
+            return _account_caches[account]
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = MessageCache()
+    return _cache
+
+
+def message_caches() -> dict[str, MessageCache]:
+    """Return the message caches opened so far, by account, without opening any."""
+    with _cache_lock:
+        return {**({DEFAULT_ACCOUNT: _cache} if _cache is not None else {}), **_account_caches}
+
+
+def get_message(service, message_id: str, refresh_state: bool = False,
+                cache: MessageCache | None = None) -> dict:
+    """
+    Return a full-format message, serving its content from the cache when possible.
+
+    Args:
+        service: Authorized Gmail API service
+        message_id: The ID of the message to retrieve
+        refresh_state: Also fetch current labelIds/historyId (one minimal-format call)
+        cache: Cache to use (default: the service's account's cache)
+
+    Returns:
+        The message resource; labelIds/historyId are present only when fetched
+        from the network or refresh_state is True
+    """
+    account = account_of(service)
+    cache = cache or get_message_cache(account)
+    message = cache.get(message_id)
+    if message is None:
+        message = execute(service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='full'
+        ))
+        cache.put(message)
+        index_messages([message], account)
+        return message
+
+    if refresh_state:
+        state = execute(service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='minimal',
+            fields=','.join(MUTABLE_FIELDS)
+        ))
+        message = {**message, **state}
+        index_messages([{'id': message_id, **state}], account)
+    return message
+
+
+def get_message_text(message_id: str, offset: int = 0, max_chars: int | None = None, plain_text: bool = True,
+                     include_labels: bool = False) -> str:
+    """
+    Return a message's headers (on the first page) and one page of its body for a tool response.
+
+    Args:
+        message_id: The ID of the message to retrieve
+        offset: Character offset in the body to start from
+        max_chars: Maximum body characters to return (0 or None for no limit)
+        plain_text: Reduce the body to compact plain text before paging (see mime.read_body)
+        include_labels: Also show the message's current label IDs
+    """
+    try:
+        # Cached content carries no labels, as they can change; refresh_state fetches them
+        message = get_message(get_gmail_service(), message_id, refresh_state=include_labels)
+
+        # Extract one page of the body
+        body, next_offset = read_body(message['payload'], offset, max_chars or None, reduce=plain_text)
+
+        output = []
+        if offset:
+            output.append(f"[Message {message_id}, body from character {offset}]")
+        else:
+            # Extract headers
+            headers = {h['name']: h['value'] for h in message['payload']['headers']}
+            output.append(f"From: {headers.get('From', 'N/A')}")
+            output.append(f"To: {headers.get('To', 'N/A')}")
+            output.append(f"Subject: {headers.get('Subject', 'N/A')}")
+            output.append(f"Date: {headers.get('Date', 'N/A')}")
+            if include_labels:
+                output.append(f"Labels: {', '.join(message.get('labelIds', [])) or 'none'}")
+        output.append("-" * 80)
+        output.append(body)
+        if next_offset is not None:
+            output.append(f"\n[Body continues. Call again with offset={next_offset} to read more.]")
+
+        return "\n".join(output)
+    except Exception as e:
+        return f"Error retrieving message: {str(e)}"
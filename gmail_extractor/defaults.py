@@ -0,0 +1,33 @@
+"""Tool argument defaults and choices, shared by the ADK tools and the MCP server.
+
+This module imports nothing but os, so the MCP server can describe its tools
+without importing the modules that implement them (see scripts/gmail_mcp_server.py).
+"""
+import os
+
+# Default for search_messages(mode=...): "remote" (Gmail API) or "local" (offline index)
+DEFAULT_SEARCH_MODE = os.environ.get('GMAIL_SEARCH_MODE', 'remote')
+
+# Default page size, in characters, of message bodies returned by get_message_content
+DEFAULT_MAX_BODY_CHARS = int(os.environ.get('GMAIL_MAX_BODY_CHARS', '20000'))
+
+# Body characters shown per message by default; the full text stays available through get_gmail_message
+DEFAULT_MESSAGE_CHARS = 5000
+
+# Default number of worker threads issuing messages().get() calls
+DEFAULT_MAX_CONCURRENCY = 8
+
+# Output formats and the file extension each one gets by default
+EXPORT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow', 'jsonl.gz': '.jsonl.gz'}
+DEFAULT_EXPORT_FORMAT = 'csv'
+
+# Where the Snippet column comes from: Gmail's own ~200-char snippet ("api"),
+# or the start of the decoded body ("body", needs the whole message)
+SNIPPET_SOURCES = ('api', 'body')
+DEFAULT_SNIPPET_SOURCE = 'api'
+
+ANALYSIS_SOURCES = ('remote', 'mirror')
+ANALYSIS_INTERVALS = ('day', 'week', 'month', 'year')
+ANALYSIS_GROUPS = ('sender', 'domain')
+DEFAULT_ANALYSIS_RESULTS = 1000
+DEFAULT_TOP = 10
@@ -0,0 +1,547 @@
+"""Streaming export pipeline: paginated listing -> concurrent fetch -> incremental writer.
+
+Rows can be written as CSV, gzip-compressed JSON Lines, or (with pyarrow, from
+the optional "columnar" extra) zstd-compressed Parquet or Arrow IPC files. The columnar
+formats carry a real timestamp for Date and a list column for Labels.
+
+Exports from several accounts run one listing-and-fetch pipeline per account
+in parallel and merge their rows newest first by internalDate as they arrive.
+"""
+import csv
+import gzip
+import heapq
+import html
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from .accounts import format_account_errors, resolve_accounts
+from .defaults import (DEFAULT_EXPORT_FORMAT, DEFAULT_MAX_CONCURRENCY, DEFAULT_SNIPPET_SOURCE, EXPORT_FORMATS,
+                       SNIPPET_SOURCES)
+from .fetch import fetch_messages, iter_message_ids
+from .mime import get_body, get_body_snippet
+from .ratelimit import account_of
+from .records import InternPool, MessageRecord
+from .search_index import index_messages
+from .service import get_gmail_service
+
+CSV_FIELDNAMES = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
+EXPORT_HEADERS = ['From', 'To', 'Subject', 'Date']
+
+# Rows per record batch (and Parquet row group) in the columnar formats
+RECORD_BATCH_ROWS = 10_000
+
+# Snippet characters cut from the body (snippet_source="body")
+SNIPPET_CHARS = 200
+
+# messages().get() arguments for each snippet source: the smallest format plus a
+# partial-response mask with just what message_to_record and the search index read
+FETCH_KWARGS = {
+    'api': {
+        'format': 'metadata',
+        'metadataHeaders': EXPORT_HEADERS,
+        'fields': 'id,labelIds,snippet,internalDate,payload/headers',
+    },
+    'body': {
+        'format': 'full',
+        'fields': 'id,labelIds,snippet,internalDate,payload',
+    },
+}
+
+# Flush buffered rows to disk at least this often (seconds)
+FLUSH_INTERVAL = 0.5
+
+# Rows each account may fetch ahead of the merged output
+ACCOUNT_QUEUE_ROWS = 256
+
+
+def check_export_options(snippet_source: str, output_format: str = DEFAULT_EXPORT_FORMAT):
+    """Raise ValueError for an unknown snippet source or output format."""
+    if snippet_source not in SNIPPET_SOURCES:
+        raise ValueError(f"snippet_source must be one of {', '.join(SNIPPET_SOURCES)}, not {snippet_source!r}")
+    if output_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}, not {output_format!r}")
+
+
+def export_fieldnames(include_labels: bool = False, include_body: bool = False,
+                      include_account: bool = False) -> list[str]:
+    """Return the export columns, in order, for the optional column choices."""
+    return CSV_FIELDNAMES + ['Labels'] * include_labels + ['Body'] * include_body + ['Account'] * include_account
+
+
+def parse_message_date(date_header: str | None, internal_date: str | int | None = None) -> datetime | None:
+    """Parse an RFC 2822 Date header to an aware UTC datetime, falling back to internalDate."""
+    if date_header:
+        try:
+            parsed = parsedate_to_datetime(date_header)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is not None:
+            # Headers without a zone are taken as UTC
+            if parsed.tzinfo is None:
+                return parsed.replace(tzinfo=timezone.utc)
+            return parsed.astimezone(timezone.utc)
+    if internal_date:
+        return datetime.fromtimestamp(int(internal_date) / 1000, tz=timezone.utc)
+    return None
+
+
+def message_to_row(message_id: str, message: dict, snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                   snippet_chars: int = SNIPPET_CHARS, include_labels: bool = False,
+                   include_body: bool = False, parse_dates: bool = False) -> dict:
+    """
+    Convert a fetched message resource into an export row.
+
+    Args:
+        message_id: The message ID
+        message: Resource fetched with the kwargs from fetch_kwargs()
+        snippet_source: "api" or "body" (see SNIPPET_SOURCES)
+        snippet_chars: Maximum Snippet length
+        include_labels: Add a 'Labels' column with the message's label IDs
+        include_body: Add a 'Body' column with the full decoded body
+        parse_dates: Store Date as a UTC datetime instead of the raw header
+
+    Returns:
+        A row dict keyed by export_fieldnames(include_labels, include_body)
+    """
+    record = message_to_record(message, snippet_source, snippet_chars, include_body)
+    record.id = message_id
+    return record_to_row(record, include_labels, include_body, parse_dates)
+
+
+def message_to_record(message: dict, snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                      snippet_chars: int = SNIPPET_CHARS, include_body: bool = False,
+                      intern: InternPool | None = None) -> MessageRecord:
+    """
+    Reduce a fetched message resource to the record its export row is built from.
+
+    The snippet is final (unescaped, or cut from the body) and the body is
+    decoded only when include_body is set, so the resource can be dropped.
+
+    Args:
+        message: Resource fetched with the kwargs from fetch_kwargs()
+        snippet_source: "api" or "body" (see SNIPPET_SOURCES)
+        snippet_chars: Maximum Snippet length
+        include_body: Decode the full body into record.body
+        intern: Pool sharing repeated senders, recipients and label sets between records
+    """
+    record = MessageRecord.from_message(message, intern)
+    # Gmail's snippet is HTML-escaped (&#39;, &amp;, ...)
+    api_snippet = html.unescape(record.snippet)
+    if snippet_source == 'body':
+        record.snippet = get_body_snippet(message['payload'], snippet_chars) or api_snippet
+    else:
+        record.snippet = api_snippet[:snippet_chars]
+    if include_body:
+        record.body = get_body(message['payload'], strip_html=True)
+    return record
+
+
+def _or_na(value: str | None) -> str:
+    return 'N/A' if value is None else value
+
+
+def record_to_row(record: MessageRecord, include_labels: bool = False, include_body: bool = False,
+                  parse_dates: bool = False) -> dict:
+    """Return the export row of a record built by message_to_record()."""
+    if parse_dates:
+        date = parse_message_date(record.date, record.internal_date)
+    else:
+        date = _or_na(record.date)
+    row = {
+        'Message ID': record.id,
+        'From': _or_na(record.sender),
+        'To': _or_na(record.recipient),
+        'Subject': _or_na(record.subject),
+        'Date': date,
+        'Snippet': record.snippet
+    }
+    if include_labels:
+        row['Labels'] = list(record.label_ids)
+    if include_body:
+        row['Body'] = record.body
+    return row
+
+
+def fetch_kwargs(snippet_source: str = DEFAULT_SNIPPET_SOURCE, include_body: bool = False) -> dict:
+    """Return the messages().get() arguments for an export's snippet source and columns."""
+    return FETCH_KWARGS['body' if include_body else snippet_source]
+
+
+def iter_export_rows(service_factory: Callable[[], Any], query: str = "", max_results: int | None = None,
+                     max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                     stats: dict | None = None,
+                     snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                     include_labels: bool = False, include_body: bool = False,
+                     parse_dates: bool = False) -> Iterator[dict]:
+    """
+    Stream export rows for every message matching a query.
+
+    IDs are listed page by page and fetched concurrently, so only a bounded
+    window of messages is held in memory regardless of max_results.
+
+    Args:
+        service_factory: Callable returning a new authorized Gmail API service
+        query: Gmail search query (optional)
+        max_results: Maximum number of messages to export (default: no limit)
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+        stats: Optional dict updated with 'exported' and 'failed' counts
+        snippet_source: "api" to use Gmail's snippet with a metadata-only fetch, or
+            "body" to fetch full messages and cut the snippet from the body (default: "api")
+        include_labels: Add a 'Labels' column
+        include_body: Add a 'Body' column (fetches full messages)
+        parse_dates: Yield Date as a UTC datetime instead of the raw header
+
+    Yields:
+        One row dict per successfully fetched message, in list order
+
+    Raises:
+        ValueError: If snippet_source is not one of SNIPPET_SOURCES
+    """
+    check_export_options(snippet_source)
+    stats = stats if stats is not None else {}
+    stats.setdefault('exported', 0)
+    stats.setdefault('failed', 0)
+
+    for record in _iter_export_records(service_factory, query, max_results, max_concurrency,
+                                       stats, snippet_source, include_body):
+        stats['exported'] += 1
+        yield record_to_row(record, include_labels, include_body, parse_dates)
+
+
+def _iter_export_records(service_factory: Callable[[], Any], query: str, max_results: int | None,
+                         max_concurrency: int, stats: dict, snippet_source: str,
+                         include_body: bool) -> Iterator[MessageRecord]:
+    """Yield the records of an export's messages, counting failed fetches in stats."""
+    intern = InternPool()
+    service = service_factory()
+    account = account_of(service)
+
+    def to_record(message: dict) -> MessageRecord:
+        # Runs in the fetch worker, so the resource is released as soon as its record exists
+        index_messages([message], account)
+        return message_to_record(message, snippet_source, SNIPPET_CHARS, include_body, intern)
+
+    message_ids = iter_message_ids(service, query=query, max_results=max_results)
+    for _, record in fetch_messages(service_factory, message_ids, max_concurrency=max_concurrency,
+                                    transform=to_record, **fetch_kwargs(snippet_source, include_body)):
+        if isinstance(record, Exception):
+            stats['failed'] += 1
+            continue
+        yield record
+
+
+_DONE = object()
+
+
+def iter_merged_export_rows(service_factories: dict[str, Callable[[], Any]], query: str = "",
+                            max_results: int | None = None,
+                            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                            stats: dict | None = None,
+                            snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                            include_labels: bool = False, include_body: bool = False,
+                            parse_dates: bool = False) -> Iterator[dict]:
+    """
+    Stream export rows from several accounts, newest first across all of them.
+
+    Every account lists and fetches in its own thread (with its own services
+    and quota), a bounded queue ahead of the output; the queues are merged
+    with a k-way heap merge on internalDate. An account that fails stops
+    contributing rows without affecting the others.
+
+    Args:
+        service_factories: Account name -> callable returning a new authorized
+            Gmail API service for that account
+        max_results: Maximum number of rows in total (default: no limit)
+        stats: Optional dict updated with 'exported' and 'failed' totals, and
+            under 'accounts' the same counts plus any 'error' per account
+        (other arguments as for iter_export_rows)
+
+    Yields:
+        Row dicts with an 'Account' column
+    """
+    check_export_options(snippet_source)
+    stats = stats if stats is not None else {}
+    stats.setdefault('exported', 0)
+    stats.setdefault('failed', 0)
+    accounts = stats.setdefault('accounts', {})
+    stop = threading.Event()
+
+    def put(rows: queue.Queue, item) -> bool:
+        while not stop.is_set():
+            try:
+                rows.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce(account: str, factory: Callable[[], Any], rows: queue.Queue):
+        account_stats = accounts[account]
+        records = _iter_export_records(factory, query, max_results, max_concurrency, account_stats,
+                                       snippet_source, include_body)
+        try:
+            for record in records:
+                row = record_to_row(record, include_labels, include_body, parse_dates)
+                row['Account'] = account
+                if not put(rows, (record.internal_date, row)):
+                    break
+        except Exception as e:
+            account_stats['error'] = str(e)
+        finally:
+            records.close()
+            put(rows, _DONE)
+
+    def drain(rows: queue.Queue) -> Iterator[tuple[int, dict]]:
+        while (item := rows.get()) is not _DONE:
+            yield item
+
+    queues = []
+    for account, factory in service_factories.items():
+        accounts[account] = {'exported': 0, 'failed': 0}
+        rows = queue.Queue(maxsize=ACCOUNT_QUEUE_ROWS)
+        threading.Thread(target=produce, args=(account, factory, rows), daemon=True,
+                         name=f'gmail-export-{account}').start()
+        queues.append(rows)
+
+    try:
+        merged = heapq.merge(*(drain(rows) for rows in queues), key=itemgetter(0), reverse=True)
+        for _, row in islice(merged, max_results):
+            accounts[row['Account']]['exported'] += 1
+            stats['exported'] += 1
+            yield row
+    finally:
+        stop.set()
+        stats['failed'] = sum(account_stats['failed'] for account_stats in accounts.values())
+
+
+def write_csv(rows: Iterator[dict], output_path: Path, fieldnames: list[str] = CSV_FIELDNAMES) -> int:
+    """
+    Write rows to a CSV file as they arrive, flushing periodically.
+
+    Args:
+        rows: Iterator of row dicts keyed by fieldnames
+        output_path: Destination file
+        fieldnames: Columns to write (default: CSV_FIELDNAMES)
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        last_flush = time.monotonic()
+        for row in rows:
+            if 'Labels' in row:
+                row = {**row, 'Labels': ','.join(row['Labels'])}
+            writer.writerow(row)
+            count += 1
+            if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                csvfile.flush()
+                last_flush = time.monotonic()
+    return count
+
+
+def write_jsonl_gz(rows: Iterator[dict], output_path: Path, fieldnames: list[str] = CSV_FIELDNAMES) -> int:
+    """
+    Write rows as gzip-compressed JSON Lines; datetime Dates become ISO 8601 strings.
+
+    Args:
+        rows: Iterator of row dicts keyed by fieldnames
+        output_path: Destination file
+        fieldnames: Columns to write (default: CSV_FIELDNAMES)
+
+    Returns:
+        Number of rows written
+    """
+    count = 0
+    with gzip.open(output_path, 'wt', encoding='utf-8', compresslevel=6) as jsonfile:
+        for row in rows:
+            record = {name: row.get(name) for name in fieldnames}
+            if isinstance(record['Date'], datetime):
+                record['Date'] = record['Date'].isoformat()
+            jsonfile.write(json.dumps(record, ensure_ascii=False))
+            jsonfile.write('\n')
+            count += 1
+    return count
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow exports need pyarrow from the 'columnar' extra: "
+                          "uv sync --extra columnar (or pip install pyarrow)") from None
+    return pyarrow
+
+
+def arrow_schema(fieldnames: list[str] = CSV_FIELDNAMES):
+    """Return the Arrow schema for the given export columns."""
+    pa = _import_pyarrow()
+    types = {'Date': pa.timestamp('ms', tz='UTC'), 'Labels': pa.list_(pa.string())}
+    return pa.schema([(name, types.get(name, pa.string())) for name in fieldnames])
+
+
+def write_columnar(rows: Iterator[dict], output_path: Path, fieldnames: list[str] = CSV_FIELDNAMES,
+                   output_format: str = 'parquet', batch_rows: int = RECORD_BATCH_ROWS) -> int:
+    """
+    Write rows to a zstd-compressed Parquet or Arrow IPC file in record batches.
+
+    Args:
+        rows: Iterator of row dicts keyed by fieldnames, with datetime Dates
+        output_path: Destination file
+        fieldnames: Columns to write (default: CSV_FIELDNAMES)
+        output_format: "parquet" or "arrow"
+        batch_rows: Rows buffered per record batch / row group
+
+    Returns:
+        Number of rows written
+    """
+    pa = _import_pyarrow()
+    schema = arrow_schema(fieldnames)
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(str(output_path), schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_file(str(output_path), schema,
+                                 options=pa.ipc.IpcWriteOptions(compression='zstd'))
+
+    # Buffer a batch as one list per column, so each row dict is dropped as soon as it is read
+    count = 0
+    columns = {name: [] for name in fieldnames}
+    buffered = 0
+    with writer:
+        for row in rows:
+            for name, values in columns.items():
+                values.append(row.get(name))
+            buffered += 1
+            if buffered >= batch_rows:
+                writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+                count += buffered
+                columns = {name: [] for name in fieldnames}
+                buffered = 0
+        if buffered or not count:
+            writer.write_batch(pa.RecordBatch.from_pydict(columns, schema=schema))
+            count += buffered
+    return count
+
+
+def write_rows(rows: Iterator[dict], output_path: Path, output_format: str = DEFAULT_EXPORT_FORMAT,
+               fieldnames: list[str] = CSV_FIELDNAMES) -> int:
+    """Write rows in the given export format and return how many were written."""
+    if output_format == 'csv':
+        return write_csv(rows, output_path, fieldnames)
+    if output_format == 'jsonl.gz':
+        return write_jsonl_gz(rows, output_path, fieldnames)
+    return write_columnar(rows, output_path, fieldnames, output_format)
+
+
+def export_messages(service_factory: Callable[[], Any] | dict[str, Callable[[], Any]], output_path: Path,
+                    query: str = "",
+                    max_results: int | None = None,
+                    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                    snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                    output_format: str = DEFAULT_EXPORT_FORMAT,
+                    include_labels: bool = False, include_body: bool = False) -> dict:
+    """
+    Export messages matching a query to a file with constant memory use.
+
+    Args:
+        service_factory: Callable returning a new authorized Gmail API service, or a
+            dict of them keyed by account name to export several accounts merged
+            newest first, with an Account column (see iter_merged_export_rows)
+        output_path: Destination file
+        query: Gmail search query (optional)
+        max_results: Maximum number of messages to export (default: no limit)
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+        snippet_source: "api" (Gmail's snippet, metadata-only fetch) or "body" (default: "api")
+        output_format: "csv", "parquet", "arrow" or "jsonl.gz" (default: "csv")
+        include_labels: Add a 'Labels' column with each message's label IDs
+        include_body: Add a 'Body' column with the full decoded body (fetches full messages)
+
+    Returns:
+        Dict with 'exported' and 'failed' message counts (and per-account
+        counts and errors under 'accounts' for a multi-account export)
+
+    Raises:
+        ValueError: If snippet_source or output_format is unknown
+        ImportError: If a columnar format is requested without pyarrow installed
+    """
+    # Validate before the output file is created
+    check_export_options(snippet_source, output_format)
+    if output_format in ('parquet', 'arrow'):
+        _import_pyarrow()
+
+    stats = {}
+    merged = isinstance(service_factory, dict)
+    iter_rows = iter_merged_export_rows if merged else iter_export_rows
+    rows = iter_rows(service_factory, query, max_results, max_concurrency, stats, snippet_source,
+                     include_labels=include_labels, include_body=include_body, parse_dates=output_format != 'csv')
+    write_rows(rows, output_path, output_format, export_fieldnames(include_labels, include_body, merged))
+    return stats
+
+
+def export_messages_text(output_dir: Path, output_filename: str = "", query: str = "", max_results: int | None = None,
+                         max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                         snippet_source: str = DEFAULT_SNIPPET_SOURCE,
+                         output_format: str = DEFAULT_EXPORT_FORMAT,
+                         include_labels: bool = False, include_body: bool = False,
+                         accounts: str | list[str] = "") -> str:
+    """
+    Export the messages matching a query, given a tool's arguments, and describe the result.
+
+    Args:
+        output_dir: Directory output_filename is relative to
+        output_filename: Output filename (default: gmail_export_TIMESTAMP plus the format's extension)
+        accounts: A tool's accounts argument (see accounts.resolve_accounts)
+
+    The other arguments are those of export_messages.
+    """
+    try:
+        names = resolve_accounts(accounts)
+
+        # Generate default filename if not provided
+        if not output_filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_filename = f"gmail_export_{timestamp}{EXPORT_FORMATS.get(output_format, '')}"
+        output_path = output_dir / output_filename
+
+        stats = export_messages(
+            partial(get_gmail_service, names[0]) if len(names) == 1 else
+            {name: partial(get_gmail_service, name) for name in names},
+            output_path,
+            query=query,
+            max_results=max_results,
+            max_concurrency=max_concurrency,
+            snippet_source=snippet_source,
+            output_format=output_format,
+            include_labels=include_labels,
+            include_body=include_body
+        )
+
+        if not stats['exported'] and not stats['failed']:
+            output_path.unlink(missing_ok=True)
+            return "No messages found to export."
+
+        result = f"Successfully exported {stats['exported']} messages to: {output_path}\n\nFile contains: Message ID, From, To, Subject, Date, and Snippet (first {SNIPPET_CHARS} chars of {'body' if snippet_source == 'body' else 'Gmail snippet'})"
+        extra_columns = export_fieldnames(include_labels, include_body, len(names) > 1)[len(CSV_FIELDNAMES):]
+        if extra_columns:
+            result += f", plus {' and '.join(extra_columns)}"
+        if stats['failed']:
+            result += f"\n\nWarning: {stats['failed']} message(s) could not be fetched and were skipped"
+        errors = {name: counts['error'] for name, counts in stats.get('accounts', {}).items() if 'error' in counts}
+        if errors:
+            result += "\n\n" + "\n".join(format_account_errors(errors))
+        return result
+
+    except Exception as e:
+        return f"Error exporting to CSV: {str(e)}"
@@ -0,0 +1,102 @@
+"""Paginated message listing and a bounded-concurrency message fetch engine."""
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+from .defaults import DEFAULT_MAX_CONCURRENCY
+from .ratelimit import execute
+
+# Largest page messages().list() will return
+MAX_PAGE_SIZE = 500
+
+
+def iter_message_ids(service, query: str = "", max_results: int | None = None,
+                     **list_kwargs: Any) -> Iterator[str]:
+    """
+    Yield message IDs matching a query, following nextPageToken across pages.
+
+    Args:
+        service: Authorized Gmail API service
+        query: Gmail search query (optional)
+        max_results: Stop after this many IDs (default: no limit)
+        **list_kwargs: Extra arguments for messages().list() (e.g. labelIds)
+
+    Yields:
+        Message IDs in the order the API lists them
+    """
+    remaining = None if max_results is None else int(max_results)
+    page_token = None
+    while remaining is None or remaining > 0:
+        page_size = MAX_PAGE_SIZE if remaining is None else min(remaining, MAX_PAGE_SIZE)
+        results = execute(service.users().messages().list(
+            userId='me',
+            maxResults=page_size,
+            q=query,
+            pageToken=page_token,
+            **list_kwargs
+        ))
+
+        messages = results.get('messages', [])
+        for msg in messages:
+            yield msg['id']
+        if remaining is not None:
+            remaining -= len(messages)
+
+        page_token = results.get('nextPageToken')
+        if not page_token or not messages:
+            break
+
+
+def fetch_messages(service_factory: Callable[[], Any], message_ids: Iterable[str],
+                   max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                   transform: Callable[[dict], Any] | None = None,
+                   **get_kwargs: Any) -> Iterator[tuple[str, Any]]:
+    """
+    Fetch messages concurrently and yield them in input order.
+
+    Each worker thread builds its own service through service_factory, so no
+    HTTP client is shared between threads. At most 2 * max_concurrency fetches
+    are in flight at once, which keeps memory bounded for long ID streams.
+
+    Args:
+        service_factory: Callable returning a new authorized Gmail API service
+        message_ids: IDs of the messages to fetch (any iterable, consumed lazily)
+        max_concurrency: Number of worker threads (default: 8)
+        transform: Applied to each message resource in its worker thread, so only
+            the (smaller) result waits in the in-flight window, e.g. building a
+            MessageRecord; its exceptions are yielded like fetch errors
+        **get_kwargs: Extra arguments for messages().get() (e.g. format='full')
+
+    Yields:
+        (message_id, result) pairs in the order of message_ids, where result is
+        the message resource (or its transform) or the exception raised while fetching it
+    """
+    max_concurrency = max(1, int(max_concurrency))
+    local = threading.local()
+
+    def fetch(message_id: str) -> Any:
+        service = getattr(local, 'service', None)
+        if service is None:
+            service = local.service = service_factory()
+        try:
+            message = execute(service.users().messages().get(
+                userId='me',
+                id=message_id,
+                **get_kwargs
+            ))
+            return message if transform is None else transform(message)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='gmail-fetch') as pool:
+        pending = deque()
+        for message_id in message_ids:
+            pending.append((message_id, pool.submit(fetch, message_id)))
+            if len(pending) >= 2 * max_concurrency:
+                done_id, future = pending.popleft()
+                yield done_id, future.result()
+
+        while pending:
+            done_id, future = pending.popleft()
+            yield done_id, future.result()
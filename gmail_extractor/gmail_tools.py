@@ -1,231 +1,197 @@
 """Gmail extraction tools for the ADK agent."""
-import os
-import pickle
-import csv
-import base64
 from pathlib import Path
-from typing import List, Dict, Any
-from datetime import datetime
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-
-# Gmail API scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
-
-def get_gmail_service():
-    """Authenticate and return Gmail API service."""
-    creds = None
-    token_path = Path(__file__).parent.parent / 'private' / 'token.pickle'
-    client_secret_path = Path(__file__).parent.parent / 'private' / 'client_secret_184344902751-bdc92tjt9t9omprtouc2h8koarj8vvbf.apps.googleusercontent.com.json'
-
-    # Load existing credentials
-    if token_path.exists():
-        with open(token_path, 'rb') as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials, authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                str(client_secret_path), SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        # Save credentials for next time
-        token_path.parent.mkdir(exist_ok=True)
-        with open(token_path, 'wb') as token:
-            pickle.dump(creds, token)
-
-    return build('gmail', 'v1', credentials=creds)
-
-def list_messages(max_results: int = 10, query: str = "") -> str:
+
+from .accounts import list_messages_text, search_account_index
+from .analytics import analyze_text
+from .attachments import download_attachments_text
+from .cache import get_message_text
+from .defaults import (DEFAULT_ANALYSIS_RESULTS, DEFAULT_EXPORT_FORMAT, DEFAULT_MAX_BODY_CHARS, DEFAULT_MAX_CONCURRENCY,
+                       DEFAULT_MESSAGE_CHARS, DEFAULT_SEARCH_MODE, DEFAULT_SNIPPET_SOURCE, DEFAULT_TOP)
+from .export import export_messages_text
+from .labels import list_labels_text
+from .metrics import stats_text, timed_tool
+from .threads import get_thread_text
+
+# Exports and downloads are saved in the repository root
+OUTPUT_DIR = Path(__file__).parent.parent
+
+@timed_tool('list_messages')
+def list_messages(max_results: int = 10, query: str = "", accounts: str = "") -> str:
     """
     List Gmail messages.
 
     Args:
         max_results: Maximum number of messages to return (default: 10)
         query: Gmail search query (e.g., "from:example@gmail.com", "subject:invoice")
+        accounts: Comma-separated account names, or "all"; several accounts are searched
+            in parallel and merged newest first (default: the default account)
 
     Returns:
         A formatted string with message information
     """
-    try:
-        service = get_gmail_service()
-        results = service.users().messages().list(
-            userId='me',
-            maxResults=max_results,
-            q=query
-        ).execute()
+    return list_messages_text(max_results, query, accounts)
+
+@timed_tool('get_message_content')
+def get_message_content(message_id: str, offset: int = 0, max_chars: int = DEFAULT_MAX_BODY_CHARS,
+                        plain_text: bool = True, include_labels: bool = False) -> str:
+    """
+    Get the content of a specific Gmail message, one page of the body at a time.
+
+    Args:
+        message_id: The ID of the message to retrieve
+        offset: Character offset in the body to start from; pass the offset given at
+            the end of a truncated page to continue reading (default: 0)
+        max_chars: Maximum body characters to return, 0 for no limit (default: 20000)
+        plain_text: Convert HTML to plain text, collapse whitespace and strip
+            tracking parameters from links before paging (default: True)
+        include_labels: Also show the message's current label IDs (e.g. UNREAD), which
+            costs one small extra request when the content is cached (default: False)
+
+    Returns:
+        The headers (on the first page) and the requested page of the body
+    """
+    return get_message_text(message_id, offset, max_chars, plain_text, include_labels)
+
+@timed_tool('get_gmail_thread')
+def get_gmail_thread(thread_id: str, collapse_quotes: bool = True,
+                     max_chars_per_message: int = DEFAULT_MESSAGE_CHARS) -> str:
+    """
+    Get a whole conversation (every message in a thread) in one request.
 
-        messages = results.get('messages', [])
+    Args:
+        thread_id: The thread's ID, or the ID of any message in the thread
+        collapse_quotes: Replace quoted text that repeats earlier messages of the
+            thread with a short marker (default: True)
+        max_chars_per_message: Truncate each message body to this many characters,
+            0 for no limit (default: 5000)
 
-        if not messages:
-            return "No messages found."
+    Returns:
+        The thread's messages, oldest first, with headers and bodies
+    """
+    return get_thread_text(thread_id, collapse_quotes, max_chars_per_message)
 
-        output = []
-        for msg in messages:
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['From', 'Subject', 'Date']
-            ).execute()
+@timed_tool('list_labels')
+def list_labels(include_system: bool = True) -> str:
+    """
+    List Gmail labels with their message and unread counts, to size a job before fetching it.
 
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-            output.append(f"ID: {msg['id']}")
-            output.append(f"From: {headers.get('From', 'N/A')}")
-            output.append(f"Subject: {headers.get('Subject', 'N/A')}")
-            output.append(f"Date: {headers.get('Date', 'N/A')}")
-            output.append("-" * 80)
+    Args:
+        include_system: Include system labels such as INBOX and UNREAD (default: True)
 
-        return "\n".join(output)
-    except Exception as e:
-        return f"Error listing messages: {str(e)}"
+    Returns:
+        One line per label: name, ID, type, and message/thread totals and unread counts
+    """
+    return list_labels_text(include_system)
 
-def get_message_content(message_id: str) -> str:
+@timed_tool('analyze_gmail')
+def analyze_gmail(query: str = "", label: str = "", max_results: int = DEFAULT_ANALYSIS_RESULTS,
+                  source: str = "remote", top: int = DEFAULT_TOP, interval: str = "month",
+                  group_by: str = "sender") -> str:
     """
-    Get the full content of a specific Gmail message.
+    Summarize many messages at once: top senders, volume over time, sizes and label counts.
+
+    Only the small aggregate tables are returned, never the messages themselves.
 
     Args:
-        message_id: The ID of the message to retrieve
+        query: Gmail search query limiting the messages analyzed (remote source only)
+        label: Only analyze messages with this label, by name or ID
+        max_results: Newest messages analyzed, 0 for all (default: 1000)
+        source: "remote" fetches metadata through the Gmail API (any query); "mirror"
+            syncs the local mailbox mirror and analyzes it, which is fast for whole
+            mailboxes once the first sync has run (default: "remote")
+        top: Number of senders or domains to rank (default: 10)
+        interval: Histogram bucket: "day", "week", "month" or "year" (default: "month")
+        group_by: Rank by "sender" address or by "domain" (default: "sender")
 
     Returns:
-        The message content as a string
-    """
-    try:
-        service = get_gmail_service()
-        message = service.users().messages().get(
-            userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
-
-        # Extract headers
-        headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-        # Extract body
-        def get_body(payload):
-            if 'body' in payload and 'data' in payload['body']:
-                import base64
-                return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
-            elif 'parts' in payload:
-                for part in payload['parts']:
-                    body = get_body(part)
-                    if body:
-                        return body
-            return ""
-
-        body = get_body(message['payload'])
-
-        output = []
-        output.append(f"From: {headers.get('From', 'N/A')}")
-        output.append(f"To: {headers.get('To', 'N/A')}")
-        output.append(f"Subject: {headers.get('Subject', 'N/A')}")
-        output.append(f"Date: {headers.get('Date', 'N/A')}")
-        output.append("-" * 80)
-        output.append(body)
-
-        return "\n".join(output)
-    except Exception as e:
-        return f"Error retrieving message: {str(e)}"
-
-def search_messages(query: str, max_results: int = 20) -> str:
+        Totals, the top senders by message count and size, a message histogram
+        over time and per-label counts
+    """
+    return analyze_text(query, label, max_results, source, top, interval, group_by)
+
+@timed_tool('search_messages')
+def search_messages(query: str, max_results: int = 20, mode: str = DEFAULT_SEARCH_MODE, accounts: str = "") -> str:
     """
     Search Gmail messages using Gmail query syntax.
 
     Args:
         query: Gmail search query (e.g., "from:example@gmail.com", "subject:invoice", "newer_than:7d")
         max_results: Maximum number of messages to return (default: 20)
+        mode: "remote" to search through the Gmail API, or "local" to search the offline
+            index of messages already fetched (default: GMAIL_SEARCH_MODE env var, else "remote")
+        accounts: Comma-separated account names, or "all", to search in parallel; local mode
+            searches one account's index (default: the default account)
 
     Returns:
         A formatted string with matching messages
     """
-    return list_messages(max_results=max_results, query=query)
-
-def export_to_csv(query: str = "", max_results: int = 100, output_filename: str = "") -> str:
+    if mode == "local":
+        return search_account_index(accounts, query, max_results)
+    return list_messages_text(max_results, query, accounts)
+
+@timed_tool('export_to_csv')
+def export_to_csv(query: str = "", max_results: int = 100, output_filename: str = "",
+                  max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                  snippet_source: str = DEFAULT_SNIPPET_SOURCE, format: str = DEFAULT_EXPORT_FORMAT,
+                  include_labels: bool = False, include_body: bool = False, accounts: str = "") -> str:
     """
-    Export Gmail messages to a CSV file.
+    Export Gmail messages to a CSV (or Parquet / Arrow / JSONL) file.
+
+    Rows are streamed to disk as messages arrive, following result pages until
+    max_results messages have been exported.
 
     Args:
         query: Gmail search query to filter messages (optional)
         max_results: Maximum number of messages to export (default: 100)
-        output_filename: Output CSV filename (default: gmail_export_TIMESTAMP.csv)
+        output_filename: Output filename (default: gmail_export_TIMESTAMP plus the format's extension)
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+        snippet_source: "api" to use Gmail's own snippet with a lightweight metadata fetch,
+            or "body" to download full messages and take the snippet from the body (default: "api")
+        format: "csv", "parquet" or "arrow" (zstd-compressed, needs the "columnar" extra) or "jsonl.gz";
+            all but CSV store Date as a UTC timestamp (default: "csv")
+        include_labels: Add a Labels column with each message's label IDs
+        include_body: Add a Body column with the full message text (fetches full messages)
+        accounts: Comma-separated account names, or "all"; several accounts are exported in
+            parallel, merged newest first, with an Account column (default: the default account)
 
     Returns:
         Success message with file path
     """
-    try:
-        # Generate default filename if not provided
-        if not output_filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"gmail_export_{timestamp}.csv"
-
-        # Save in parent directory
-        output_path = Path(__file__).parent.parent / output_filename
-
-        service = get_gmail_service()
-        results = service.users().messages().list(
-            userId='me',
-            maxResults=max_results,
-            q=query
-        ).execute()
-
-        messages = results.get('messages', [])
-
-        if not messages:
-            return "No messages found to export."
-
-        # Collect message data
-        email_data = []
-        for msg in messages:
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='full'
-            ).execute()
-
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-            # Extract body snippet
-            def get_body_snippet(payload):
-                if 'body' in payload and 'data' in payload['body'] and payload['body']['data']:
-                    try:
-                        body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-                        # Return first 200 characters
-                        return body[:200].replace('\n', ' ').replace('\r', ' ')
-                    except:
-                        return ""
-                elif 'parts' in payload:
-                    for part in payload['parts']:
-                        snippet = get_body_snippet(part)
-                        if snippet:
-                            return snippet
-                return ""
-
-            body_snippet = get_body_snippet(message['payload'])
-
-            email_data.append({
-                'Message ID': msg['id'],
-                'From': headers.get('From', 'N/A'),
-                'To': headers.get('To', 'N/A'),
-                'Subject': headers.get('Subject', 'N/A'),
-                'Date': headers.get('Date', 'N/A'),
-                'Snippet': body_snippet or message.get('snippet', '')
-            })
-
-        # Write to CSV
-        with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for row in email_data:
-                writer.writerow(row)
-
-        return f"Successfully exported {len(email_data)} messages to: {output_path}\n\nFile contains: Message ID, From, To, Subject, Date, and Snippet (first 200 chars of body)"
-
-    except Exception as e:
-        return f"Error exporting to CSV: {str(e)}"
+    return export_messages_text(OUTPUT_DIR, output_filename, query, max_results, max_concurrency, snippet_source,
+                                format, include_labels, include_body, accounts)
+
+@timed_tool('download_attachments')
+def download_attachments(query: str = "", max_results: int = 10, output_dir: str = "", mime_type: str = "",
+                         max_concurrency: int = DEFAULT_MAX_CONCURRENCY) -> str:
+    """
+    Download the attachments of the messages matching a query.
+
+    Attachments are fetched in parallel and streamed to disk; files with identical
+    content are stored once, and attachments saved by an earlier run are skipped.
+
+    Args:
+        query: Gmail search query (e.g., "label:payments", "from:billing@example.com");
+            only messages with attachments are considered
+        max_results: Maximum number of messages to download from (default: 10)
+        output_dir: Directory to save attachments in (default: attachments)
+        mime_type: Only download attachments of this MIME type, e.g. "application/pdf" (optional)
+        max_concurrency: Number of parallel downloads (default: 8)
+
+    Returns:
+        A summary of the files saved
+    """
+    return download_attachments_text(OUTPUT_DIR / (output_dir or 'attachments'), query, max_results, mime_type,
+                                     max_concurrency)
+
+def gmail_server_stats(format: str = "text") -> str:
+    """
+    Report runtime metrics: per-tool and per-API-method latency (p50/p95/p99),
+    request counts, estimated quota units, bytes received, retries and cache hits.
+
+    Args:
+        format: "text" for a readable summary or "prometheus" for the Prometheus text format (default: "text")
+
+    Returns:
+        The metrics report
+    """
+    return stats_text(format)
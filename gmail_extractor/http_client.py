@@ -0,0 +1,17 @@
+"""Authorized HTTP client for the Gmail API service.
+
+Kept apart from service.py because it needs httplib2 and google-auth's
+transport at class definition time; service.py imports it on first use.
+"""
+import google_auth_httplib2
+
+from .metrics import get_metrics
+
+
+class MeteredHttp(google_auth_httplib2.AuthorizedHttp):
+    """AuthorizedHttp that counts the response bytes it receives."""
+
+    def request(self, *args, **kwargs):
+        response, content = super().request(*args, **kwargs)
+        get_metrics().add_bytes(len(content or b''))
+        return response, content
@@ -0,0 +1,143 @@
+"""Label name -> ID resolution and per-label message counts.
+
+Searching with q='label:NAME' goes through Gmail's full-text search, which
+wants names respelled (spaces and '/' become '-') and matches loosely.
+Listing with labelIds is exact and skips the search engine, but needs the
+label's ID, so the map built from users.labels.list is cached for the
+process and reloaded only when a lookup misses (e.g. a label created since).
+User label IDs differ between mailboxes, so each account has its own map.
+"""
+import re
+import threading
+
+from .batching import batch_get
+from .ratelimit import account_of, execute
+from .service import get_gmail_service
+
+SEARCH_SPELLING_RE = re.compile(r'[\s/]+')
+
+
+def search_spelling(name: str) -> str:
+    """Return a label name the way label: searches spell it ("Projects/Gmail MCP" -> "projects-gmail-mcp")."""
+    return SEARCH_SPELLING_RE.sub('-', name.strip()).lower()
+
+
+class LabelCache:
+    """Process-wide map from label names (and their search spellings) to label IDs."""
+
+    def __init__(self):
+        self._labels: list[dict] | None = None
+        self._ids: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def load(self, service) -> list[dict]:
+        """(Re)load the labels with one users.labels.list call."""
+        labels = execute(service.users().labels().list(userId='me')).get('labels', [])
+        ids = {}
+        # Looser spellings first, so an exact name wins when two labels collide
+        for label in labels:
+            ids[search_spelling(label['name'])] = label['id']
+        for label in labels:
+            ids[label['name'].lower()] = label['id']
+        for label in labels:
+            ids[label['name']] = ids[label['id']] = label['id']
+        with self._lock:
+            self._labels, self._ids = labels, ids
+            self.loads += 1
+        return labels
+
+    def labels(self, service, refresh: bool = False) -> list[dict]:
+        """Return the label resources (ID, name, type), loading them if needed."""
+        with self._lock:
+            labels = self._labels
+        return self.load(service) if labels is None or refresh else labels
+
+    def cached_id(self, name: str) -> str | None:
+        """Return the ID of a label from the loaded map only (no API call); None if unknown."""
+        with self._lock:
+            for key in (name, name.lower(), search_spelling(name)):
+                if key in self._ids:
+                    return self._ids[key]
+        return None
+
+    def resolve(self, service, name: str) -> str:
+        """
+        Return the ID of a label given its name, its label: search spelling or its ID.
+
+        Raises:
+            ValueError: No such label, even after reloading the list
+        """
+        label_id = self.cached_id(name)
+        if label_id is None:
+            # Not loaded yet, or the label is newer than the loaded list
+            self.load(service)
+            label_id = self.cached_id(name)
+        if label_id is None:
+            raise ValueError(f"No Gmail label named '{name}'")
+        return label_id
+
+
+_label_cache = LabelCache()
+_account_label_caches: dict[str, LabelCache] = {}
+_account_lock = threading.Lock()
+
+
+def get_label_cache(account: str | None = None) -> LabelCache:
+    """Return the label cache of a named additional account, or the process-wide one (None: the default account)."""
+    if account is None:
+        return _label_cache
+    with _account_lock:
+        return _account_label_caches.setdefault(account, LabelCache())
+
+
+def list_labels_with_counts(service, include_system: bool = True) -> list[tuple[dict, dict | Exception]]:
+    """
+    Return every label with its message and thread counts.
+
+    labels.list carries no counts, so the labels are fetched with labels.get
+    through the batch endpoint: one round-trip for up to 100 labels.
+
+    Args:
+        service: Authorized Gmail API service
+        include_system: Include system labels (INBOX, UNREAD, CATEGORY_...) as well as user labels
+
+    Returns:
+        (label, its labels.get resource or the exception raised for it) pairs,
+        user labels first, then by name
+    """
+    labels = get_label_cache(account_of(service)).labels(service, refresh=True)
+    if not include_system:
+        labels = [label for label in labels if label.get('type') == 'user']
+    labels = sorted(labels, key=lambda label: (label.get('type') != 'user', label['name'].lower()))
+    results = batch_get(
+        service,
+        [label['id'] for label in labels],
+        lambda label_id: service.users().labels().get(userId='me', id=label_id),
+        'gmail.users.labels.get'
+    )
+    return list(zip(labels, results))
+
+
+def format_labels(labels: list[tuple[dict, dict | Exception]]) -> str:
+    """Describe list_labels_with_counts() results for a tool response."""
+    if not labels:
+        return "No labels found."
+
+    output = []
+    for label, counts in labels:
+        line = f"{label['name']} (ID: {label['id']}, {label.get('type', 'user')}): "
+        if isinstance(counts, Exception):
+            output.append(line + f"Error: {str(counts)}")
+            continue
+        output.append(line + f"{counts.get('messagesTotal', 0)} messages, {counts.get('messagesUnread', 0)} unread; "
+                             f"{counts.get('threadsTotal', 0)} threads, {counts.get('threadsUnread', 0)} unread")
+    return "\n".join(output)
+
+
+def list_labels_text(include_system: bool = True) -> str:
+    """List the default account's labels with their counts for a tool response."""
+    try:
+        return format_labels(list_labels_with_counts(get_gmail_service(), include_system))
+    except Exception as e:
+        return f"Error listing labels: {str(e)}"
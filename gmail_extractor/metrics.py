@@ -0,0 +1,328 @@
+"""In-process runtime metrics for the Gmail tools and API calls.
+
+Latencies are kept in fixed-bucket histograms (like Prometheus' own), so
+recording is O(1) and memory stays constant however long the server runs;
+p50/p95/p99 are interpolated from the buckets. Everything is exposed as a
+snapshot dict, a readable summary and Prometheus text exposition format.
+Scheduler and cache counters are kept per Gmail account and reported with
+an account label.
+"""
+import bisect
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+
+# Histogram bucket upper bounds in seconds, from 1 ms to 60 s
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRIC_PREFIX = 'gmail'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count, sum, min and max."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One extra slot for observations above the last bound (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate the q-quantile by linear interpolation within its bucket, clamped to the observed range."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(self.max, max(self.min, estimate))
+            seen += bucket_count
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else 0.0,
+            **{f'p{round(q * 100)}': self.quantile(q) for q in QUANTILES},
+            'max': self.max,
+        }
+
+
+class Metrics:
+    """Thread-safe registry of tool and Gmail API call statistics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.tools: dict[str, Histogram] = {}
+        self.tool_errors: dict[str, int] = {}
+        self.api: dict[str, Histogram] = {}
+        self.api_errors: dict[str, int] = {}
+        self.quota_units: dict[str, int] = {}
+        self.bytes_received = 0
+
+    def observe_tool(self, name: str, seconds: float, error: bool = False):
+        with self._lock:
+            self.tools.setdefault(name, Histogram()).observe(seconds)
+            if error:
+                self.tool_errors[name] = self.tool_errors.get(name, 0) + 1
+
+    def observe_api(self, method: str, seconds: float, units: int, error: bool = False):
+        """Record one API round-trip attempt (retries are recorded separately)."""
+        with self._lock:
+            self.api.setdefault(method, Histogram()).observe(seconds)
+            self.quota_units[method] = self.quota_units.get(method, 0) + units
+            if error:
+                self.api_errors[method] = self.api_errors.get(method, 0) + 1
+
+    def add_bytes(self, count: int):
+        with self._lock:
+            self.bytes_received += count
+
+    def snapshot(self) -> dict:
+        """
+        Return all statistics, including scheduler and cache counters, as plain data.
+
+        'accounts' holds the scheduler and cache counters of every account used
+        so far, the default account first; 'retries' and 'throttled' are totals
+        across accounts, and 'concurrency_limit', 'cache' and 'query_cache' are
+        the default account's. Only caches already in use are reported (a cache
+        not used yet is None), so taking a snapshot never opens one.
+        """
+        from . import cache, query_cache
+        from .ratelimit import account_schedulers, get_scheduler
+        from .service import DEFAULT_ACCOUNT
+
+        schedulers = {DEFAULT_ACCOUNT: get_scheduler(), **account_schedulers()}
+        message_caches = cache.message_caches()
+        query_caches = query_cache.query_caches()
+        accounts = {}
+        for account in dict.fromkeys([*schedulers, *message_caches, *query_caches]):
+            stats = accounts[account] = {}
+            if account in schedulers:
+                scheduler = schedulers[account]
+                stats.update(retries=scheduler.retries, throttled=scheduler.throttled,
+                             concurrency_limit=scheduler.limiter.limit)
+            if account in message_caches:
+                stats['cache'] = message_caches[account].stats()
+            if account in query_caches:
+                stats['query_cache'] = query_caches[account].stats()
+
+        with self._lock:
+            snapshot = {
+                'uptime_seconds': time.time() - self.started,
+                'tools': {name: {**hist.summary(), 'errors': self.tool_errors.get(name, 0)}
+                          for name, hist in sorted(self.tools.items())},
+                'api': {method: {**hist.summary(), 'errors': self.api_errors.get(method, 0),
+                                 'quota_units': self.quota_units.get(method, 0)}
+                        for method, hist in sorted(self.api.items())},
+                'requests': sum(hist.count for hist in self.api.values()),
+                'quota_units': sum(self.quota_units.values()),
+                'bytes_received': self.bytes_received,
+            }
+        default = accounts[DEFAULT_ACCOUNT]
+        snapshot.update({
+            'retries': sum(stats.get('retries', 0) for stats in accounts.values()),
+            'throttled': sum(stats.get('throttled', 0) for stats in accounts.values()),
+            'concurrency_limit': default['concurrency_limit'],
+            'cache': default.get('cache'),
+            'query_cache': default.get('query_cache'),
+            'accounts': accounts,
+        })
+        return snapshot
+
+    def render_prometheus(self) -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {METRIC_PREFIX}_{name} {help_text}')
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f'{METRIC_PREFIX}_{name}{{{label_text}}} {value}' if label_text
+                             else f'{METRIC_PREFIX}_{name} {value}')
+
+        with self._lock:
+            for name, label, help_text, histograms in (
+                    ('tool_duration_seconds', 'tool', 'Tool invocation latency.', self.tools),
+                    ('api_request_duration_seconds', 'method', 'Gmail API round-trip latency.', self.api)):
+                metric(name, 'histogram', help_text, [])
+                for key, hist in sorted(histograms.items()):
+                    key = _escape(key)
+                    cumulative = 0
+                    for bound, bucket_count in zip((*hist.buckets, '+Inf'), hist.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{METRIC_PREFIX}_{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{METRIC_PREFIX}_{name}_sum{{{label}="{key}"}} {hist.sum}')
+                    lines.append(f'{METRIC_PREFIX}_{name}_count{{{label}="{key}"}} {hist.count}')
+
+        metric('tool_errors_total', 'counter', 'Tool invocations that failed.',
+               [({'tool': name}, stats['errors']) for name, stats in snapshot['tools'].items()])
+        metric('api_errors_total', 'counter', 'Gmail API attempts that failed.',
+               [({'method': method}, stats['errors']) for method, stats in snapshot['api'].items()])
+        metric('quota_units_total', 'counter', 'Estimated Gmail quota units spent.',
+               [({'method': method}, stats['quota_units']) for method, stats in snapshot['api'].items()])
+        metric('bytes_received_total', 'counter', 'Response bytes received from the Gmail API.',
+               [({}, snapshot['bytes_received'])])
+        schedulers = {account: stats for account, stats in snapshot['accounts'].items() if 'retries' in stats}
+        caches = {account: stats['cache'] for account, stats in snapshot['accounts'].items() if 'cache' in stats}
+        query_caches = {account: stats['query_cache'] for account, stats in snapshot['accounts'].items()
+                        if 'query_cache' in stats}
+        metric('retries_total', 'counter', 'Gmail API calls retried after a transient failure.',
+               [({'account': account}, stats['retries']) for account, stats in schedulers.items()])
+        metric('throttled_total', 'counter', 'Gmail API calls rejected for rate limiting.',
+               [({'account': account}, stats['throttled']) for account, stats in schedulers.items()])
+        metric('concurrency_limit', 'gauge', 'Current adaptive concurrency limit.',
+               [({'account': account}, stats['concurrency_limit']) for account, stats in schedulers.items()])
+        metric('cache_lookups_total', 'counter', 'Message cache lookups by result.',
+               [({'account': account, 'result': result}, cache[result]) for account, cache in caches.items()
+                for result in ('memory_hits', 'disk_hits', 'misses')])
+        metric('cache_bytes', 'gauge', 'Message cache size by tier.',
+               [({'account': account, 'tier': tier}, cache[f'{tier}_bytes']) for account, cache in caches.items()
+                for tier in ('memory', 'disk')])
+        metric('query_cache_lookups_total', 'counter', 'List/search query cache lookups by result.',
+               [({'account': account, 'result': result}, query_cache[result])
+                for account, query_cache in query_caches.items()
+                for result in ('hits', 'revalidated', 'coalesced', 'misses')])
+        metric('query_cache_invalidations_total', 'counter', 'Cached query results dropped after a mailbox change.',
+               [({'account': account}, query_cache['invalidated']) for account, query_cache in query_caches.items()])
+        metric('uptime_seconds', 'gauge', 'Seconds since the metrics registry was created.',
+               [({}, round(snapshot['uptime_seconds'], 3))])
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: Path):
+        """Write the Prometheus text dump atomically (e.g. for node_exporter's textfile collector)."""
+        path = Path(path)
+        temp_path = path.with_name(f'.{path.name}.tmp')
+        try:
+            temp_path.write_text(self.render_prometheus(), encoding='utf-8')
+            temp_path.replace(path)
+        except OSError:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_stats(snapshot: dict) -> str:
+    """Render a snapshot as a short human-readable report."""
+    def ms(seconds):
+        return f'{seconds * 1000:.0f}ms'
+
+    def table(title, rows):
+        output = [title]
+        if not rows:
+            output.append('  (none yet)')
+        for name, stats in rows.items():
+            line = (f"  {name}: {stats['count']} calls, p50 {ms(stats['p50'])}, p95 {ms(stats['p95'])}, "
+                    f"p99 {ms(stats['p99'])}, max {ms(stats['max'])}, {stats['errors']} errors")
+            if 'quota_units' in stats:
+                line += f", {stats['quota_units']} quota units"
+            output.append(line)
+        return output
+
+    output = [f"Uptime: {snapshot['uptime_seconds']:.0f}s", '']
+    output += table('Tools:', snapshot['tools'])
+    output.append('')
+    output += table('Gmail API methods:', snapshot['api'])
+    output.append('')
+    output.append(f"Requests: {snapshot['requests']}, quota units: {snapshot['quota_units']}, "
+                  f"received: {snapshot['bytes_received'] / 2**20:.1f} MiB")
+    output.append(f"Retries: {snapshot['retries']} ({snapshot['throttled']} throttled), "
+                  f"concurrency limit: {snapshot['concurrency_limit']}")
+    cache = snapshot['cache']
+    if cache is None:
+        output.append("Message cache: not used yet")
+    else:
+        output.append(f"Message cache: {cache['memory_hits']} memory hits, {cache['disk_hits']} disk hits, "
+                      f"{cache['misses']} misses (hit ratio {cache['hit_ratio']:.0%})")
+    query_cache = snapshot['query_cache']
+    if query_cache is None:
+        output.append("Query cache: not used yet")
+    else:
+        output.append(f"Query cache: {query_cache['hits']} hits, {query_cache['revalidated']} revalidated, "
+                      f"{query_cache['coalesced']} coalesced, {query_cache['misses']} misses, "
+                      f"{query_cache['invalidated']} invalidated (hit ratio {query_cache['hit_ratio']:.0%})")
+
+    # Counters of the additional accounts; the lines above give the default account's caches
+    for account, stats in list(snapshot['accounts'].items())[1:]:
+        parts = []
+        if 'retries' in stats:
+            parts.append(f"{stats['retries']} retries ({stats['throttled']} throttled), "
+                         f"concurrency limit {stats['concurrency_limit']}")
+        if 'cache' in stats:
+            parts.append(f"message cache hit ratio {stats['cache']['hit_ratio']:.0%}")
+        if 'query_cache' in stats:
+            parts.append(f"query cache {stats['query_cache']['hits']} hits, {stats['query_cache']['misses']} misses "
+                         f"(hit ratio {stats['query_cache']['hit_ratio']:.0%})")
+        output.append(f"Account '{account}': " + '; '.join(parts))
+    return '\n'.join(output)
+
+
+_metrics = Metrics()
+
+
+def get_metrics() -> Metrics:
+    """Return the process-wide metrics registry."""
+    return _metrics
+
+
+def stats_text(output_format: str = 'text', output_path: Path | None = None) -> str:
+    """
+    Render the process-wide metrics for a tool response.
+
+    Args:
+        output_format: "text" for format_stats' summary or "prometheus" for the text exposition format
+        output_path: Also write the Prometheus dump to this file (optional)
+    """
+    metrics = get_metrics()
+    if output_path is not None:
+        try:
+            metrics.write_prometheus(output_path)
+        except OSError as e:
+            return f"Error writing metrics to {output_path}: {str(e)}"
+    return metrics.render_prometheus() if output_format == 'prometheus' else format_stats(metrics.snapshot())
+
+
+def timed_tool(name: str):
+    """Decorator recording each call of a tool function under `name`.
+
+    Tools report failures as "Error ..." strings rather than raising, so
+    such results are counted as errors too.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = isinstance(result, str) and result.startswith('Error')
+                return result
+            finally:
+                _metrics.observe_tool(name, time.perf_counter() - start, error=error)
+        return wrapper
+    return decorator
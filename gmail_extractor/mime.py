@@ -0,0 +1,348 @@
+"""Text extraction from Gmail message payloads.
+
+A payload is a tree of MIME parts. The walker visits it iteratively in
+document order, skips attachments without decoding them, prefers text/plain
+over text/html and decodes each part with its declared charset. When only a
+prefix of the text is wanted, only the base64 prefix that can hold it is
+decoded.
+
+For reading bodies page by page, TextReducer turns text incrementally into
+compact plain text: HTML markup, styles and scripts are dropped, entities
+decoded, runs of whitespace collapsed, tracking parameters stripped from
+URLs and long redirect URLs cut down to their host. read_body() feeds it
+base64 blocks and stops as soon as the requested page is filled.
+"""
+import base64
+import binascii
+import codecs
+import html
+import re
+from typing import Iterator
+
+CHARSET_RE = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+
+# Elements dropped with their content, and the opening tags of ones not yet closed
+SKIP_RE = re.compile(r'<!--.*?-->|<(style|script|head|title)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+SKIP_OPEN_RE = re.compile(r'<!--|<(?:style|script|head|title)\b', re.IGNORECASE)
+# Tags that end a line of text, and table cells that end a column
+BLOCK_TAG_RE = re.compile(r'<(?:br|hr|/?p|/?div|/?tr|/?li|/?h[1-6]|/?table|/?blockquote|/?ul|/?ol)\b[^>]*>',
+                          re.IGNORECASE)
+CELL_TAG_RE = re.compile(r'</t[dh]\s*>', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+
+SPACE_RE = re.compile(r'[^\S\n]+')
+NEWLINE_SPACE_RE = re.compile(r' ?\n ?')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+
+URL_RE = re.compile(r'https?://[^\s<>"\'()\[\]]+')
+# Query parameters added by mail campaign and ad click trackers
+TRACKING_PARAM_RE = re.compile(
+    r'(?:utm_\w+|mc_cid|mc_eid|fbclid|gclid|dclid|msclkid|mkt_tok|_hsenc|_hsmi|oly_anon_id|oly_enc_id|vero_id)$',
+    re.IGNORECASE
+)
+
+# Longer URLs (typically opaque click-tracking redirects) are cut down to their host
+MAX_URL_CHARS = 100
+
+DEFAULT_CHARSET = 'utf-8'
+
+# Upper bound on encoded bytes per character for the charsets mail uses
+MAX_BYTES_PER_CHAR = 4
+
+# base64 characters decoded per step when reading a body incrementally (a multiple of 4)
+DECODE_BLOCK_CHARS = 16 * 1024
+
+
+def _header(part: dict, name: str) -> str:
+    name = name.lower()
+    for header in part.get('headers', []):
+        if header['name'].lower() == name:
+            return header['value']
+    return ''
+
+
+def is_attachment(part: dict) -> bool:
+    """True for parts that are files rather than message text."""
+    if part.get('filename') or part.get('body', {}).get('attachmentId'):
+        return True
+    return _header(part, 'Content-Disposition').lower().startswith('attachment')
+
+
+def part_charset(part: dict) -> str:
+    """Return the part's declared charset, falling back to UTF-8 for missing or unknown ones."""
+    match = CHARSET_RE.search(_header(part, 'Content-Type'))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return DEFAULT_CHARSET
+
+
+def decode_data(data: str, charset: str = DEFAULT_CHARSET, max_chars: int | None = None) -> str:
+    """
+    Decode a base64url body, optionally only far enough to produce max_chars characters.
+
+    Args:
+        data: The part's body.data (base64url)
+        charset: Charset the decoded bytes are in
+        max_chars: Decode only the prefix needed for this many characters (default: all)
+
+    Returns:
+        The decoded text ('' if the data is not valid base64)
+    """
+    if max_chars is not None:
+        # Every 4 base64 characters hold 3 bytes; a cut mid-character is dropped by errors='ignore'
+        needed = -(-max_chars * MAX_BYTES_PER_CHAR // 3) * 4
+        if needed < len(data):
+            data = data[:needed]
+    data += '=' * (-len(data) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(data)
+    except (binascii.Error, ValueError):
+        return ''
+    text = raw.decode(charset, errors='ignore')
+    return text if max_chars is None else text[:max_chars]
+
+
+def strip_tracking_params(url: str) -> str:
+    """Remove click-tracking parameters (utm_*, mc_eid, fbclid, ...) from a URL's query string."""
+    base, sep, rest = url.partition('?')
+    if not sep:
+        return url
+    query, hash_sep, fragment = rest.partition('#')
+    kept = [param for param in query.split('&')
+            if param and not TRACKING_PARAM_RE.match(param.partition('=')[0])]
+    return base + ('?' + '&'.join(kept) if kept else '') + hash_sep + fragment
+
+
+def shorten_url(url: str) -> str:
+    """Strip tracking parameters, then cut URLs still over MAX_URL_CHARS down to scheme and host."""
+    url = strip_tracking_params(url)
+    if len(url) <= MAX_URL_CHARS:
+        return url
+    scheme, _, rest = url.partition('://')
+    return f"{scheme}://{rest.split('/', 1)[0].split('?', 1)[0]}/..."
+
+
+class TextReducer:
+    """
+    Incrementally reduce a text or HTML body to compact plain text.
+
+    feed() accepts arbitrary slices of the decoded body and returns the text
+    that is final so far; input that could still change meaning (an unclosed
+    tag, style block or entity, or a word that may continue) is held back
+    until the next feed() or close().
+    """
+
+    def __init__(self, is_html: bool = False):
+        self.is_html = is_html
+        self._buffer = ''
+        self._whitespace = ''
+        self._started = False
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        buffer = self._buffer
+        if self.is_html:
+            buffer = SKIP_RE.sub('', buffer)
+        end = self._safe_end(buffer)
+        self._buffer = buffer[end:]
+        return self._emit(buffer[:end])
+
+    def close(self) -> str:
+        buffer, self._buffer = self._buffer, ''
+        if self.is_html:
+            # Whatever is left of an unterminated element or tag is not text
+            buffer = SKIP_RE.sub('', buffer)
+            match = SKIP_OPEN_RE.search(buffer)
+            if match:
+                buffer = buffer[:match.start()]
+            tag_start = buffer.rfind('<')
+            if tag_start != -1 and buffer.find('>', tag_start) == -1:
+                buffer = buffer[:tag_start]
+        return self._emit(buffer, final=True)
+
+    def _safe_end(self, buffer: str) -> int:
+        end = len(buffer)
+        if self.is_html:
+            match = SKIP_OPEN_RE.search(buffer)
+            if match:
+                end = match.start()
+            tag_start = buffer.rfind('<', 0, end)
+            if tag_start != -1 and buffer.find('>', tag_start, end) == -1:
+                end = tag_start
+        # Stop after the last whitespace or tag so words, entities and URLs are never split
+        boundary = max(buffer.rfind(char, 0, end) for char in ' \n\t>')
+        return boundary + 1 if boundary != -1 else (end if end > DECODE_BLOCK_CHARS else 0)
+
+    def _emit(self, text: str, final: bool = False) -> str:
+        if self.is_html:
+            text = BLOCK_TAG_RE.sub('\n', text)
+            text = CELL_TAG_RE.sub(' ', text)
+            text = html.unescape(TAG_RE.sub('', text))
+        text = URL_RE.sub(lambda match: shorten_url(match.group()), text)
+
+        # Trailing whitespace is carried over so runs spanning two feeds collapse as one
+        text = self._whitespace + text
+        content = text.rstrip()
+        self._whitespace = '' if final else text[len(content):]
+        if not content:
+            return ''
+        content = SPACE_RE.sub(' ', content)
+        content = BLANK_LINES_RE.sub('\n\n', NEWLINE_SPACE_RE.sub('\n', content))
+        if not self._started:
+            content = content.lstrip()
+            self._started = bool(content)
+        return content
+
+
+def html_to_text(markup: str) -> str:
+    """Convert an HTML body to plain text, dropping markup, scripts and styles."""
+    reducer = TextReducer(is_html=True)
+    return reducer.feed(markup) + reducer.close()
+
+
+def iter_decoded(data: str, charset: str = DEFAULT_CHARSET,
+                 block_chars: int = DECODE_BLOCK_CHARS) -> Iterator[str]:
+    """Decode a base64url body block by block, yielding text as it is decoded."""
+    decoder = codecs.getincrementaldecoder(charset)(errors='ignore')
+    block_chars -= block_chars % 4
+    for start in range(0, len(data), block_chars):
+        block = data[start:start + block_chars]
+        last = start + block_chars >= len(data)
+        if last:
+            block += '=' * (-len(block) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(block)
+        except (binascii.Error, ValueError):
+            return
+        text = decoder.decode(raw, final=last)
+        if text:
+            yield text
+
+
+def iter_text_parts(payload: dict) -> Iterator[dict]:
+    """Yield the leaf parts carrying inline body data, in document order, skipping attachments."""
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        if part.get('parts'):
+            stack.extend(reversed(part['parts']))
+        elif part.get('body', {}).get('data') and not is_attachment(part):
+            yield part
+
+
+def _html_part_text(part: dict, max_chars: int | None) -> str:
+    charset = part_charset(part)
+    data = part['body']['data']
+    if max_chars is None:
+        return html_to_text(decode_data(data, charset))
+    # Markup takes up an unknown share of the prefix, so widen it until enough text remains
+    budget = max_chars
+    while True:
+        text = html_to_text(decode_data(data, charset, budget))
+        if len(text.strip()) >= max_chars or budget * MAX_BYTES_PER_CHAR >= len(data):
+            return text
+        budget *= 4
+
+
+def body_parts(payload: dict) -> tuple[list[dict], bool]:
+    """Return the parts making up the body (text/plain if any, else text/html) and whether they are HTML."""
+    plain, html_parts = [], []
+    for part in iter_text_parts(payload):
+        mime_type = part.get('mimeType', '')
+        if mime_type == 'text/plain':
+            plain.append(part)
+        elif mime_type == 'text/html':
+            html_parts.append(part)
+    return (plain, False) if plain else (html_parts, True)
+
+
+def get_body(payload: dict, max_chars: int | None = None, strip_html: bool = False) -> str:
+    """
+    Extract the readable body of a message payload.
+
+    Args:
+        payload: The message's payload
+        max_chars: Return at most this many characters, decoding only what is needed (default: all)
+        strip_html: Convert HTML to text when the message has no text/plain part
+
+    Returns:
+        The text/plain parts joined by newlines, else the text/html parts, else ''
+    """
+    parts, is_html = body_parts(payload)
+    chunks, remaining = [], max_chars
+    for part in parts:
+        if remaining is not None and remaining <= 0:
+            break
+        if not is_html or not strip_html:
+            text = decode_data(part['body']['data'], part_charset(part), remaining)
+        else:
+            text = _html_part_text(part, remaining)
+        chunks.append(text)
+        if remaining is not None:
+            remaining -= len(text) + 1
+    body = '\n'.join(chunks)
+    return body if max_chars is None else body[:max_chars]
+
+
+def get_body_snippet(payload: dict, max_chars: int = 200) -> str:
+    """Return the first max_chars characters of the body on a single line."""
+    if max_chars <= 0:
+        return ''
+    snippet = ' '.join(get_body(payload, max_chars=max_chars * 2, strip_html=True).split())
+    return snippet[:max_chars]
+
+
+def iter_body_text(payload: dict, reduce: bool = True) -> Iterator[str]:
+    """
+    Yield the body text piece by piece, decoding and reducing it incrementally.
+
+    Args:
+        payload: The message's payload
+        reduce: Pass the text through TextReducer (HTML to text, whitespace and
+            tracking parameters); False yields the decoded text unchanged
+    """
+    parts, is_html = body_parts(payload)
+    for index, part in enumerate(parts):
+        if index:
+            yield '\n'
+        blocks = iter_decoded(part['body']['data'], part_charset(part))
+        if not reduce:
+            yield from blocks
+            continue
+        reducer = TextReducer(is_html)
+        for block in blocks:
+            text = reducer.feed(block)
+            if text:
+                yield text
+        yield reducer.close()
+
+
+def read_body(payload: dict, offset: int = 0, max_chars: int | None = None,
+              reduce: bool = True) -> tuple[str, int | None]:
+    """
+    Return one page of the body text, decoding only as far as the page reaches.
+
+    Args:
+        payload: The message's payload
+        offset: Character offset of the page in the (reduced) body text
+        max_chars: Page length (default: the rest of the body)
+        reduce: Convert to compact plain text first (see iter_body_text)
+
+    Returns:
+        (text, next_offset), where next_offset is the offset of the following
+        page, or None when the page reaches the end of the body
+    """
+    offset = max(0, offset)
+    end = None if max_chars is None else offset + max(0, max_chars)
+    pieces, position = [], 0
+    for piece in iter_body_text(payload, reduce):
+        start, position = position, position + len(piece)
+        if position > offset and (end is None or start < end):
+            pieces.append(piece[max(0, offset - start):None if end is None else end - start])
+        # Stop once text beyond the page shows up (trailing whitespace alone does not count)
+        if end is not None and position > end and piece[max(0, end - start):].strip():
+            return ''.join(pieces), end
+    return ''.join(pieces), None
@@ -0,0 +1,244 @@
+"""Coalesced, short-lived cache of list/search results.
+
+Agents often repeat a query within seconds. Identical calls (same query,
+whitespace-normalized, and max_results) that overlap share one in-flight
+fetch, and completed results are kept for a short TTL. Every entry is tagged
+with the mailbox historyId from users.getProfile, read alongside the fetch.
+An entry is served as-is for a brief freshness window; after that it is
+revalidated with a single getProfile call (1 quota unit instead of a list
+call plus the metadata fetches) and dropped once the mailbox has changed.
+Each account has its own cache, since each has its own historyId.
+"""
+import os
+import threading
+import time
+from functools import partial
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from .batching import batch_get_messages
+from .ratelimit import account_of, execute
+from .search_index import index_messages
+from .service import DEFAULT_ACCOUNT, get_gmail_service
+
+# Seconds a result may be reused at all
+DEFAULT_TTL = float(os.environ.get('GMAIL_QUERY_CACHE_TTL', '60'))
+# Seconds a result is reused without checking the mailbox historyId
+DEFAULT_FRESH_SECONDS = float(os.environ.get('GMAIL_QUERY_CACHE_FRESH', '2'))
+DEFAULT_MAX_ENTRIES = 256
+
+LIST_HEADERS = ['From', 'Subject', 'Date']
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace; case is kept, since Gmail's OR/AND operators are uppercase only."""
+    return ' '.join(query.split())
+
+
+def mailbox_history_id(account: str = DEFAULT_ACCOUNT) -> str:
+    """Return the account's current mailbox historyId (one getProfile call)."""
+    return execute(get_gmail_service(account).users().getProfile(userId='me', fields='historyId'))['historyId']
+
+
+class QueryCache:
+    """Singleflight + TTL cache whose entries are invalidated when the mailbox historyId changes."""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, fresh_seconds: float = DEFAULT_FRESH_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 history_id: Callable[[], str] = mailbox_history_id):
+        """
+        Args:
+            ttl: Seconds a result may be reused at all
+            fresh_seconds: Seconds a result is reused without revalidating it
+            max_entries: Results kept, least recently used evicted first
+            history_id: Returns the mailbox's current historyId
+        """
+        self.ttl = ttl
+        self.fresh_seconds = fresh_seconds
+        self.max_entries = max_entries
+        self.history_id = history_id
+        # key -> [value, historyId, fetched at, last validated at]
+        self._entries: OrderedDict[Any, list] = OrderedDict()
+        self._inflight: dict[Any, Future] = {}
+        self._latest_history_id = None
+        self._lock = threading.Lock()
+        self._counts = {'hits': 0, 'revalidated': 0, 'coalesced': 0, 'misses': 0, 'invalidated': 0}
+        # Reads the historyId of a cold fetch concurrently with it, on its own Gmail service; each
+        # account has its own cache, so a slow mailbox never delays another's reads
+        self._profile_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='gmail-profile')
+
+    def get_or_fetch(self, key, fetch: Callable[[], Any], cacheable: Callable[[Any], bool] | None = None):
+        """
+        Return the cached result for key, or fetch it (once, however many callers ask at the same time).
+
+        Args:
+            key: Hashable identity of the query
+            fetch: Computes the result; exceptions reach every waiting caller and nothing is cached
+            cacheable: Returns False for results that must not be reused (e.g. partial failures)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[2] >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None and now - entry[3] < self.fresh_seconds:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                return entry[0]
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self._counts['coalesced'] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = self._fetch(key, entry, fetch, cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def _fetch(self, key, entry: list | None, fetch: Callable[[], Any], cacheable: Callable[[Any], bool] | None):
+        history_id = None
+        if entry is not None:
+            # Past the freshness window: one getProfile call tells whether the mailbox changed
+            try:
+                history_id = self.history_id()
+            except Exception:
+                # The check failed, not the query: fetch as if nothing were cached
+                entry = None
+            else:
+                with self._lock:
+                    if history_id == entry[1]:
+                        entry[3] = time.monotonic()
+                        self._counts['revalidated'] += 1
+                        return entry[0]
+                    self._observe(history_id)
+        profile = None
+        if entry is None:
+            # Read the historyId as the fetch starts, so changes made during it are caught later
+            profile = self._profile_executor.submit(self.history_id)
+
+        with self._lock:
+            self._counts['misses'] += 1
+        fetched_at = time.monotonic()
+        value = fetch()
+        if profile is not None:
+            try:
+                history_id = profile.result()
+            except Exception:
+                # Without a historyId the result could not be revalidated
+                return value
+
+        if cacheable is None or cacheable(value):
+            with self._lock:
+                self._observe(history_id)
+                if history_id == self._latest_history_id:
+                    self._entries[key] = [value, history_id, fetched_at, fetched_at]
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        return value
+
+    def _observe(self, history_id: str):
+        """Note a mailbox historyId (caller holds the lock), dropping results fetched before a newer one."""
+        if self._latest_history_id is not None and int(history_id) <= int(self._latest_history_id):
+            return
+        self._latest_history_id = history_id
+        for key in [key for key, entry in self._entries.items() if entry[1] != history_id]:
+            del self._entries[key]
+            self._counts['invalidated'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = sum(self._counts[name] for name in ('hits', 'revalidated', 'coalesced', 'misses'))
+            return {
+                **self._counts,
+                'entries': len(self._entries),
+                'hit_ratio': (lookups - self._counts['misses']) / lookups if lookups else 0.0,
+            }
+
+
+_query_cache = None
+_account_query_caches: dict[str, QueryCache] = {}
+_query_cache_lock = threading.Lock()
+
+
+def get_query_cache(account: str | None = None) -> QueryCache:
+    """Return the query cache of a named additional account, or the process-wide one (None: the default account)."""
+    global _query_cache
+
+    if account is not None:
+        with _query_cache_lock:
+            if account not in _account_query_caches:
+                _account_query_caches[account] = QueryCache(history_id=partial(mailbox_history_id, account))
+            return _account_query_caches[account]
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache()
+    return _query_cache
+
+
+def query_caches() -> dict[str, QueryCache]:
+    """Return the query caches created so far, by account, without creating any."""
+    with _query_cache_lock:
+        return {**({DEFAULT_ACCOUNT: _query_cache} if _query_cache is not None else {}), **_account_query_caches}
+
+
+def list_message_metadata(service, query: str, max_results: int) -> list:
+    """
+    Return the From/Subject/Date metadata of the messages matching a query, newest first.
+
+    Identical overlapping calls share one fetch, and the result is reused
+    until the TTL passes or the mailbox changes (see QueryCache).
+
+    Args:
+        service: Authorized Gmail API service
+        query: Gmail search query
+        max_results: Maximum number of messages to return
+
+    Returns:
+        A (message ID, metadata-format resource or the exception its fetch raised) pair per message
+    """
+    def fetch():
+        results = execute(service.users().messages().list(
+            userId='me',
+            maxResults=max_results,
+            q=query
+        ))
+        messages = results.get('messages', [])
+        if not messages:
+            return []
+
+        # Fetch metadata for all IDs in batches of up to 100 per round-trip
+        message_ids = [msg['id'] for msg in messages]
+        fetched = batch_get_messages(
+            service,
+            message_ids,
+            format='metadata',
+            metadataHeaders=LIST_HEADERS
+        )
+        index_messages(fetched, account_of(service))
+        return list(zip(message_ids, fetched))
+
+    return get_query_cache(account_of(service)).get_or_fetch(
+        (normalize_query(query), int(max_results)),
+        fetch,
+        cacheable=lambda fetched: not any(isinstance(message, Exception) for _, message in fetched)
+    )
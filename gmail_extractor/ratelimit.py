@@ -0,0 +1,240 @@
+"""Quota-aware request scheduling for the Gmail API.
+
+Every request goes through a token bucket denominated in Gmail quota units
+(each method has its own per-user cost) and an AIMD concurrency limiter:
+the number of requests allowed in flight grows by about one per round of
+successes and halves whenever Gmail signals throttling. Throttled (429,
+403 rateLimitExceeded) and server (5xx) errors are retried with jittered
+exponential backoff.
+
+Gmail's quota is per user, so every additional account (see service.py)
+gets its own scheduler: one mailbox being throttled never slows another.
+"""
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import get_metrics
+
+# Quota units charged per method (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {
+    'gmail.users.getProfile': 1,
+    'gmail.users.labels.list': 1,
+    'gmail.users.labels.get': 1,
+    'gmail.users.history.list': 2,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.attachments.get': 5,
+    'gmail.users.threads.list': 10,
+    'gmail.users.threads.get': 10,
+}
+DEFAULT_QUOTA_UNITS = 5
+
+# Gmail allows 250 quota units per user per second
+QUOTA_UNITS_PER_SECOND = 250
+
+MAX_RETRIES = 6
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 32.0
+
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+def quota_cost(request) -> int:
+    """Return the quota units a googleapiclient HttpRequest will consume."""
+    return QUOTA_UNITS.get(getattr(request, 'methodId', None), DEFAULT_QUOTA_UNITS)
+
+
+def http_status(error: Exception) -> int | None:
+    """Return the status of a googleapiclient HttpError, or None for any other exception."""
+    # Imported on the error path only; googleapiclient is loaded lazily (see service.py)
+    from googleapiclient.errors import HttpError
+
+    return error.resp.status if isinstance(error, HttpError) else None
+
+
+def is_throttled(error: Exception) -> bool:
+    """True for 429s and 403s whose reason is a rate limit."""
+    status = http_status(error)
+    if status == 429:
+        return True
+    if status == 403:
+        try:
+            details = json.loads(error.content)['error'].get('errors', [])
+        except (ValueError, KeyError, TypeError):
+            return False
+        return any(detail.get('reason') in RATE_LIMIT_REASONS for detail in details)
+    return False
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for throttling, 5xx responses and transient connection failures."""
+    status = http_status(error)
+    if status is not None:
+        return is_throttled(error) or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def backoff_delay(attempt: int, error: Exception | None = None) -> float:
+    """Full-jitter exponential backoff, honoring a Retry-After header when present."""
+    resp = getattr(error, 'resp', None)
+    retry_after = resp.get('retry-after') if resp is not None else None
+    if retry_after and str(retry_after).isdigit():
+        return float(retry_after)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket metering quota units per second."""
+
+    def __init__(self, rate: float = QUOTA_UNITS_PER_SECOND, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float):
+        """Block until `units` tokens are available, then take them."""
+        # Charges larger than one burst (e.g. big batches) are taken in slices
+        while units > self.capacity:
+            self.acquire(self.capacity)
+            units -= self.capacity
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= units:
+                    self._tokens -= units
+                    return
+                wait = (units - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease."""
+
+    def __init__(self, initial: int = 10, minimum: int = 1, maximum: int = 50):
+        self.minimum = minimum
+        self.maximum = maximum
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight slot for the duration of a request."""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            # Roughly +1 after a full window of successful requests
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            self._limit = max(self.minimum, self._limit / 2)
+
+
+class GmailScheduler:
+    """Shared gate for all Gmail requests: quota metering, concurrency and retries."""
+
+    def __init__(self, units_per_second: float = QUOTA_UNITS_PER_SECOND, max_retries: int = MAX_RETRIES):
+        self.bucket = TokenBucket(units_per_second)
+        self.limiter = AIMDLimiter()
+        self.max_retries = max_retries
+        self.retries = 0
+        self.throttled = 0
+
+    def call(self, func, units: int, method: str = 'other'):
+        """
+        Run func() under the quota bucket and concurrency limit, retrying transient failures.
+
+        Args:
+            func: Zero-argument callable performing one API round-trip
+            units: Quota units the call consumes
+            method: API method name the attempts are recorded under in the metrics
+
+        Returns:
+            Whatever func returns
+
+        Raises:
+            The last error once retries are exhausted, or any non-retryable error
+        """
+        metrics = get_metrics()
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire(units)
+            try:
+                with self.limiter.slot():
+                    start = time.perf_counter()
+                    result = func()
+            except Exception as e:
+                metrics.observe_api(method, time.perf_counter() - start, units, error=True)
+                if not is_retryable(e) or attempt == self.max_retries:
+                    raise
+                self.note_failure(e)
+                time.sleep(backoff_delay(attempt, e))
+                continue
+            metrics.observe_api(method, time.perf_counter() - start, units)
+            self.limiter.on_success()
+            return result
+
+    def note_failure(self, error: Exception):
+        """Record a retryable failure, shrinking concurrency if it was throttling."""
+        self.retries += 1
+        if is_throttled(error):
+            self.throttled += 1
+            self.limiter.on_throttle()
+
+    def execute(self, request):
+        """Execute a googleapiclient HttpRequest through the scheduler."""
+        return self.call(request.execute, quota_cost(request), getattr(request, 'methodId', None) or 'other')
+
+
+_scheduler = GmailScheduler()
+_account_schedulers: dict[str, GmailScheduler] = {}
+_account_lock = threading.Lock()
+
+
+def get_scheduler(account: str | None = None) -> GmailScheduler:
+    """Return the scheduler of a named additional account, or the process-wide one (None: the default account)."""
+    if account is None:
+        return _scheduler
+    with _account_lock:
+        scheduler = _account_schedulers.get(account)
+        if scheduler is None:
+            scheduler = _account_schedulers[account] = GmailScheduler()
+        return scheduler
+
+
+def account_schedulers() -> dict[str, GmailScheduler]:
+    """Return the schedulers of the named additional accounts used so far, by account."""
+    with _account_lock:
+        return dict(_account_schedulers)
+
+
+def account_of(http) -> str | None:
+    """Return the additional account an HTTP client (or a service) is authorized for; None for the default account."""
+    return getattr(getattr(http, '_http', http), 'gmail_account', None)
+
+
+def execute(request):
+    """Execute a googleapiclient HttpRequest with quota metering and retries, on its account's quota."""
+    return get_scheduler(account_of(request.http)).execute(request)
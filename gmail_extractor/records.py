@@ -0,0 +1,92 @@
+"""Compact message records for the bulk paths (export, mirror sync, save_emails_by_tag).
+
+A decoded messages.get response is a tree of dicts and lists holding every
+header Gmail sent, and a {name: value} dict built from its header list
+doubles that. A MessageRecord keeps just the fields the bulk paths read, in
+__slots__ (no per-instance dict), with the sender, recipient and label set
+strings shared between records through an InternPool. Records are built in
+the fetch worker threads (see fetch_messages' transform), so the raw
+response is released as soon as its record exists.
+"""
+from typing import Hashable
+
+# Interned values kept per pool; past this, new values are stored as they are
+MAX_INTERNED = 65_536
+
+
+class InternPool:
+    """Maps equal strings (or tuples) to one shared instance for the lifetime of a run."""
+
+    __slots__ = ('_values', 'max_size')
+
+    def __init__(self, max_size: int = MAX_INTERNED):
+        self._values: dict = {}
+        self.max_size = max_size
+
+    def __call__(self, value: Hashable):
+        if value is None:
+            return None
+        shared = self._values.get(value)
+        if shared is not None:
+            return shared
+        if len(self._values) < self.max_size:
+            self._values[value] = value
+        return value
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class MessageRecord:
+    """The fields of one message that bulk paths use; missing headers are None."""
+
+    __slots__ = ('id', 'thread_id', 'sender', 'recipient', 'subject', 'date', 'internal_date', 'label_ids',
+                 'snippet', 'body')
+
+    def __init__(self, id: str, thread_id: str | None = None, sender: str | None = None,
+                 recipient: str | None = None, subject: str | None = None, date: str | None = None,
+                 internal_date: int = 0, label_ids: tuple[str, ...] = (), snippet: str = '',
+                 body: str | None = None):
+        self.id = id
+        self.thread_id = thread_id
+        self.sender = sender
+        self.recipient = recipient
+        self.subject = subject
+        self.date = date
+        self.internal_date = internal_date
+        self.label_ids = label_ids
+        self.snippet = snippet
+        self.body = body
+
+    @classmethod
+    def from_message(cls, message: dict, intern: InternPool | None = None) -> 'MessageRecord':
+        """
+        Build a record from a messages.get resource (any format).
+
+        Only the From, To, Subject and Date headers are read, in one pass over
+        the header list. The body is left unset; callers that need it decode it
+        from the payload before dropping the resource.
+
+        Args:
+            message: The message resource
+            intern: Pool sharing repeated senders, recipients and label sets
+        """
+        sender = recipient = subject = date = None
+        for header in message.get('payload', {}).get('headers', ()):
+            name = header['name']
+            if name == 'From':
+                sender = header['value']
+            elif name == 'To':
+                recipient = header['value']
+            elif name == 'Subject':
+                subject = header['value']
+            elif name == 'Date':
+                date = header['value']
+        label_ids = tuple(message.get('labelIds', ()))
+        if intern is not None:
+            sender, recipient, label_ids = intern(sender), intern(recipient), intern(label_ids)
+        return cls(message['id'], message.get('threadId'), sender, recipient, subject, date,
+                   int(message.get('internalDate') or 0), label_ids, message.get('snippet', ''))
+
+    def __repr__(self) -> str:
+        return f"MessageRecord(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
@@ -0,0 +1,351 @@
+"""Local SQLite FTS5 index over message headers and bodies for offline search.
+
+Messages are added to the index as the tools fetch them (full messages with
+their decoded bodies, metadata listings with headers only). search() accepts
+the common Gmail operators and answers from the index without any network
+call. Message IDs are only unique within a mailbox, so each additional
+account has its own index.
+"""
+import json
+import re
+import shlex
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .labels import get_label_cache
+from .mime import get_body
+from .service import PRIVATE_DIR, account_store_path
+
+SEARCH_DB_PATH = PRIVATE_DIR / 'cache' / 'search.sqlite3'
+
+# Only the start of very long bodies is indexed
+MAX_INDEXED_BODY_CHARS = 64 * 1024
+
+FIELD_COLUMNS = {'from': 'sender', 'to': 'recipient', 'subject': 'subject'}
+IS_LABELS = {'unread': 'UNREAD', 'starred': 'STARRED', 'important': 'IMPORTANT'}
+# Label IDs that are the label's name in every mailbox (as are CATEGORY_... IDs)
+SYSTEM_LABELS = {'INBOX', 'SENT', 'DRAFT', 'SPAM', 'TRASH', 'UNREAD', 'STARRED', 'IMPORTANT', 'CHAT'}
+DAYS_PER_UNIT = {'d': 1, 'm': 30, 'y': 365}
+OPERATOR_RE = re.compile(r'[a-z_]+')
+
+
+class UnsupportedQueryError(ValueError):
+    """Raised when a query uses an operator the local index cannot answer."""
+
+
+def _fts_string(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _parse_date(value: str) -> int:
+    """Convert an after:/before: value (YYYY/MM/DD or epoch seconds) to epoch milliseconds."""
+    if value.isdigit():
+        return int(value) * 1000
+    return int(datetime.strptime(value.replace('-', '/'), '%Y/%m/%d').timestamp() * 1000)
+
+
+def _tokenize(query: str) -> list[str]:
+    """Split a query into terms; double quotes group a phrase, apostrophes (o'brien, don't) are letters."""
+    lexer = shlex.shlex(query, posix=True)
+    lexer.whitespace_split = True
+    lexer.quotes = '"'
+    lexer.escape = ''
+    lexer.commenters = ''
+    try:
+        return list(lexer)
+    except ValueError:
+        # Unbalanced double quote: take the words as they are
+        return query.replace('"', ' ').split()
+
+
+def _label_id(value: str, account: str | None) -> str:
+    """Map a label: value to a label ID without an API call."""
+    label_id = get_label_cache(account).cached_id(value)
+    if label_id is not None:
+        return label_id
+    if value.upper() in SYSTEM_LABELS or value.upper().startswith('CATEGORY_'):
+        return value
+    # User labels are stored by ID, so an unknown name would silently match nothing
+    raise UnsupportedQueryError(f"Label '{value}' is not in the loaded label list; "
+                                f"list labels first or search in remote mode")
+
+
+def translate_query(query: str, account: str | None = None) -> tuple[str, list[str], str, list]:
+    """
+    Translate a Gmail search query into FTS5 match expressions and SQL filters.
+
+    Args:
+        query: Gmail search query
+        account: Account whose label names label: and is: refer to (None: the default account)
+
+    Returns:
+        (match, negated_matches, where_sql, params) where match is the positive
+        FTS5 expression ('' if none), negated_matches are expressions whose
+        hits must be excluded and where_sql/params filter the metadata table
+
+    Raises:
+        UnsupportedQueryError: If the query uses an operator the index cannot answer,
+            an unknown user label, or OR next to a negated term or a filter
+    """
+    positive: list[str] = []
+    negated: list[str] = []
+    where: list[str] = []
+    params: list = []
+    pending_or = False
+    # Kind of the previous term: 'text', or 'negated' and 'filter', which OR cannot join
+    previous = None
+
+    for token in _tokenize(query):
+        if token == 'OR':
+            if previous in ('negated', 'filter'):
+                raise UnsupportedQueryError("OR is only supported between search terms in local search")
+            pending_or = previous == 'text'
+            continue
+
+        negate = token.startswith('-') and len(token) > 1
+        if negate:
+            token = token[1:]
+
+        operator, _, value = token.partition(':')
+        operator = operator.lower()
+        # Phrases such as "re: meeting" and URLs are text, not operators
+        if not value or not OPERATOR_RE.fullmatch(operator) or value[0].isspace() or value.startswith('//'):
+            operator, value = '', token
+
+        kind = 'negated' if negate else 'text' if operator in FIELD_COLUMNS or operator == '' else 'filter'
+        if pending_or and kind != 'text':
+            raise UnsupportedQueryError("OR is only supported between search terms in local search")
+        previous = kind
+
+        if operator in FIELD_COLUMNS:
+            fragment = f"{FIELD_COLUMNS[operator]} : {_fts_string(value)}"
+        elif operator == '':
+            fragment = _fts_string(value)
+        else:
+            if operator in ('label', 'is'):
+                if operator == 'label':
+                    label = _label_id(value, account)
+                elif value.lower() == 'read':
+                    label, negate = 'UNREAD', not negate
+                elif value.lower() in IS_LABELS:
+                    label = IS_LABELS[value.lower()]
+                else:
+                    raise UnsupportedQueryError(f"'is:{value}' is not supported by local search")
+                clause = 'EXISTS (SELECT 1 FROM json_each(message_meta.label_ids) WHERE upper(value) = upper(?))'
+                where.append(f"NOT {clause}" if negate else clause)
+                params.append(label)
+            elif operator in ('after', 'before'):
+                where.append(f"internal_date {'>=' if operator == 'after' else '<'} ?")
+                params.append(_parse_date(value))
+            elif operator in ('newer_than', 'older_than') and value[:-1].isdigit() and value[-1] in DAYS_PER_UNIT:
+                cutoff = int((time.time() - int(value[:-1]) * DAYS_PER_UNIT[value[-1]] * 86400) * 1000)
+                where.append(f"internal_date {'>=' if operator == 'newer_than' else '<'} ?")
+                params.append(cutoff)
+            else:
+                raise UnsupportedQueryError(f"Operator '{operator}:' is not supported by local search")
+            continue
+
+        if negate:
+            negated.append(fragment)
+        elif pending_or:
+            positive[-1] = f"({positive[-1]} OR {fragment})"
+        else:
+            positive.append(fragment)
+        pending_or = False
+
+    return ' AND '.join(positive), negated, ' AND '.join(where), params
+
+
+class SearchIndex:
+    """FTS5 index of sender, recipient, subject and body, plus label/date metadata."""
+
+    def __init__(self, db_path: Path = SEARCH_DB_PATH, account: str | None = None):
+        """
+        Args:
+            db_path: SQLite file of the index
+            account: Account whose messages are indexed, for label names in queries (None: the default account)
+        """
+        self.account = account
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS message_meta ('
+                ' rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, label_ids TEXT NOT NULL,'
+                ' internal_date INTEGER, sender TEXT, subject TEXT, date TEXT)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS message_meta_date ON message_meta (internal_date)')
+            self._db.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5('
+                ' sender, recipient, subject, body, tokenize = "unicode61 remove_diacritics 2")'
+            )
+
+    def add_messages(self, messages: list[dict]):
+        """Index full- or metadata-format message resources.
+
+        Metadata-only resources update headers and labels but keep any body
+        already indexed for the message.
+        """
+        with self._lock, self._db:
+            for message in messages:
+                self._add(message)
+
+    def _add(self, message: dict):
+        payload = message.get('payload', {})
+        headers = {h['name']: h['value'] for h in payload.get('headers', [])}
+        row = self._db.execute('SELECT rowid FROM message_meta WHERE id = ?', (message['id'],)).fetchone()
+
+        if row is not None and not headers:
+            # Minimal-format resource: only the labels can have changed
+            if 'labelIds' in message:
+                self._db.execute('UPDATE message_meta SET label_ids = ? WHERE rowid = ?',
+                                 (json.dumps(message['labelIds']), row[0]))
+            return
+
+        values = (json.dumps(message.get('labelIds', [])), int(message.get('internalDate', 0)) or None,
+                  headers.get('From'), headers.get('Subject'), headers.get('Date'))
+        if row is None:
+            rowid = self._db.execute(
+                'INSERT INTO message_meta (id, label_ids, internal_date, sender, subject, date)'
+                ' VALUES (?, ?, ?, ?, ?, ?)', (message['id'], *values)).lastrowid
+            previous = ('', '', '', '')
+        else:
+            rowid = row[0]
+            self._db.execute(
+                'UPDATE message_meta SET label_ids = ?, internal_date = COALESCE(?, internal_date),'
+                ' sender = COALESCE(?, sender), subject = COALESCE(?, subject), date = COALESCE(?, date)'
+                ' WHERE rowid = ?', (*values, rowid))
+            previous = self._db.execute('SELECT sender, recipient, subject, body FROM messages_fts WHERE rowid = ?',
+                                        (rowid,)).fetchone() or ('', '', '', '')
+            self._db.execute('DELETE FROM messages_fts WHERE rowid = ?', (rowid,))
+
+        # Metadata-format resources carry no body; keep one indexed by an earlier full fetch
+        if 'parts' in payload or 'data' in payload.get('body', {}):
+            body = get_body(payload, max_chars=MAX_INDEXED_BODY_CHARS, strip_html=True)
+        else:
+            body = previous[3]
+        self._db.execute(
+            'INSERT INTO messages_fts (rowid, sender, recipient, subject, body) VALUES (?, ?, ?, ?, ?)',
+            (rowid, headers.get('From', previous[0]), headers.get('To', previous[1]),
+             headers.get('Subject', previous[2]), body))
+
+    def remove(self, message_ids: list[str]):
+        with self._lock, self._db:
+            for message_id in message_ids:
+                row = self._db.execute('SELECT rowid FROM message_meta WHERE id = ?', (message_id,)).fetchone()
+                if row:
+                    self._db.execute('DELETE FROM messages_fts WHERE rowid = ?', row)
+                    self._db.execute('DELETE FROM message_meta WHERE rowid = ?', row)
+
+    def set_labels(self, message_id: str, label_ids: list[str]):
+        with self._lock, self._db:
+            self._db.execute('UPDATE message_meta SET label_ids = ? WHERE id = ?', (json.dumps(label_ids), message_id))
+
+    def search(self, query: str, max_results: int = 20) -> list[dict]:
+        """
+        Run a Gmail-syntax query against the index.
+
+        Args:
+            query: Gmail search query (from:, to:, subject:, label:, is:unread,
+                after:/before:, newer_than:/older_than:, free text, -negation, OR)
+            max_results: Maximum number of messages to return (default: 20)
+
+        Returns:
+            Matching messages newest first, as dicts with 'id', 'From',
+            'Subject' and 'Date'
+
+        Raises:
+            UnsupportedQueryError: If the query uses an operator the index cannot answer
+        """
+        match, negated, where_sql, params = translate_query(query, self.account)
+        conditions, sql_params = [], []
+        if match:
+            conditions.append('message_meta.rowid IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)')
+            sql_params.append(match)
+        for expression in negated:
+            conditions.append('message_meta.rowid NOT IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?)')
+            sql_params.append(expression)
+        if where_sql:
+            conditions.append(where_sql)
+            sql_params.extend(params)
+
+        sql = 'SELECT id, sender, subject, date FROM message_meta'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY internal_date DESC LIMIT ?'
+        sql_params.append(int(max_results))
+
+        with self._lock:
+            rows = self._db.execute(sql, sql_params).fetchall()
+        return [{'id': row[0], 'From': row[1], 'Subject': row[2], 'Date': row[3]} for row in rows]
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM message_meta').fetchone()[0]
+
+
+_index = None
+_account_indexes: dict[str, SearchIndex] = {}
+_index_lock = threading.Lock()
+
+
+def get_search_index(account: str | None = None) -> SearchIndex:
+    """Return the search index of a named additional account, or the process-wide one (None: the default account)."""
+    global _index
+
+    if account is not None:
+        with _index_lock:
+            if account not in _account_indexes:
+                _account_indexes[account] = SearchIndex(account_store_path(account, 'search.sqlite3'), account)
+            return _account_indexes[account]
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SearchIndex()
+    return _index
+
+
+def index_messages(messages: list[dict], account: str | None = None):
+    """Add fetched messages to their account's index (None: the default account); indexing never fails the caller."""
+    messages = [message for message in messages if isinstance(message, dict)]
+    if not messages:
+        return
+    try:
+        get_search_index(account).add_messages(messages)
+    except sqlite3.Error:
+        pass
+
+
+def search_local(query: str, max_results: int = 20, account: str | None = None) -> str:
+    """
+    Search the local index and format results like the remote listing.
+
+    Args:
+        query: Gmail search query
+        max_results: Maximum number of messages to return (default: 20)
+        account: Account whose index to search (default: None, the default account)
+
+    Returns:
+        A formatted string with matching messages
+    """
+    try:
+        results = get_search_index(account).search(query, max_results=max_results)
+    except Exception as e:
+        return f"Error searching local index: {str(e)}"
+
+    if not results:
+        return "No messages found in the local index."
+
+    output = []
+    for result in results:
+        output.append(f"ID: {result['id']}")
+        output.append(f"From: {result['From'] or 'N/A'}")
+        output.append(f"Subject: {result['Subject'] or 'N/A'}")
+        output.append(f"Date: {result['Date'] or 'N/A'}")
+        output.append("-" * 80)
+    return "\n".join(output)
@@ -0,0 +1,168 @@
+"""Process-wide Gmail credentials and per-thread API services.
+
+Credentials are loaded from private/token.pickle once per process and the
+Gmail discovery document is parsed once from the static copy bundled with
+googleapiclient. Every thread gets its own service and authorized httplib2
+client, since httplib2 connections must not be shared between threads; each
+client keeps its connection to the API alive between calls.
+
+Additional named accounts keep their tokens in private/accounts/<name>/
+token.pickle, next to their own search index and message cache. Each
+account has its own services (and so its own connections), and their
+requests are scheduled against that account's quota (see
+ratelimit.get_scheduler).
+
+The Google client libraries take a few hundred milliseconds to import, so
+they are imported on first use rather than with this module; warm_up() does
+that work (and loads the token) in the background while a server starts.
+"""
+import json
+import pickle
+import threading
+from pathlib import Path
+
+# Gmail API scopes
+SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
+
+# Paths
+PRIVATE_DIR = Path(__file__).parent.parent / 'private'
+TOKEN_PATH = PRIVATE_DIR / 'token.pickle'
+CLIENT_SECRET_PATH = PRIVATE_DIR / 'client_secret_184344902751-bdc92tjt9t9omprtouc2h8koarj8vvbf.apps.googleusercontent.com.json'
+ACCOUNTS_DIR = PRIVATE_DIR / 'accounts'
+
+# Name of the account whose token is TOKEN_PATH
+DEFAULT_ACCOUNT = 'default'
+
+_lock = threading.Lock()
+_credentials = {}
+_discovery_document = None
+_local = threading.local()
+
+
+def account_token_path(account: str = DEFAULT_ACCOUNT) -> Path:
+    """Return where an account's OAuth token is saved."""
+    if account == DEFAULT_ACCOUNT:
+        return TOKEN_PATH
+    if not account or Path(account).name != account or account.startswith('.'):
+        raise ValueError(f"Invalid account name: {account!r}")
+    return ACCOUNTS_DIR / account / 'token.pickle'
+
+
+def account_store_path(account: str, filename: str) -> Path:
+    """Return the path of a local store (search index, message cache) kept for a named additional account."""
+    return account_token_path(account).parent / filename
+
+
+def list_accounts() -> list[str]:
+    """Return the default account followed by every named account with a saved token."""
+    return [DEFAULT_ACCOUNT] + sorted(path.parent.name for path in ACCOUNTS_DIR.glob('*/token.pickle'))
+
+
+def get_credentials(interactive: bool = True, account: str = DEFAULT_ACCOUNT):
+    """
+    Load (or obtain) OAuth credentials once per process, refreshing when expired.
+
+    Args:
+        interactive: Run the browser sign-in flow when there is no usable token;
+            when False, return None instead
+        account: Account whose credentials to load (default: the default account)
+    """
+    token_path = account_token_path(account)
+    with _lock:
+        creds = _credentials.get(account)
+
+        # Load existing credentials
+        if creds is None and token_path.exists():
+            with open(token_path, 'rb') as token:
+                creds = pickle.load(token)
+
+        # If no valid credentials, authenticate
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                from google.auth.transport.requests import Request
+                creds.refresh(Request())
+            elif not interactive:
+                return None
+            else:
+                from google_auth_oauthlib.flow import InstalledAppFlow
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    str(CLIENT_SECRET_PATH), SCOPES)
+                creds = flow.run_local_server(port=0)
+
+            # Save credentials for next time
+            token_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(token_path, 'wb') as token:
+                pickle.dump(creds, token)
+
+        _credentials[account] = creds
+        return creds
+
+
+def get_discovery_document() -> dict:
+    """Return the parsed Gmail v1 discovery document, read once from the bundled copy."""
+    global _discovery_document
+
+    if _discovery_document is None:
+        with _lock:
+            if _discovery_document is None:
+                from googleapiclient.discovery_cache import get_static_doc
+                _discovery_document = json.loads(get_static_doc('gmail', 'v1'))
+    return _discovery_document
+
+
+def build_gmail_service(credentials=None, account: str = DEFAULT_ACCOUNT):
+    """
+    Build a new Gmail API service with its own authorized HTTP client.
+
+    Args:
+        credentials: OAuth credentials to use (default: the account's saved credentials)
+        account: Account the service is for (default: the default account)
+
+    Returns:
+        A Gmail API service object that must only be used from one thread
+    """
+    import httplib2
+    from googleapiclient.discovery import build_from_document
+
+    from .http_client import MeteredHttp
+
+    credentials = credentials or get_credentials(account=account)
+    http = MeteredHttp(credentials, http=httplib2.Http())
+    if account != DEFAULT_ACCOUNT:
+        # Requests made through this client are scheduled against the account's own quota
+        http.gmail_account = account
+    document = get_discovery_document()
+    # build_from_document fills in method parameters on the shared document
+    with _lock:
+        return build_from_document(document, http=http)
+
+
+def get_gmail_service(account: str = DEFAULT_ACCOUNT):
+    """Authenticate and return the calling thread's Gmail API service for an account."""
+    services = getattr(_local, 'services', None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(account)
+    if service is None:
+        service = services[account] = build_gmail_service(account=account)
+    return service
+
+
+def warm_up():
+    """
+    Do the one-time work behind the first Gmail call ahead of time.
+
+    Imports the client libraries, parses the discovery document and loads
+    (refreshing if expired) the saved token. Meant to run in the background
+    while a server starts; it never opens the browser sign-in flow, and any
+    failure is left to surface again on the first real call.
+    """
+    try:
+        import googleapiclient.discovery  # noqa: F401
+
+        from . import http_client  # noqa: F401
+
+        get_discovery_document()
+        get_credentials(interactive=False)
+    except Exception:
+        pass
@@ -0,0 +1,238 @@
+"""Incremental mailbox sync into a local SQLite mirror using users.history.list.
+
+The mirror stores message metadata (headers, labels, snippet, internalDate)
+plus the mailbox historyId it is current as of. Each sync replays the history
+records since that ID; if Gmail no longer has them (HTTP 404) the mirror is
+rebuilt from a full listing.
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from .batching import batch_get_messages
+from .fetch import iter_message_ids
+from .ratelimit import account_of, execute, http_status
+from .records import MessageRecord
+from .search_index import get_search_index, index_messages
+from .service import PRIVATE_DIR, account_store_path
+
+MIRROR_DB_PATH = PRIVATE_DIR / 'cache' / 'mirror.sqlite3'
+
+MIRROR_HEADERS = ['From', 'To', 'Subject', 'Date']
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+
+
+class MailboxMirror:
+    """Local copy of mailbox metadata, keyed by message ID."""
+
+    def __init__(self, db_path: Path = MIRROR_DB_PATH):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._db:
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                ' id TEXT PRIMARY KEY, thread_id TEXT, label_ids TEXT NOT NULL,'
+                ' internal_date INTEGER, sender TEXT, recipient TEXT, subject TEXT, date TEXT, snippet TEXT,'
+                ' size_estimate INTEGER)'
+            )
+            # Mirrors created before sizes were kept gain the column; their rows fill in as they are refetched
+            if 'size_estimate' not in {row[1] for row in self._db.execute('PRAGMA table_info(messages)')}:
+                self._db.execute('ALTER TABLE messages ADD COLUMN size_estimate INTEGER')
+            self._db.execute('CREATE INDEX IF NOT EXISTS messages_internal_date ON messages (internal_date)')
+            self._db.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)')
+
+    @property
+    def history_id(self) -> str | None:
+        row = self._db.execute("SELECT value FROM state WHERE key = 'history_id'").fetchone()
+        return row[0] if row else None
+
+    def set_history_id(self, history_id: str):
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('history_id', ?)", (str(history_id),))
+
+    def upsert(self, messages: list[dict]):
+        """Insert or replace metadata-format message resources."""
+        rows = []
+        for message in messages:
+            record = MessageRecord.from_message(message)
+            rows.append((
+                record.id, record.thread_id, json.dumps(record.label_ids), record.internal_date,
+                record.sender, record.recipient, record.subject, record.date, message.get('snippet'),
+                message.get('sizeEstimate')
+            ))
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def delete(self, message_ids: list[str]):
+        with self._lock, self._db:
+            self._db.executemany('DELETE FROM messages WHERE id = ?', [(i,) for i in message_ids])
+
+    def set_labels(self, message_id: str, label_ids: list[str]):
+        with self._lock, self._db:
+            self._db.execute('UPDATE messages SET label_ids = ? WHERE id = ?', (json.dumps(label_ids), message_id))
+
+    def message_ids(self) -> set[str]:
+        return {row[0] for row in self._db.execute('SELECT id FROM messages')}
+
+    def iter_messages(self, label_id: str | None = None, limit: int | None = None) -> Iterator[dict]:
+        """Yield mirrored messages newest first, optionally restricted to one label ID."""
+        sql = 'SELECT id, thread_id, label_ids, internal_date, sender, recipient, subject, date, snippet FROM messages'
+        params = []
+        if label_id:
+            sql += ' WHERE EXISTS (SELECT 1 FROM json_each(label_ids) WHERE value = ?)'
+            params.append(label_id)
+        sql += ' ORDER BY internal_date DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        for row in self._db.execute(sql, params):
+            yield {
+                'Message ID': row[0], 'Thread ID': row[1], 'Labels': json.loads(row[2]),
+                'Internal Date': row[3], 'From': row[4], 'To': row[5], 'Subject': row[6],
+                'Date': row[7], 'Snippet': row[8]
+            }
+
+    def iter_metadata(self, label_id: str | None = None, limit: int | None = None,
+                      page_size: int = 10_000) -> Iterator[list[tuple]]:
+        """
+        Yield (sender, internal_date, label_ids JSON, size_estimate) rows newest first, a page at a time.
+
+        The raw columns are returned without decoding, for callers that aggregate many rows.
+        """
+        sql = 'SELECT sender, internal_date, label_ids, size_estimate FROM messages'
+        params = []
+        if label_id:
+            sql += ' WHERE EXISTS (SELECT 1 FROM json_each(label_ids) WHERE value = ?)'
+            params.append(label_id)
+        sql += ' ORDER BY internal_date DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        cursor = self._db.execute(sql, params)
+        while rows := cursor.fetchmany(page_size):
+            yield rows
+
+    def __len__(self) -> int:
+        return self._db.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+
+
+def _fetch_metadata(service, message_ids: list[str]) -> list[dict]:
+    fetched = batch_get_messages(service, message_ids, format='metadata', metadataHeaders=MIRROR_HEADERS)
+    # Messages deleted between listing and fetching come back as 404s; skip them
+    messages = [message for message in fetched if not isinstance(message, Exception)]
+    index_messages(messages, account_of(service))
+    return messages
+
+
+def full_resync(service, mirror: MailboxMirror, max_messages: int | None = None) -> dict:
+    """
+    Rebuild the mirror from a full mailbox listing.
+
+    The profile historyId is read first, so changes made while the listing
+    runs are replayed by the next incremental sync.
+
+    Returns:
+        Sync summary dict
+    """
+    history_id = execute(service.users().getProfile(userId='me'))['historyId']
+    api_calls = 1
+
+    listed = list(iter_message_ids(service, max_results=max_messages))
+    api_calls += max(1, -(-len(listed) // 500))
+
+    known = mirror.message_ids()
+    listed_set = set(listed)
+    new_ids = [message_id for message_id in listed if message_id not in known]
+    # Labels on already-mirrored messages may be stale; refetch everything listed
+    for start in range(0, len(listed), 500):
+        chunk = listed[start:start + 500]
+        mirror.upsert(_fetch_metadata(service, chunk))
+        api_calls += -(-len(chunk) // 100)
+
+    removed = list(known - listed_set) if max_messages is None else []
+    mirror.delete(removed)
+    get_search_index(account_of(service)).remove(removed)
+    mirror.set_history_id(history_id)
+    return {'mode': 'full', 'added': len(new_ids), 'deleted': len(removed), 'labels_changed': 0,
+            'api_calls': api_calls, 'history_id': history_id}
+
+
+def sync_mailbox(service, mirror: MailboxMirror | None = None, max_messages: int | None = None) -> dict:
+    """
+    Bring the mirror up to date, incrementally when possible.
+
+    Args:
+        service: Authorized Gmail API service
+        mirror: Mirror to update (default: private/cache/mirror.sqlite3, or the
+            service's named account's own mirror.sqlite3)
+        max_messages: Cap on messages listed during a full resync (default: no limit)
+
+    Returns:
+        Dict with the sync mode, added/deleted/labels_changed counts, the number
+        of API calls made and the new historyId
+    """
+    account = account_of(service)
+    if mirror is None:
+        mirror = MailboxMirror(MIRROR_DB_PATH if account is None else account_store_path(account, 'mirror.sqlite3'))
+    start_history_id = mirror.history_id
+    if start_history_id is None:
+        return full_resync(service, mirror, max_messages)
+
+    added, deleted, labels = {}, set(), {}
+    api_calls = 0
+    page_token = None
+    history_id = start_history_id
+    try:
+        while True:
+            response = execute(service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=HISTORY_TYPES,
+                pageToken=page_token,
+                maxResults=500
+            ))
+            api_calls += 1
+
+            for record in response.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    message = item['message']
+                    added[message['id']] = message
+                    deleted.discard(message['id'])
+                for item in record.get('messagesDeleted', []):
+                    message_id = item['message']['id']
+                    deleted.add(message_id)
+                    added.pop(message_id, None)
+                    labels.pop(message_id, None)
+                for item in record.get('labelsAdded', []) + record.get('labelsRemoved', []):
+                    # History entries carry the message's label set after the change
+                    message = item['message']
+                    labels[message['id']] = message.get('labelIds', [])
+
+            history_id = response.get('historyId', history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    except Exception as e:
+        if http_status(e) == 404:
+            # startHistoryId is too old; Gmail only keeps about a week of history
+            return full_resync(service, mirror, max_messages)
+        raise
+
+    if added:
+        mirror.upsert(_fetch_metadata(service, list(added)))
+        api_calls += -(-len(added) // 100)
+    index = get_search_index(account)
+    mirror.delete(list(deleted))
+    index.remove(list(deleted))
+    for message_id, label_ids in labels.items():
+        if message_id not in added:
+            mirror.set_labels(message_id, label_ids)
+            index.set_labels(message_id, label_ids)
+    mirror.set_history_id(history_id)
+
+    return {'mode': 'incremental', 'added': len(added), 'deleted': len(deleted),
+            'labels_changed': len(labels), 'api_calls': api_calls, 'history_id': history_id}
@@ -0,0 +1,172 @@
+"""Whole-conversation retrieval with quoted replies collapsed.
+
+users.threads.get returns every message of a thread in one request. Replies
+usually quote the conversation below them, so each message is cut down to
+what it adds: a quoted block (an "On ... wrote:" attribution or a run of
+"> " lines) whose lines already appeared earlier in the thread is replaced
+by a one-line marker. Quotes of text not seen before are kept.
+"""
+import re
+
+from .cache import get_message_cache
+from .defaults import DEFAULT_MESSAGE_CHARS
+from .mime import read_body
+from .ratelimit import account_of, execute, http_status
+from .search_index import index_messages
+from .service import get_gmail_service
+
+# Lines introducing a quoted earlier message
+ATTRIBUTION_RE = re.compile(
+    r'^\s*(?:'
+    r'On\b.{0,300}\bwrote:'                      # Gmail, Apple Mail
+    r'|\u202b?בתאריך\b.{0,300}:\u202c?'        # Gmail in Hebrew
+    r'|-{2,}\s*Original Message\s*-{2,}'         # Outlook
+    r'|_{10,}'                                   # Outlook separator
+    r')\s*$',
+    re.IGNORECASE
+)
+QUOTED_LINE_RE = re.compile(r'^\s*>')
+QUOTE_PREFIX_RE = re.compile(r'^(?:\s*>)+')
+
+# A quoted block is collapsed when at least this share of its lines was seen before
+SEEN_RATIO = 0.8
+
+
+def _normalize(line: str) -> str:
+    return ' '.join(QUOTE_PREFIX_RE.sub('', line).split())
+
+
+def _mostly_seen(lines: list[str], earlier: set[str]) -> bool:
+    content = [line for line in map(_normalize, lines) if line]
+    return sum(line in earlier for line in content) >= SEEN_RATIO * len(content)
+
+
+def _attribution_length(lines: list[str], index: int) -> int:
+    """Number of lines (1 or 2, as long ones wrap) forming an attribution at index, else 0."""
+    if ATTRIBUTION_RE.match(lines[index]):
+        return 1
+    if index + 1 < len(lines) and lines[index].strip() and ATTRIBUTION_RE.match(lines[index] + ' ' + lines[index + 1]):
+        return 2
+    return 0
+
+
+def collapse_quoted(text: str, earlier: set[str]) -> tuple[str, int]:
+    """
+    Replace quoted blocks already seen earlier in the thread with a marker.
+
+    Args:
+        text: A message body
+        earlier: Normalized lines of the earlier messages of the thread
+
+    Returns:
+        (collapsed text, number of lines removed)
+    """
+    lines = text.split('\n')
+    output, removed = [], 0
+    index = 0
+    while index < len(lines):
+        attribution = _attribution_length(lines, index)
+        if attribution and _mostly_seen(lines[index + attribution:], earlier):
+            # Everything from here down is the quoted conversation
+            output.append(f"[{len(lines) - index} quoted lines from earlier in the thread collapsed]")
+            removed += len(lines) - index
+            break
+        if QUOTED_LINE_RE.match(lines[index]):
+            end = index
+            while end < len(lines) and QUOTED_LINE_RE.match(lines[end]):
+                end += 1
+            if _mostly_seen(lines[index:end], earlier):
+                output.append(f"[{end - index} quoted lines collapsed]")
+                removed += end - index
+            else:
+                output.extend(lines[index:end])
+            index = end
+            continue
+        output.append(lines[index])
+        index += 1
+    return '\n'.join(output).rstrip(), removed
+
+
+def get_thread(service, thread_id: str) -> dict:
+    """
+    Fetch a full-format thread in one request; a message ID also works.
+
+    The thread's messages are added to the message cache and the search
+    index, so reading one of them afterwards costs no request.
+
+    Args:
+        service: Authorized Gmail API service
+        thread_id: The thread's ID, or the ID of any message in it
+
+    Returns:
+        The thread resource, with its messages oldest first
+    """
+    try:
+        thread = execute(service.users().threads().get(userId='me', id=thread_id, format='full'))
+    except Exception as e:
+        if http_status(e) != 404:
+            raise
+        # Not a thread ID: look up the thread of the message with this ID
+        message = execute(service.users().messages().get(
+            userId='me', id=thread_id, format='minimal', fields='threadId'))
+        if message['threadId'] == thread_id:
+            raise
+        thread = execute(service.users().threads().get(userId='me', id=message['threadId'], format='full'))
+
+    account = account_of(service)
+    cache = get_message_cache(account)
+    for message in thread.get('messages', []):
+        cache.put(message)
+    index_messages(thread.get('messages', []), account)
+    return thread
+
+
+def format_thread(thread: dict, collapse_quotes: bool = True,
+                  max_chars_per_message: int = DEFAULT_MESSAGE_CHARS) -> str:
+    """
+    Render a thread's messages, oldest first, for a tool response.
+
+    Args:
+        thread: A full-format thread resource
+        collapse_quotes: Collapse quoted text already shown earlier in the thread
+        max_chars_per_message: Truncate each body to this many characters (0 for no limit)
+    """
+    messages = thread.get('messages', [])
+    earlier: set[str] = set()
+    output = [f"Thread {thread['id']}: {len(messages)} message(s)"]
+    collapsed_total = 0
+    for number, message in enumerate(messages, 1):
+        headers = {h['name']: h['value'] for h in message['payload']['headers']}
+        body, _ = read_body(message['payload'])
+        text = body
+        if collapse_quotes:
+            text, removed = collapse_quoted(body, earlier)
+            collapsed_total += removed
+            earlier.update(line for line in map(_normalize, body.split('\n')) if line)
+        if max_chars_per_message and len(text) > max_chars_per_message:
+            text = (text[:max_chars_per_message] +
+                    f"\n[Truncated; read the whole message with get_gmail_message(message_id='{message['id']}')]")
+
+        output.append("=" * 80)
+        output.append(f"[{number}/{len(messages)}] ID: {message['id']}")
+        output.append(f"From: {headers.get('From', 'N/A')}")
+        output.append(f"To: {headers.get('To', 'N/A')}")
+        output.append(f"Subject: {headers.get('Subject', 'N/A')}")
+        output.append(f"Date: {headers.get('Date', 'N/A')}")
+        output.append("-" * 80)
+        output.append(text)
+
+    if collapsed_total:
+        output.append("=" * 80)
+        output.append(f"({collapsed_total} quoted lines repeating earlier messages were collapsed)")
+    return "\n".join(output)
+
+
+def get_thread_text(thread_id: str, collapse_quotes: bool = True,
+                    max_chars_per_message: int = DEFAULT_MESSAGE_CHARS) -> str:
+    """Fetch a thread of the default account and render it for a tool response (see format_thread)."""
+    try:
+        thread = get_thread(get_gmail_service(), thread_id)
+        return format_thread(thread, collapse_quotes, max_chars_per_message)
+    except Exception as e:
+        return f"Error retrieving thread: {str(e)}"
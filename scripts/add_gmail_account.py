@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""Sign in an additional Gmail account so tools can search and export it with accounts="NAME"."""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Make the gmail_extractor package importable when launched as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gmail_extractor.ratelimit import execute
+from gmail_extractor.service import account_token_path, get_credentials, get_gmail_service, list_accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('name', nargs='?', help='Account name, e.g. "work" (omit to list the accounts)')
+    args = parser.parse_args()
+
+    if not args.name:
+        for name in list_accounts():
+            print(f"{name}: {account_token_path(name)}")
+        return
+
+    try:
+        # Opens the browser sign-in flow unless the account already has a usable token
+        get_credentials(account=args.name)
+        profile = execute(get_gmail_service(args.name).users().getProfile(userId='me'))
+        print(f"Account '{args.name}' is {profile['emailAddress']} ({profile.get('messagesTotal', 0)} messages)")
+        print(f"Token saved to {account_token_path(args.name)}")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
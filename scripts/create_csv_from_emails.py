@@ -1,41 +1,121 @@
 #!/usr/bin/env python3
 """Create CSV from saved email files."""
 
+import argparse
 import csv
-import sys
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import re
 
-def extract_email_info(file_path):
-    """Extract email information from a saved email text file."""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # Extract fields using regex
-    message_id_match = re.search(r'^Message ID: (.+)$', content, re.MULTILINE)
-    from_match = re.search(r'^From: (.+)$', content, re.MULTILINE)
-    to_match = re.search(r'^To: (.+)$', content, re.MULTILINE)
-    subject_match = re.search(r'^Subject: (.+)$', content, re.MULTILINE)
-    date_match = re.search(r'^Date: (.+)$', content, re.MULTILINE)
+FIELDNAMES = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
+SNIPPET_CHARS = 200
+
+BODY_MARKER = b'EMAIL BODY:'
+BODY_END = '\n' + '=' * 80
+
+# The header block of a saved email is well under this size
+HEADER_SCAN_BYTES = 64 * 1024
+# Files larger than this are mapped instead of read, so only the pages parsed are touched
+MMAP_THRESHOLD = 64 * 1024
+# Body bytes decoded first; enough for 200 characters of any UTF-8 text plus leading blank lines
+BODY_PREFIX_BYTES = 4096
+
+# Use a process pool automatically from this many files up
+PARALLEL_THRESHOLD = 2000
+# Print one line per file only for small runs
+VERBOSE_LIMIT = 100
+
+def _parse_header_block(block):
+    """Return the first value of each exported header in a header block."""
+    info = {}
+    for line in block.decode('utf-8', errors='replace').splitlines():
+        name, sep, value = line.partition(': ')
+        if sep and name in FIELDNAMES and name not in info and value.strip():
+            info[name] = value.rstrip('\r')
+    return info
+
+def _body_snippet(data, start):
+    """Decode just enough of the body starting at data[start:] to build the snippet."""
+    size = BODY_PREFIX_BYTES
+    while True:
+        chunk = data[start:start + size]
+        # Normalize newlines as text-mode reading would
+        text = chunk.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+        end = text.find(BODY_END)
+        complete = end != -1 or start + size >= len(data)
+        if end != -1:
+            text = text[:end]
+        text = text.strip()
+        if complete or len(text) >= SNIPPET_CHARS:
+            return text[:SNIPPET_CHARS].replace('\n', ' ')
+        size *= 4
 
-    # Extract body (everything after "EMAIL BODY:" and before final separator)
-    body_match = re.search(r'EMAIL BODY:\n\n(.+?)\n={80}', content, re.DOTALL)
-    body = body_match.group(1).strip() if body_match else ''
-
-    # Get first 200 chars of body as snippet
-    snippet = body[:200].replace('\n', ' ').replace('\r', ' ') if body else ''
+def extract_email_info(file_path):
+    """Extract email information from a saved email text file.
+
+    Only the header block and the first few KB of the body are read; files
+    above MMAP_THRESHOLD are memory-mapped so the rest is never touched.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size > MMAP_THRESHOLD:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            data = f.read()
+        try:
+            marker = data.find(BODY_MARKER, 0, HEADER_SCAN_BYTES)
+            header_end = marker if marker != -1 else min(size, HEADER_SCAN_BYTES)
+            info = _parse_header_block(data[:header_end])
+            snippet = _body_snippet(data, marker + len(BODY_MARKER)) if marker != -1 else ''
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
 
     return {
-        'Message ID': message_id_match.group(1) if message_id_match else 'N/A',
-        'From': from_match.group(1) if from_match else 'N/A',
-        'To': to_match.group(1) if to_match else 'N/A',
-        'Subject': subject_match.group(1) if subject_match else 'N/A',
-        'Date': date_match.group(1) if date_match else 'N/A',
+        'Message ID': info.get('Message ID', 'N/A'),
+        'From': info.get('From', 'N/A'),
+        'To': info.get('To', 'N/A'),
+        'Subject': info.get('Subject', 'N/A'),
+        'Date': info.get('Date', 'N/A'),
         'Snippet': snippet
     }
 
-def create_csv_from_pattern(pattern, output_csv):
-    """Create CSV from email files matching a pattern."""
+def _extract_safely(file_path):
+    """Worker entry point: return (info, None) or (None, error message)."""
+    try:
+        return extract_email_info(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+def iter_email_info(email_files, workers=None):
+    """Yield (file, info, error) for each file in order, in a process pool when worthwhile.
+
+    Args:
+        email_files: Paths of saved email files
+        workers: Worker processes (default: one per CPU for PARALLEL_THRESHOLD+ files, else 1)
+    """
+    if workers is None:
+        workers = (os.cpu_count() or 1) if len(email_files) >= PARALLEL_THRESHOLD else 1
+    if workers <= 1:
+        for email_file in email_files:
+            yield (email_file, *_extract_safely(email_file))
+        return
+
+    chunksize = max(1, min(512, len(email_files) // (workers * 8)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for email_file, result in zip(email_files, pool.map(_extract_safely, email_files, chunksize=chunksize)):
+            yield (email_file, *result)
+
+def create_csv_from_pattern(pattern, output_csv, workers=None):
+    """Create CSV from email files matching a pattern.
+
+    Args:
+        pattern: Glob pattern of files in the results directory
+        output_csv: Output CSV filename (written to the results directory)
+        workers: Worker processes (default: automatic, see iter_email_info)
+    """
     results_dir = Path(__file__).parent / 'results'
 
     # Find all matching files
@@ -46,37 +126,46 @@ def create_csv_from_pattern(pattern, output_csv):
         return
 
     print(f"Found {len(email_files)} email file(s) matching pattern: {pattern}")
+    verbose = len(email_files) <= VERBOSE_LIMIT
 
-    # Extract data from all files
-    email_data = []
-    for email_file in email_files:
-        try:
-            info = extract_email_info(email_file)
-            email_data.append(info)
-            print(f"  Processed: {email_file.name}")
-        except Exception as e:
-            print(f"  Error processing {email_file.name}: {e}")
-
-    # Write to CSV
+    # Extract data from all files, writing rows as they are parsed
     output_path = results_dir / output_csv
+    start = time.perf_counter()
+    written = errors = 0
     with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
+        writer = csv.DictWriter(csvfile, fieldnames=FIELDNAMES)
         writer.writeheader()
-        for row in email_data:
-            writer.writerow(row)
+
+        for email_file, info, error in iter_email_info(email_files, workers):
+            if error is not None:
+                errors += 1
+                print(f"  Error processing {email_file.name}: {error}")
+                continue
+            writer.writerow(info)
+            written += 1
+            if verbose:
+                print(f"  Processed: {email_file.name}")
+    elapsed = time.perf_counter() - start
 
     print(f"\nSuccessfully created CSV: {output_path}")
-    print(f"Total emails: {len(email_data)}")
+    print(f"Total emails: {written}")
+    if errors:
+        print(f"Files with errors: {errors}")
+    print(f"Parsed {len(email_files)} files in {elapsed:.2f}s ({len(email_files) / max(elapsed, 1e-9):,.0f} files/sec)")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python create_csv_from_emails.py <file_pattern> <output_csv>")
-        print("Example: python create_csv_from_emails.py 'lior_frnkl_*.txt' lior_emails.csv")
-        sys.exit(1)
-
-    pattern = sys.argv[1]
-    output_csv = sys.argv[2]
-
-    create_csv_from_pattern(pattern, output_csv)
+    parser = argparse.ArgumentParser(
+        description='Create a CSV from saved email files in the results directory.',
+        epilog="Example: python create_csv_from_emails.py 'lior_frnkl_*.txt' lior_emails.csv"
+    )
+    parser.add_argument('pattern', help="Glob pattern of email files (e.g. 'lior_frnkl_*.txt')")
+    parser.add_argument('output_csv', help='Output CSV filename')
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        default=None,
+        help=f'Worker processes (default: one per CPU for {PARALLEL_THRESHOLD}+ files, else 1)'
+    )
+    args = parser.parse_args()
+
+    create_csv_from_pattern(args.pattern, args.output_csv, args.workers)
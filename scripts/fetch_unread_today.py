@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
-"""Fetch 5 unread emails from today and save to CSV."""
+"""Fetch unread emails from today (5 by default) and save to CSV."""
 
+import argparse
 import csv
-import base64
+import sys
 from pathlib import Path
 from datetime import datetime
-from gmail_extractor.gmail_tools import get_gmail_service
 
-def fetch_unread_today():
-    """Fetch unread emails from today."""
+# Make the gmail_extractor package importable when launched as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gmail_extractor.export import CSV_FIELDNAMES, FETCH_KWARGS, SNIPPET_SOURCES, message_to_row
+from gmail_extractor.fetch import DEFAULT_MAX_CONCURRENCY, fetch_messages, iter_message_ids
+from gmail_extractor.service import get_gmail_service
+
+# Unlike the exports, this script keeps the first 500 characters of each body as its snippet
+DEFAULT_SNIPPET_SOURCE = 'body'
+
+def fetch_unread_today(snippet_source=DEFAULT_SNIPPET_SOURCE, max_results=5, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+    """Fetch unread emails from today.
+
+    Args:
+        snippet_source: "body" to download full messages and take 500 chars of the body,
+            or "api" to use Gmail's ~200-char snippet (metadata-only fetch) (default: "body")
+        max_results: Maximum number of emails to fetch (default: 5)
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+    """
     # Get today's date in Gmail query format
     today = datetime.now().strftime("%Y/%m/%d")
 
@@ -18,65 +34,31 @@ def fetch_unread_today():
     output_path = Path("results") / f"unread_emails_today_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
     try:
-        service = get_gmail_service()
-        results = service.users().messages().list(
-            userId='me',
-            maxResults=5,
-            q=query
-        ).execute()
+        message_ids = list(iter_message_ids(get_gmail_service(), query=query, max_results=max_results))
 
-        messages = results.get('messages', [])
-
-        if not messages:
+        if not message_ids:
             print("No unread messages found from today.")
             return
 
-        print(f"Found {len(messages)} unread message(s) from today.")
+        print(f"Found {len(message_ids)} unread message(s) from today.")
 
-        # Collect message data
+        # Collect message data; the fetches share the quota scheduler and its retries
         email_data = []
-        for msg in messages:
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='full'
-            ).execute()
-
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-            # Extract body snippet
-            def get_body_snippet(payload):
-                if 'body' in payload and 'data' in payload['body'] and payload['body']['data']:
-                    try:
-                        body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-                        return body[:500].replace('\n', ' ').replace('\r', ' ')
-                    except:
-                        return ""
-                elif 'parts' in payload:
-                    for part in payload['parts']:
-                        snippet = get_body_snippet(part)
-                        if snippet:
-                            return snippet
-                return ""
-
-            body_snippet = get_body_snippet(message['payload'])
-
-            email_data.append({
-                'Message ID': msg['id'],
-                'From': headers.get('From', 'N/A'),
-                'To': headers.get('To', 'N/A'),
-                'Subject': headers.get('Subject', 'N/A'),
-                'Date': headers.get('Date', 'N/A'),
-                'Snippet': body_snippet or message.get('snippet', '')
-            })
-
-            print(f"- From: {headers.get('From', 'N/A')}")
-            print(f"  Subject: {headers.get('Subject', 'N/A')}")
+        for msg_id, message in fetch_messages(get_gmail_service, message_ids, max_concurrency=max_concurrency,
+                                              **FETCH_KWARGS[snippet_source]):
+            if isinstance(message, Exception):
+                print(f"[FAILED] {msg_id}: {str(message)}")
+                continue
+
+            row = message_to_row(msg_id, message, snippet_source, snippet_chars=500)
+            email_data.append(row)
+
+            print(f"- From: {row['From']}")
+            print(f"  Subject: {row['Subject']}")
 
         # Write to CSV
         with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
 
             writer.writeheader()
             for row in email_data:
@@ -90,4 +72,12 @@ def fetch_unread_today():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    fetch_unread_today()
+    parser = argparse.ArgumentParser(description='Fetch unread emails from today and save to CSV')
+    parser.add_argument('--snippet-source', choices=SNIPPET_SOURCES, default=DEFAULT_SNIPPET_SOURCE,
+                        help="'body' downloads full messages and keeps 500 chars of the body; "
+                             "'api' uses Gmail's ~200-char snippet and fetches metadata only (default: body)")
+    parser.add_argument('--max-results', type=int, default=5, help='Maximum number of emails (default: 5)')
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help=f'Messages fetched in parallel (default: {DEFAULT_MAX_CONCURRENCY})')
+    args = parser.parse_args()
+    fetch_unread_today(args.snippet_source, args.max_results, args.max_concurrency)
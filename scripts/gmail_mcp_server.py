@@ -3,7 +3,9 @@
 
 import asyncio
 import os
-import pickle
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
@@ -12,56 +14,23 @@ from mcp.server import NotificationOptions, Server
 import mcp.server.stdio
 import mcp.types as types
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-import base64
-import csv
-from datetime import datetime
-
-# Gmail API scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
+# Make the gmail_extractor package importable when launched as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Only the tool defaults are imported up front; each handler imports the module
+# implementing its tool on first use, so the server answers initialize and
+# tools/list without loading them
+from gmail_extractor.defaults import (ANALYSIS_GROUPS, ANALYSIS_INTERVALS, ANALYSIS_SOURCES,
+                                      DEFAULT_ANALYSIS_RESULTS, DEFAULT_EXPORT_FORMAT, DEFAULT_MAX_BODY_CHARS,
+                                      DEFAULT_MAX_CONCURRENCY, DEFAULT_MESSAGE_CHARS, DEFAULT_SEARCH_MODE,
+                                      DEFAULT_SNIPPET_SOURCE, DEFAULT_TOP, EXPORT_FORMATS, SNIPPET_SOURCES)
 
 # Paths
 BASE_DIR = Path(__file__).parent
-TOKEN_PATH = BASE_DIR / 'private' / 'token.pickle'
-CLIENT_SECRET_PATH = BASE_DIR / 'private' / 'client_secret_184344902751-bdc92tjt9t9omprtouc2h8koarj8vvbf.apps.googleusercontent.com.json'
-
-# Global Gmail service
-_gmail_service = None
-
-
-def get_gmail_service():
-    """Authenticate and return Gmail API service."""
-    global _gmail_service
-
-    if _gmail_service:
-        return _gmail_service
-
-    creds = None
-
-    # Load existing credentials
-    if TOKEN_PATH.exists():
-        with open(TOKEN_PATH, 'rb') as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials, authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                str(CLIENT_SECRET_PATH), SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        # Save credentials for next time
-        TOKEN_PATH.parent.mkdir(exist_ok=True)
-        with open(TOKEN_PATH, 'wb') as token:
-            pickle.dump(creds, token)
 
-    _gmail_service = build('gmail', 'v1', credentials=creds)
-    return _gmail_service
+# Gmail calls block, so tool handlers run them here; each worker thread gets
+# its own Gmail service (and HTTP client) from gmail_extractor.service
+GMAIL_IO_THREADS = int(os.environ.get('GMAIL_MCP_IO_THREADS', '8'))
+_gmail_executor = ThreadPoolExecutor(max_workers=GMAIL_IO_THREADS, thread_name_prefix='gmail-io')
 
 
 # Create MCP server
@@ -87,24 +56,134 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "string",
                         "description": "Gmail search query (e.g., 'from:example@gmail.com', 'subject:invoice', 'newer_than:7d')",
                         "default": ""
+                    },
+                    "accounts": {
+                        "type": "string",
+                        "description": "Comma-separated account names, or 'all'; several accounts are searched in parallel and merged newest first (default: the default account)",
+                        "default": ""
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="list_gmail_labels",
+            description="List Gmail labels with their message and unread counts, to size a job before fetching it.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "include_system": {
+                        "type": "boolean",
+                        "description": "Include system labels such as INBOX and UNREAD (default: true)",
+                        "default": True
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="analyze_gmail",
+            description="Summarize many messages at once (top senders, volume over time, sizes, label counts). Only small aggregate tables are returned, never the messages themselves.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Gmail search query limiting the messages analyzed (remote source only)",
+                        "default": ""
+                    },
+                    "label": {
+                        "type": "string",
+                        "description": "Only analyze messages with this label, by name or ID",
+                        "default": ""
+                    },
+                    "max_results": {
+                        "type": "number",
+                        "description": f"Newest messages analyzed, 0 for all (default: {DEFAULT_ANALYSIS_RESULTS})",
+                        "default": DEFAULT_ANALYSIS_RESULTS
+                    },
+                    "source": {
+                        "type": "string",
+                        "enum": list(ANALYSIS_SOURCES),
+                        "description": "'remote' fetches metadata through the Gmail API (any query); 'mirror' syncs the local mailbox mirror and analyzes it, fast for whole mailboxes once the first sync has run (default: remote)",
+                        "default": "remote"
+                    },
+                    "top": {
+                        "type": "number",
+                        "description": f"Number of senders or domains to rank (default: {DEFAULT_TOP})",
+                        "default": DEFAULT_TOP
+                    },
+                    "interval": {
+                        "type": "string",
+                        "enum": list(ANALYSIS_INTERVALS),
+                        "description": "Histogram bucket (default: month)",
+                        "default": "month"
+                    },
+                    "group_by": {
+                        "type": "string",
+                        "enum": list(ANALYSIS_GROUPS),
+                        "description": "Rank by sender address or by domain (default: sender)",
+                        "default": "sender"
                     }
                 }
             }
         ),
         types.Tool(
             name="get_gmail_message",
-            description="Get the full content of a specific Gmail message by ID.",
+            description="Get the content of a specific Gmail message by ID. Long bodies are returned a page at a time; a truncated page ends with the offset to continue from.",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "message_id": {
                         "type": "string",
                         "description": "The ID of the Gmail message to retrieve"
+                    },
+                    "offset": {
+                        "type": "number",
+                        "description": "Character offset in the body to start from; use the offset given at the end of a truncated page to continue (default: 0)",
+                        "default": 0
+                    },
+                    "max_chars": {
+                        "type": "number",
+                        "description": f"Maximum body characters to return, 0 for no limit (default: {DEFAULT_MAX_BODY_CHARS})",
+                        "default": DEFAULT_MAX_BODY_CHARS
+                    },
+                    "plain_text": {
+                        "type": "boolean",
+                        "description": "Convert HTML to plain text, collapse whitespace and strip tracking parameters from links before paging (default: true)",
+                        "default": True
+                    },
+                    "include_labels": {
+                        "type": "boolean",
+                        "description": "Also show the message's current label IDs, e.g. UNREAD or STARRED (one small extra request when the content is cached; default: false)",
+                        "default": False
                     }
                 },
                 "required": ["message_id"]
             }
         ),
+        types.Tool(
+            name="get_gmail_thread",
+            description="Get a whole conversation (every message in a thread, oldest first) in one request. Quoted text repeating earlier messages is collapsed.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "thread_id": {
+                        "type": "string",
+                        "description": "The thread ID, or the ID of any message in the thread"
+                    },
+                    "collapse_quotes": {
+                        "type": "boolean",
+                        "description": "Replace quoted text that repeats earlier messages of the thread with a short marker (default: true)",
+                        "default": True
+                    },
+                    "max_chars_per_message": {
+                        "type": "number",
+                        "description": f"Truncate each message body to this many characters, 0 for no limit (default: {DEFAULT_MESSAGE_CHARS})",
+                        "default": DEFAULT_MESSAGE_CHARS
+                    }
+                },
+                "required": ["thread_id"]
+            }
+        ),
         types.Tool(
             name="search_gmail",
             description="Search Gmail messages using Gmail query syntax.",
@@ -119,6 +198,17 @@ async def handle_list_tools() -> list[types.Tool]:
                         "type": "number",
                         "description": "Maximum number of results to return (default: 20)",
                         "default": 20
+                    },
+                    "mode": {
+                        "type": "string",
+                        "enum": ["remote", "local"],
+                        "description": "'remote' searches through the Gmail API; 'local' searches the offline index of messages already fetched (no network)",
+                        "default": DEFAULT_SEARCH_MODE
+                    },
+                    "accounts": {
+                        "type": "string",
+                        "description": "Comma-separated account names, or 'all', to search in parallel, merged newest first; local mode searches one account's index (default: the default account)",
+                        "default": ""
                     }
                 },
                 "required": ["query"]
@@ -126,7 +216,7 @@ async def handle_list_tools() -> list[types.Tool]:
         ),
         types.Tool(
             name="export_gmail_to_csv",
-            description="Export Gmail messages to a CSV file. Returns the file path.",
+            description="Export Gmail messages to a CSV, Parquet, Arrow or gzip JSONL file. Returns the file path.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -142,7 +232,93 @@ async def handle_list_tools() -> list[types.Tool]:
                     },
                     "output_filename": {
                         "type": "string",
-                        "description": "Output CSV filename (default: gmail_export_TIMESTAMP.csv)",
+                        "description": "Output filename (default: gmail_export_TIMESTAMP plus the format's extension)",
+                        "default": ""
+                    },
+                    "max_concurrency": {
+                        "type": "number",
+                        "description": "Number of messages fetched in parallel (default: 8)",
+                        "default": DEFAULT_MAX_CONCURRENCY
+                    },
+                    "snippet_source": {
+                        "type": "string",
+                        "enum": list(SNIPPET_SOURCES),
+                        "description": "'api' uses Gmail's snippet with a lightweight metadata fetch; 'body' downloads full messages and cuts the snippet from the body (default: api)",
+                        "default": DEFAULT_SNIPPET_SOURCE
+                    },
+                    "format": {
+                        "type": "string",
+                        "enum": list(EXPORT_FORMATS),
+                        "description": "Output format; parquet and arrow are zstd-compressed. All but csv store Date as a UTC timestamp (default: csv)",
+                        "default": DEFAULT_EXPORT_FORMAT
+                    },
+                    "include_labels": {
+                        "type": "boolean",
+                        "description": "Add a Labels column with each message's label IDs (default: false)",
+                        "default": False
+                    },
+                    "include_body": {
+                        "type": "boolean",
+                        "description": "Add a Body column with the full message text; fetches full messages (default: false)",
+                        "default": False
+                    },
+                    "accounts": {
+                        "type": "string",
+                        "description": "Comma-separated account names, or 'all'; several accounts are exported in parallel, merged newest first, with an Account column (default: the default account)",
+                        "default": ""
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="download_gmail_attachments",
+            description="Download the attachments of messages matching a query to a local directory. Files are streamed to disk in parallel; identical files are stored once and attachments saved by an earlier run are skipped. Returns the saved paths.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Gmail search query (e.g., 'label:payments', 'from:billing@example.com'); only messages with attachments are considered",
+                        "default": ""
+                    },
+                    "max_results": {
+                        "type": "number",
+                        "description": "Maximum number of messages to download from (default: 10)",
+                        "default": 10
+                    },
+                    "output_dir": {
+                        "type": "string",
+                        "description": "Directory to save attachments in (default: attachments)",
+                        "default": ""
+                    },
+                    "mime_type": {
+                        "type": "string",
+                        "description": "Only download attachments of this MIME type, e.g. 'application/pdf' (optional)",
+                        "default": ""
+                    },
+                    "max_concurrency": {
+                        "type": "number",
+                        "description": "Number of parallel downloads (default: 8)",
+                        "default": DEFAULT_MAX_CONCURRENCY
+                    }
+                }
+            }
+        ),
+        types.Tool(
+            name="gmail_server_stats",
+            description="Report this server's runtime metrics: per-tool and per-API-method latency (p50/p95/p99), request counts, estimated quota units, bytes received, retries and cache hits.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {
+                        "type": "string",
+                        "enum": ["text", "prometheus"],
+                        "description": "'text' for a readable summary or 'prometheus' for the Prometheus text exposition format (default: text)",
+                        "default": "text"
+                    },
+                    "output_filename": {
+                        "type": "string",
+                        "description": "Also write the Prometheus text dump to this file, e.g. for node_exporter's textfile collector (optional)",
                         "default": ""
                     }
                 }
@@ -151,183 +327,143 @@ async def handle_list_tools() -> list[types.Tool]:
     ]
 
 
+async def run_blocking(func, *args) -> str:
+    """Run blocking Gmail I/O on the dedicated executor so the event loop stays responsive."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_gmail_executor, func, *args)
+
+
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict[str, Any] | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-    """Handle tool calls for Gmail operations."""
+    """Handle tool calls for Gmail operations, recording each call's latency."""
+    from gmail_extractor.metrics import get_metrics
+
+    start = time.perf_counter()
+    error = True
+    try:
+        contents = await dispatch_tool(name, arguments)
+        error = any(content.text.startswith("Error") for content in contents)
+        return contents
+    finally:
+        get_metrics().observe_tool(name, time.perf_counter() - start, error=error)
 
-    if name == "list_gmail_messages":
-        max_results = arguments.get("max_results", 10) if arguments else 10
-        query = arguments.get("query", "") if arguments else ""
 
-        try:
-            service = get_gmail_service()
-            results = service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                q=query
-            ).execute()
+async def dispatch_tool(
+    name: str, arguments: dict[str, Any] | None
+) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
+    """Run one tool call."""
 
-            messages = results.get('messages', [])
+    if name == "list_gmail_messages":
+        max_results = int(arguments.get("max_results", 10)) if arguments else 10
+        query = arguments.get("query", "") if arguments else ""
+        accounts = arguments.get("accounts", "") if arguments else ""
 
-            if not messages:
-                return [types.TextContent(type="text", text="No messages found.")]
+        from gmail_extractor.accounts import list_messages_text
+        text = await run_blocking(list_messages_text, max_results, query, accounts)
+        return [types.TextContent(type="text", text=text)]
 
-            output = []
-            for msg in messages:
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='metadata',
-                    metadataHeaders=['From', 'Subject', 'Date']
-                ).execute()
+    elif name == "list_gmail_labels":
+        include_system = bool((arguments or {}).get("include_system", True))
 
-                headers = {h['name']: h['value'] for h in message['payload']['headers']}
-                output.append(f"ID: {msg['id']}")
-                output.append(f"From: {headers.get('From', 'N/A')}")
-                output.append(f"Subject: {headers.get('Subject', 'N/A')}")
-                output.append(f"Date: {headers.get('Date', 'N/A')}")
-                output.append("-" * 80)
+        from gmail_extractor.labels import list_labels_text
+        text = await run_blocking(list_labels_text, include_system)
+        return [types.TextContent(type="text", text=text)]
 
-            return [types.TextContent(type="text", text="\n".join(output))]
+    elif name == "analyze_gmail":
+        arguments = arguments or {}
+        query = arguments.get("query", "")
+        label = arguments.get("label", "")
+        max_results = int(arguments.get("max_results", DEFAULT_ANALYSIS_RESULTS))
+        source = arguments.get("source", "remote")
+        top = int(arguments.get("top", DEFAULT_TOP))
+        interval = arguments.get("interval", "month")
+        group_by = arguments.get("group_by", "sender")
 
-        except Exception as e:
-            return [types.TextContent(type="text", text=f"Error listing messages: {str(e)}")]
+        from gmail_extractor.analytics import analyze_text
+        text = await run_blocking(analyze_text, query, label, max_results, source, top, interval, group_by)
+        return [types.TextContent(type="text", text=text)]
 
     elif name == "get_gmail_message":
         if not arguments or "message_id" not in arguments:
             return [types.TextContent(type="text", text="Error: message_id is required")]
 
-        message_id = arguments["message_id"]
-
-        try:
-            service = get_gmail_service()
-            message = service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
-
-            # Extract headers
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-            # Extract body
-            def get_body(payload):
-                if 'body' in payload and 'data' in payload['body']:
-                    return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
-                elif 'parts' in payload:
-                    for part in payload['parts']:
-                        body = get_body(part)
-                        if body:
-                            return body
-                return ""
-
-            body = get_body(message['payload'])
-
-            output = []
-            output.append(f"From: {headers.get('From', 'N/A')}")
-            output.append(f"To: {headers.get('To', 'N/A')}")
-            output.append(f"Subject: {headers.get('Subject', 'N/A')}")
-            output.append(f"Date: {headers.get('Date', 'N/A')}")
-            output.append("-" * 80)
-            output.append(body)
-
-            return [types.TextContent(type="text", text="\n".join(output))]
-
-        except Exception as e:
-            return [types.TextContent(type="text", text=f"Error retrieving message: {str(e)}")]
+        offset = int(arguments.get("offset", 0))
+        max_chars = int(arguments.get("max_chars", DEFAULT_MAX_BODY_CHARS))
+        plain_text = bool(arguments.get("plain_text", True))
+        include_labels = bool(arguments.get("include_labels", False))
+
+        from gmail_extractor.cache import get_message_text
+        text = await run_blocking(get_message_text, arguments["message_id"], offset, max_chars, plain_text,
+                                  include_labels)
+        return [types.TextContent(type="text", text=text)]
+
+    elif name == "get_gmail_thread":
+        if not arguments or "thread_id" not in arguments:
+            return [types.TextContent(type="text", text="Error: thread_id is required")]
+
+        collapse_quotes = bool(arguments.get("collapse_quotes", True))
+        max_chars_per_message = int(arguments.get("max_chars_per_message", DEFAULT_MESSAGE_CHARS))
+
+        from gmail_extractor.threads import get_thread_text
+        text = await run_blocking(get_thread_text, arguments["thread_id"], collapse_quotes, max_chars_per_message)
+        return [types.TextContent(type="text", text=text)]
 
     elif name == "search_gmail":
         if not arguments or "query" not in arguments:
             return [types.TextContent(type="text", text="Error: query is required")]
 
         query = arguments["query"]
-        max_results = arguments.get("max_results", 20)
+        max_results = int(arguments.get("max_results", 20))
+
+        if arguments.get("mode", DEFAULT_SEARCH_MODE) == "local":
+            from gmail_extractor.accounts import search_account_index
+            text = await run_blocking(search_account_index, arguments.get("accounts", ""), query, max_results)
+            return [types.TextContent(type="text", text=text)]
 
         # Reuse the list functionality
-        return await handle_call_tool("list_gmail_messages", {"max_results": max_results, "query": query})
+        return await dispatch_tool("list_gmail_messages", {"max_results": max_results, "query": query,
+                                                           "accounts": arguments.get("accounts", "")})
 
     elif name == "export_gmail_to_csv":
         query = arguments.get("query", "") if arguments else ""
-        max_results = arguments.get("max_results", 100) if arguments else 100
+        max_results = int(arguments.get("max_results", 100)) if arguments else 100
+        output_filename = arguments.get("output_filename", "") if arguments else ""
+        max_concurrency = int(arguments.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)) if arguments else DEFAULT_MAX_CONCURRENCY
+        snippet_source = arguments.get("snippet_source", DEFAULT_SNIPPET_SOURCE) if arguments else DEFAULT_SNIPPET_SOURCE
+        output_format = arguments.get("format", DEFAULT_EXPORT_FORMAT) if arguments else DEFAULT_EXPORT_FORMAT
+        include_labels = bool(arguments.get("include_labels", False)) if arguments else False
+        include_body = bool(arguments.get("include_body", False)) if arguments else False
+        accounts = arguments.get("accounts", "") if arguments else ""
+
+        # Relative filenames are saved next to this script
+        from gmail_extractor.export import export_messages_text
+        text = await run_blocking(export_messages_text, BASE_DIR, output_filename, query, max_results,
+                                  max_concurrency, snippet_source, output_format, include_labels, include_body,
+                                  accounts)
+        return [types.TextContent(type="text", text=text)]
+
+    elif name == "download_gmail_attachments":
+        query = arguments.get("query", "") if arguments else ""
+        max_results = int(arguments.get("max_results", 10)) if arguments else 10
+        output_dir = arguments.get("output_dir", "") if arguments else ""
+        mime_type = arguments.get("mime_type", "") if arguments else ""
+        max_concurrency = int(arguments.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)) if arguments else DEFAULT_MAX_CONCURRENCY
+
+        from gmail_extractor.attachments import download_attachments_text
+        text = await run_blocking(download_attachments_text, BASE_DIR / (output_dir or "attachments"), query,
+                                  max_results, mime_type, max_concurrency)
+        return [types.TextContent(type="text", text=text)]
+
+    elif name == "gmail_server_stats":
+        output_format = arguments.get("format", "text") if arguments else "text"
         output_filename = arguments.get("output_filename", "") if arguments else ""
 
-        # Generate default filename if not provided
-        if not output_filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"gmail_export_{timestamp}.csv"
-
-        # Ensure it's in the current directory
-        output_path = BASE_DIR / output_filename
-
-        try:
-            service = get_gmail_service()
-            results = service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                q=query
-            ).execute()
-
-            messages = results.get('messages', [])
-
-            if not messages:
-                return [types.TextContent(type="text", text="No messages found to export.")]
-
-            # Collect message data
-            email_data = []
-            for msg in messages:
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-
-                headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-                # Extract body snippet
-                def get_body_snippet(payload):
-                    if 'body' in payload and 'data' in payload['body'] and payload['body']['data']:
-                        try:
-                            body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-                            # Return first 200 characters
-                            return body[:200].replace('\n', ' ').replace('\r', ' ')
-                        except:
-                            return ""
-                    elif 'parts' in payload:
-                        for part in payload['parts']:
-                            snippet = get_body_snippet(part)
-                            if snippet:
-                                return snippet
-                    return ""
-
-                body_snippet = get_body_snippet(message['payload'])
-
-                email_data.append({
-                    'Message ID': msg['id'],
-                    'From': headers.get('From', 'N/A'),
-                    'To': headers.get('To', 'N/A'),
-                    'Subject': headers.get('Subject', 'N/A'),
-                    'Date': headers.get('Date', 'N/A'),
-                    'Snippet': body_snippet or message.get('snippet', '')
-                })
-
-            # Write to CSV
-            with open(output_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['Message ID', 'From', 'To', 'Subject', 'Date', 'Snippet']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-                writer.writeheader()
-                for row in email_data:
-                    writer.writerow(row)
-
-            return [types.TextContent(
-                type="text",
-                text=f"Successfully exported {len(email_data)} messages to: {output_path}\n\nFile contains: Message ID, From, To, Subject, Date, and Snippet (first 200 chars of body)"
-            )]
-
-        except Exception as e:
-            return [types.TextContent(type="text", text=f"Error exporting to CSV: {str(e)}")]
+        # Writing the dump is file I/O, so it runs off the event loop too
+        from gmail_extractor.metrics import stats_text
+        text = await run_blocking(stats_text, output_format, BASE_DIR / output_filename if output_filename else None)
+        return [types.TextContent(type="text", text=text)]
 
     else:
         raise ValueError(f"Unknown tool: {name}")
@@ -335,6 +471,10 @@ async def handle_call_tool(
 
 async def main():
     """Run the Gmail MCP server."""
+    from gmail_extractor.service import warm_up
+
+    # Load the Gmail client libraries and token while the client completes the handshake
+    _gmail_executor.submit(warm_up)
     async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,
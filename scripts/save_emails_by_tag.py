@@ -1,245 +1,219 @@
 #!/usr/bin/env python3
 """Script to save emails with a specific tag/label to the results directory."""
 
-import os
-import pickle
 import json
+import os
 import sys
 import argparse
+import tempfile
 from pathlib import Path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-import base64
-from datetime import datetime
 
-# Gmail API scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
+# Make the gmail_extractor package importable when launched as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gmail_extractor.attachments import download_message_attachments, format_download_summary
+from gmail_extractor.fetch import DEFAULT_MAX_CONCURRENCY, fetch_messages, iter_message_ids
+from gmail_extractor.labels import get_label_cache
+from gmail_extractor.mime import get_body
+from gmail_extractor.records import InternPool, MessageRecord
+from gmail_extractor.service import get_gmail_service
 
 # Paths
 BASE_DIR = Path(__file__).parent
-TOKEN_PATH = BASE_DIR / 'private' / 'token.pickle'
-CLIENT_SECRET_PATH = BASE_DIR / 'private' / 'client_secret_184344902751-bdc92tjt9t9omprtouc2h8koarj8vvbf.apps.googleusercontent.com.json'
 RESULTS_DIR = BASE_DIR / 'results'
+ATTACHMENTS_DIR = RESULTS_DIR / 'attachments'
+
+# Records which message IDs have been saved under each output prefix
+MANIFEST_PATH = RESULTS_DIR / 'manifest.json'
+
+# Persist the manifest after this many newly saved emails (and at the end of a run)
+MANIFEST_SAVE_EVERY = 50
 
-def get_gmail_service():
-    """Authenticate and return Gmail API service."""
-    creds = None
-
-    # Load existing credentials
-    if TOKEN_PATH.exists():
-        with open(TOKEN_PATH, 'rb') as token:
-            creds = pickle.load(token)
-
-    # If no valid credentials, authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                str(CLIENT_SECRET_PATH), SCOPES)
-            creds = flow.run_local_server(port=0)
-
-        # Save credentials for next time
-        TOKEN_PATH.parent.mkdir(exist_ok=True)
-        with open(TOKEN_PATH, 'wb') as token:
-            pickle.dump(creds, token)
-
-    return build('gmail', 'v1', credentials=creds)
-
-def get_body(payload):
-    """Recursively extract email body from payload."""
-    if 'body' in payload and 'data' in payload['body'] and payload['body']['data']:
+def write_atomic(path, text):
+    """Write text to path via a temporary file and rename, so readers never see a partial file."""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=path.parent, prefix=f'.{path.name}.',
+                                     suffix='.tmp', delete=False) as f:
         try:
-            return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
-        except:
-            return ""
-    elif 'parts' in payload:
-        body_parts = []
-        for part in payload['parts']:
-            body = get_body(part)
-            if body:
-                body_parts.append(body)
-        return '\n'.join(body_parts)
-    return ""
-
-def save_emails_with_query(query, max_results=10, output_prefix='email'):
-    """Search for emails with custom query and save them.
+            f.write(text)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+def load_manifest():
+    """Load the manifest, dropping entries whose files have since been deleted."""
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return {}
+    return {
+        prefix: {msg_id: filename for msg_id, filename in saved.items() if (RESULTS_DIR / filename).exists()}
+        for prefix, saved in manifest.items()
+    }
+
+def save_manifest(manifest):
+    write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True))
+
+def _or_na(value):
+    return 'N/A' if value is None else value
+
+def format_email(idx, total, record):
+    """Render one email (a MessageRecord with its body) in the results/ text layout."""
+    rule = "=" * 80
+    return (f"{rule}\nEMAIL {idx} OF {total}\n{rule}\n"
+            f"Message ID: {record.id}\n"
+            f"From: {_or_na(record.sender)}\n"
+            f"To: {_or_na(record.recipient)}\n"
+            f"Subject: {_or_na(record.subject)}\n"
+            f"Date: {_or_na(record.date)}\n"
+            f"{rule}\n\nEMAIL BODY:\n\n{record.body}\n\n{rule}")
+
+def to_record(message, intern):
+    """Reduce a full-format message to its record and decoded body, so the resource can be dropped."""
+    record = MessageRecord.from_message(message, intern)
+    record.body = get_body(message['payload'])
+    return record
+
+def save_messages(query, max_results, output_prefix, filename_template, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                  attachments=False, label_ids=None):
+    """Fetch the messages matching query concurrently and save the ones not already archived.
 
     Args:
         query: Gmail search query
-        max_results: Maximum number of emails to save (default: 10)
-        output_prefix: Prefix for output filenames (default: 'email')
+        max_results: Maximum number of emails to consider (may span several result pages)
+        output_prefix: Prefix for output filenames; the manifest is tracked per prefix
+        filename_template: Filename format with {prefix}, {idx} and {id} fields
+        max_concurrency: Number of messages fetched in parallel
+        attachments: Also download the messages' attachments to ATTACHMENTS_DIR
+        label_ids: Only list messages carrying all of these label IDs (exact, unlike label: queries)
+
+    Returns:
+        Tuple of (messages found, newly saved, skipped as already saved, failed)
     """
-    try:
-        # Create results directory if it doesn't exist
-        RESULTS_DIR.mkdir(exist_ok=True)
-
-        # Get Gmail service
-        service = get_gmail_service()
+    # Create results directory if it doesn't exist
+    RESULTS_DIR.mkdir(exist_ok=True)
 
+    if query:
         print(f"Searching for emails with query: {query}")
-
-        results = service.users().messages().list(
-            userId='me',
-            maxResults=max_results,
-            q=query
-        ).execute()
-
-        messages = results.get('messages', [])
-
-        if not messages:
-            print(f"No messages found with query: {query}")
-            return
-
-        print(f"Found {len(messages)} email(s). Saving to {RESULTS_DIR}...")
-
-        # Process each message
-        for idx, msg in enumerate(messages, 1):
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='full'
-            ).execute()
-
-            # Extract headers
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-            # Extract body
-            body = get_body(message['payload'])
-
-            # Create filename
-            subject = headers.get('Subject', 'No Subject').replace('/', '_').replace('\\', '_')
-            # Limit subject length for filename
-            subject = subject[:50] if len(subject) > 50 else subject
-            filename = f"{output_prefix}_{idx}_{msg['id']}.txt"
+    message_ids = list(iter_message_ids(get_gmail_service(), query=query, max_results=max_results,
+                                        labelIds=label_ids))
+    if not message_ids:
+        return 0, 0, 0, 0
+
+    manifest = load_manifest()
+    saved = manifest.setdefault(output_prefix, {})
+    positions = {msg_id: idx for idx, msg_id in enumerate(message_ids, 1)}
+    pending = [msg_id for msg_id in message_ids if msg_id not in saved]
+    print(f"Found {len(message_ids)} email(s); {len(message_ids) - len(pending)} already saved. "
+          f"Saving {len(pending)} to {RESULTS_DIR}...")
+
+    new_count = failed = 0
+    intern = InternPool()
+    try:
+        # Workers reduce each message to its record and body as soon as it arrives
+        for msg_id, record in fetch_messages(get_gmail_service, pending, max_concurrency=max_concurrency,
+                                             transform=lambda message: to_record(message, intern), format='full'):
+            idx = positions[msg_id]
+            if isinstance(record, Exception):
+                failed += 1
+                print(f"[FAILED] Email {idx} ({msg_id}): {str(record)}")
+                continue
+
+            filename = filename_template.format(prefix=output_prefix, idx=idx, id=msg_id)
             filepath = RESULTS_DIR / filename
-
-            # Prepare email content
-            email_content = []
-            email_content.append("=" * 80)
-            email_content.append(f"EMAIL {idx} OF {len(messages)}")
-            email_content.append("=" * 80)
-            email_content.append(f"Message ID: {msg['id']}")
-            email_content.append(f"From: {headers.get('From', 'N/A')}")
-            email_content.append(f"To: {headers.get('To', 'N/A')}")
-            email_content.append(f"Subject: {headers.get('Subject', 'N/A')}")
-            email_content.append(f"Date: {headers.get('Date', 'N/A')}")
-            email_content.append("=" * 80)
-            email_content.append("\nEMAIL BODY:\n")
-            email_content.append(body)
-            email_content.append("\n" + "=" * 80)
-
-            # Save to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(email_content))
+            write_atomic(filepath, format_email(idx, len(message_ids), record))
+            saved[msg_id] = filename
+            new_count += 1
+            if new_count % MANIFEST_SAVE_EVERY == 0:
+                save_manifest(manifest)
 
             print(f"[OK] Saved email {idx}: {filepath}")
             try:
-                print(f"  Subject: {headers.get('Subject', 'N/A')}")
-                print(f"  From: {headers.get('From', 'N/A')}")
+                print(f"  Subject: {_or_na(record.subject)}")
+                print(f"  From: {_or_na(record.sender)}")
             except UnicodeEncodeError:
                 print(f"  Subject: [Contains special characters]")
                 print(f"  From: [Contains special characters]")
             print()
+    finally:
+        save_manifest(manifest)
+
+    if attachments:
+        print(f"Downloading attachments to {ATTACHMENTS_DIR}...")
+        stats = download_message_attachments(get_gmail_service, message_ids, ATTACHMENTS_DIR,
+                                             max_concurrency=max_concurrency)
+        print(format_download_summary(stats, ATTACHMENTS_DIR))
+
+    return len(message_ids), new_count, len(message_ids) - len(pending), failed
+
+def print_summary(found, new_count, skipped, failed):
+    print(f"\nSuccessfully saved {new_count} new email(s) to: {RESULTS_DIR}")
+    if skipped:
+        print(f"Skipped {skipped} email(s) already saved")
+    if failed:
+        print(f"Warning: {failed} email(s) could not be fetched; re-run to retry them")
+
+def save_emails_with_query(query, max_results=10, output_prefix='email', max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                           attachments=False):
+    """Search for emails with custom query and save them.
+
+    Args:
+        query: Gmail search query
+        max_results: Maximum number of emails to save (default: 10)
+        output_prefix: Prefix for output filenames (default: 'email')
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+        attachments: Also download attachments to results/attachments (default: False)
+    """
+    try:
+        found, new_count, skipped, failed = save_messages(
+            query, max_results, output_prefix, '{prefix}_{idx}_{id}.txt', max_concurrency, attachments
+        )
+
+        if not found:
+            print(f"No messages found with query: {query}")
+            return
 
-        print(f"\nSuccessfully saved {len(messages)} email(s) to: {RESULTS_DIR}")
+        print_summary(found, new_count, skipped, failed)
 
     except Exception as e:
         print(f"Error: {str(e)}")
         import traceback
         traceback.print_exc()
 
-def save_emails_with_tag(tag, max_results=3, output_prefix=None):
+def save_emails_with_tag(tag, max_results=3, output_prefix=None, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                         attachments=False):
     """Search for emails with specified label and save them.
 
     Args:
         tag: The Gmail label/tag to search for
         max_results: Maximum number of emails to save (default: 3)
         output_prefix: Prefix for output filenames (default: uses tag name)
+        max_concurrency: Number of messages fetched in parallel (default: 8)
+        attachments: Also download attachments to results/attachments (default: False)
     """
     try:
-        # Create results directory if it doesn't exist
-        RESULTS_DIR.mkdir(exist_ok=True)
-
-        # Get Gmail service
-        service = get_gmail_service()
-
-        # Search for emails with specified label
-        # Gmail uses 'label:labelname' to search by label
-        query = f'label:{tag}'
-
-        print(f"Searching for emails with query: {query}")
-
-        results = service.users().messages().list(
-            userId='me',
-            maxResults=max_results,
-            q=query
-        ).execute()
-
-        messages = results.get('messages', [])
-
-        if not messages:
-            print(f"No messages found with '{tag}' tag.")
+        # List by label ID rather than a 'label:tag' search, which breaks on spaces and nesting
+        try:
+            label_id = get_label_cache().resolve(get_gmail_service(), tag)
+        except ValueError as e:
+            print(f"Error: {str(e)}")
             return
+        print(f"Listing emails with label '{tag}' (ID: {label_id})")
 
-        print(f"Found {len(messages)} email(s) with '{tag}' tag. Saving to {RESULTS_DIR}...")
-
-        # Use tag name as prefix if not specified
+        # Use tag name as prefix if not specified; nested labels ("Projects/Gmail") must not become paths
         if output_prefix is None:
-            output_prefix = tag
-
-        # Process each message
-        for idx, msg in enumerate(messages, 1):
-            message = service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='full'
-            ).execute()
-
-            # Extract headers
-            headers = {h['name']: h['value'] for h in message['payload']['headers']}
-
-            # Extract body
-            body = get_body(message['payload'])
-
-            # Create filename
-            subject = headers.get('Subject', 'No Subject').replace('/', '_').replace('\\', '_')
-            # Limit subject length for filename
-            subject = subject[:50] if len(subject) > 50 else subject
-            filename = f"{output_prefix}_email_{idx}_{msg['id']}.txt"
-            filepath = RESULTS_DIR / filename
+            output_prefix = tag.replace('/', '-').replace('\\', '-')
 
-            # Prepare email content
-            email_content = []
-            email_content.append("=" * 80)
-            email_content.append(f"EMAIL {idx} OF {len(messages)}")
-            email_content.append("=" * 80)
-            email_content.append(f"Message ID: {msg['id']}")
-            email_content.append(f"From: {headers.get('From', 'N/A')}")
-            email_content.append(f"To: {headers.get('To', 'N/A')}")
-            email_content.append(f"Subject: {headers.get('Subject', 'N/A')}")
-            email_content.append(f"Date: {headers.get('Date', 'N/A')}")
-            email_content.append("=" * 80)
-            email_content.append("\nEMAIL BODY:\n")
-            email_content.append(body)
-            email_content.append("\n" + "=" * 80)
-
-            # Save to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(email_content))
+        found, new_count, skipped, failed = save_messages(
+            '', max_results, output_prefix, '{prefix}_email_{idx}_{id}.txt', max_concurrency, attachments,
+            label_ids=[label_id]
+        )
 
-            print(f"[OK] Saved email {idx}: {filepath}")
-            try:
-                print(f"  Subject: {headers.get('Subject', 'N/A')}")
-                print(f"  From: {headers.get('From', 'N/A')}")
-            except UnicodeEncodeError:
-                print(f"  Subject: [Contains special characters]")
-                print(f"  From: [Contains special characters]")
-            print()
+        if not found:
+            print(f"No messages found with '{tag}' tag.")
+            return
 
-        print(f"\nSuccessfully saved {len(messages)} email(s) to: {RESULTS_DIR}")
+        print_summary(found, new_count, skipped, failed)
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -261,7 +235,7 @@ if __name__ == "__main__":
         '-n', '--max-results',
         type=int,
         default=3,
-        help='Maximum number of emails to save (default: 3)'
+        help='Maximum number of emails to save; may span several result pages (default: 3)'
     )
     parser.add_argument(
         '-p', '--prefix',
@@ -276,6 +250,18 @@ if __name__ == "__main__":
         help='Custom Gmail search query (e.g., "is:unread after:2025/10/19")'
     )
 
+    parser.add_argument(
+        '-c', '--max-concurrency',
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f'Number of emails fetched in parallel (default: {DEFAULT_MAX_CONCURRENCY})'
+    )
+    parser.add_argument(
+        '-a', '--attachments',
+        action='store_true',
+        help='Also download the emails\' attachments to results/attachments (identical files are stored once)'
+    )
+
     args = parser.parse_args()
 
     # If custom query provided, use it directly
@@ -283,13 +269,17 @@ if __name__ == "__main__":
         save_emails_with_query(
             query=args.query,
             max_results=args.max_results,
-            output_prefix=args.prefix or 'email'
+            output_prefix=args.prefix or 'email',
+            max_concurrency=args.max_concurrency,
+            attachments=args.attachments
         )
     elif args.tag:
         save_emails_with_tag(
             tag=args.tag,
             max_results=args.max_results,
-            output_prefix=args.prefix
+            output_prefix=args.prefix,
+            max_concurrency=args.max_concurrency,
+            attachments=args.attachments
         )
     else:
         parser.error("Either 'tag' or '--query' must be provided")
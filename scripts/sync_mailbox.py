@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Incrementally sync the local mailbox mirror and optionally print its newest messages."""
+
+import argparse
+import sys
+from pathlib import Path
+
+# Make the gmail_extractor package importable when launched as a script
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from gmail_extractor.service import get_gmail_service
+from gmail_extractor.sync import MailboxMirror, sync_mailbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '-n', '--max-messages',
+        type=int,
+        default=None,
+        help='Cap on messages listed when a full resync is needed (default: whole mailbox)'
+    )
+    parser.add_argument(
+        '-s', '--show',
+        type=int,
+        default=0,
+        help='Print this many of the newest mirrored messages after syncing'
+    )
+    parser.add_argument(
+        '-l', '--label',
+        type=str,
+        default=None,
+        help='Only show messages with this label ID (e.g., UNREAD, INBOX)'
+    )
+    args = parser.parse_args()
+
+    try:
+        mirror = MailboxMirror()
+        summary = sync_mailbox(get_gmail_service(), mirror, max_messages=args.max_messages)
+        print(f"{summary['mode'].capitalize()} sync: +{summary['added']} new, -{summary['deleted']} deleted, "
+              f"{summary['labels_changed']} relabeled in {summary['api_calls']} API call(s)")
+        print(f"Mirror holds {len(mirror)} message(s) as of historyId {summary['history_id']}")
+
+        if args.show:
+            for message in mirror.iter_messages(label_id=args.label, limit=args.show):
+                print("-" * 80)
+                print(f"ID: {message['Message ID']}")
+                print(f"From: {message['From']}")
+                print(f"Subject: {message['Subject']}")
+                print(f"Date: {message['Date']}")
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    main()
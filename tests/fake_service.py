@@ -0,0 +1,49 @@
+"""Gmail services backed by the in-process fake from benchmarks/fake_gmail_api.py."""
+import unittest
+from unittest import mock
+
+from benchmarks.fake_gmail_api import FakeGmailAPI
+from gmail_extractor import batching, ratelimit
+
+
+def start_fake(test: unittest.TestCase, account: str | None = None, **options) -> tuple[FakeGmailAPI, object]:
+    """
+    Serve a fake mailbox for the duration of a test and return it with a service talking to it.
+
+    Args:
+        test: Test case the server and the patched schedulers are cleaned up with
+        account: Named account the service is authorized for (None: the default account)
+        **options: FakeGmailAPI arguments (message_count, error_rate, ...)
+
+    Returns:
+        (fake API, Gmail service) tuple
+    """
+    api = FakeGmailAPI(**options)
+    base_url = api.start()
+    test.addCleanup(api.stop)
+    service = api.build_service(base_url)
+    test.addCleanup(service._http.close)
+    if account is not None:
+        service._http.gmail_account = account
+
+    # No quota waits, and no backoff sleeps between retries of injected errors
+    no_delay = lambda attempt, error=None: 0
+    for patcher in (mock.patch.object(ratelimit, '_scheduler', ratelimit.GmailScheduler(units_per_second=1e6)),
+                    mock.patch.dict(ratelimit._account_schedulers),
+                    mock.patch.object(ratelimit, 'backoff_delay', no_delay),
+                    mock.patch.object(batching, 'backoff_delay', no_delay)):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return api, service
+
+
+def service_factory(test: unittest.TestCase, api: FakeGmailAPI):
+    """Return a callable building another service for a started fake, for code that gives each thread its own."""
+    base_url = 'http://%s:%d/' % api._server.server_address
+
+    def build():
+        service = api.build_service(base_url)
+        test.addCleanup(service._http.close)
+        return service
+
+    return build
@@ -0,0 +1,72 @@
+"""Tests for deduplicating attachment downloads and the in-flight byte budget."""
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from gmail_extractor.attachments import MANIFEST_NAME, ByteBudget, download_message_attachments
+from tests.fake_service import service_factory, start_fake
+
+
+class ByteBudgetTest(unittest.TestCase):
+
+    def test_requests_are_capped_at_the_budget(self):
+        budget = ByteBudget(100)
+        self.assertEqual(budget.acquire(500), 100)
+        budget.release(100)
+        self.assertEqual(budget.acquire(0), 1)
+
+    def test_acquire_waits_for_released_bytes(self):
+        budget = ByteBudget(100)
+        budget.acquire(80)
+        acquired = threading.Event()
+
+        def second():
+            budget.acquire(50)
+            acquired.set()
+
+        thread = threading.Thread(target=second)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        budget.release(80)
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+
+class DownloadAttachmentsTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.output_dir = Path(work_dir.name)
+        # Every other message has an attachment, with only three distinct contents among them
+        self.api, _ = start_fake(self, message_count=12, attachment_every=2, attachment_size=4096,
+                                 attachment_variants=3)
+        self.factory = service_factory(self, self.api)
+        self.ids = [message['id'] for message in self.api.messages]
+
+    def download(self, **options) -> dict:
+        return download_message_attachments(self.factory, self.ids, self.output_dir, max_concurrency=4, **options)
+
+    def test_identical_content_is_stored_once(self):
+        stats = self.download()
+        self.assertEqual((stats['attachments'], stats['downloaded'], stats['duplicates'], stats['failed']),
+                         (6, 3, 3, 0))
+        self.assertEqual(stats['bytes'], 3 * 4096)
+        stored = [path for path in self.output_dir.iterdir() if path.name != MANIFEST_NAME]
+        self.assertEqual(sorted(map(str, stored)), sorted(stats['files']))
+        self.assertEqual(len({path.read_bytes() for path in stored}), 3)
+
+    def test_a_rerun_skips_what_the_manifest_records(self):
+        self.download()
+        stats = self.download()
+        self.assertEqual((stats['skipped'], stats['downloaded'], stats['duplicates']), (6, 0, 0))
+
+    def test_a_budget_smaller_than_one_attachment_still_completes(self):
+        stats = self.download(max_bytes_in_flight=1000)
+        self.assertEqual(stats['downloaded'] + stats['duplicates'], 6)
+        self.assertEqual(stats['failed'], 0)
+
+    def test_mime_type_filter(self):
+        self.assertEqual(self.download(mime_types=['image/png'])['attachments'], 0)
+        self.assertEqual(self.download(mime_types=['application/pdf'])['attachments'], 6)
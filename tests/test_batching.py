@@ -0,0 +1,44 @@
+"""Tests for batched message fetches against the fake Gmail API."""
+import unittest
+from unittest import mock
+
+from benchmarks.fake_gmail_api import synthetic_message_id
+from gmail_extractor.batching import batch_get_messages
+from gmail_extractor.ratelimit import MAX_RETRIES, get_scheduler, http_status
+from tests.fake_service import start_fake
+
+
+class BatchGetMessagesTest(unittest.TestCase):
+
+    def test_results_are_aligned_with_the_ids(self):
+        _, service = start_fake(self, message_count=250)
+        ids = [synthetic_message_id(i) for i in reversed(range(250))]
+        with mock.patch.object(service, 'new_batch_http_request', wraps=service.new_batch_http_request) as batches:
+            results = batch_get_messages(service, ids, format='minimal')
+        self.assertEqual([message['id'] for message in results], ids)
+        # At most 100 sub-requests per round-trip
+        self.assertEqual(batches.call_count, 3)
+
+    def test_a_missing_message_fails_only_its_own_slot(self):
+        _, service = start_fake(self, message_count=5)
+        ids = [synthetic_message_id(0), 'deleted', synthetic_message_id(1)]
+        results = batch_get_messages(service, ids, batch_size=2, format='minimal')
+        self.assertEqual(results[0]['id'], ids[0])
+        self.assertEqual(http_status(results[1]), 404)
+        self.assertEqual(results[2]['id'], ids[2])
+
+    def test_failed_sub_requests_are_retried_alone(self):
+        api, service = start_fake(self, message_count=100, error_rate=0.3)
+        ids = [synthetic_message_id(i) for i in range(100)]
+        with mock.patch.object(api, 'dispatch', wraps=api.dispatch) as sub_requests:
+            results = batch_get_messages(service, ids, format='minimal')
+        self.assertEqual([message['id'] for message in results], ids)
+        self.assertGreater(api.errors, 0)
+        # Every failure is re-sent once; the sub-requests that succeeded are not
+        self.assertEqual(sub_requests.call_count, len(ids) + api.errors)
+
+    def test_sub_requests_still_failing_after_the_last_retry_are_returned(self):
+        _, service = start_fake(self, message_count=3, error_rate=1.0)
+        results = batch_get_messages(service, [synthetic_message_id(i) for i in range(3)], format='minimal')
+        self.assertEqual([http_status(result) for result in results], [503] * 3)
+        self.assertEqual(get_scheduler().retries, MAX_RETRIES)
@@ -0,0 +1,110 @@
+"""Tests for the two-tier message cache."""
+import itertools
+import tempfile
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.fake_gmail_api import synthetic_message_id
+from gmail_extractor import search_index
+from gmail_extractor.cache import MessageCache, get_message
+from gmail_extractor.search_index import SearchIndex
+from tests.fake_service import start_fake
+
+
+def message(index: int, body: str = 'x' * 100) -> dict:
+    return {'id': f'm{index}', 'labelIds': ['INBOX'], 'historyId': '1', 'payload': {'body': {'data': body}}}
+
+
+class MessageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.db_path = Path(work_dir.name) / 'messages.sqlite3'
+        # Distinct access times, so disk eviction order does not depend on the clock's resolution
+        clock = itertools.count(1)
+        patcher = mock.patch('gmail_extractor.cache.time', types.SimpleNamespace(time=lambda: next(clock)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_cache(self, **budgets) -> MessageCache:
+        cache = MessageCache(self.db_path, **budgets)
+        self.addCleanup(cache._db.close)
+        return cache
+
+    def test_mutable_fields_are_not_cached(self):
+        cache = self.open_cache()
+        cache.put(message(1))
+        self.assertEqual(cache.get('m1'), {'id': 'm1', 'payload': {'body': {'data': 'x' * 100}}})
+
+    def test_disk_hits_are_promoted_to_memory(self):
+        self.open_cache().put(message(1))
+        cache = self.open_cache()
+        self.assertIsNotNone(cache.get('m1'))
+        self.assertIsNotNone(cache.get('m1'))
+        self.assertIsNone(cache.get('m2'))
+        stats = cache.stats()
+        self.assertEqual((stats['disk_hits'], stats['memory_hits'], stats['misses']), (1, 1, 1))
+
+    def test_memory_tier_evicts_least_recently_used_to_its_budget(self):
+        # Room for three of these ~140-byte messages
+        cache = self.open_cache(max_memory_bytes=450)
+        for index in range(3):
+            cache.put(message(index))
+        cache.get('m0')
+        cache.put(message(3))
+
+        self.assertLessEqual(cache.stats()['memory_bytes'], 450)
+        self.assertEqual(list(cache._memory), ['m2', 'm0', 'm3'])
+        # The evicted entry is still on disk
+        self.assertIsNotNone(cache.get('m1'))
+        self.assertEqual(cache.stats()['disk_hits'], 1)
+
+    def test_oversized_messages_skip_memory_but_reach_disk(self):
+        cache = self.open_cache(max_memory_bytes=50)
+        cache.put(message(1))
+        self.assertEqual(cache.stats()['memory_entries'], 0)
+        self.assertIsNotNone(cache.get('m1'))
+
+    def test_disk_tier_evicts_least_recently_accessed_rows(self):
+        cache = self.open_cache(max_memory_bytes=0)
+        cache.put(message(0))
+        cache.max_disk_bytes = 3 * cache.stats()['disk_bytes']
+        cache.put(message(1))
+        cache.put(message(2))
+        cache.get('m0')
+        cache.put(message(3))
+
+        # Evicted oldest access first until under 90% of the budget: m1, then m2
+        self.assertLessEqual(cache.stats()['disk_bytes'], 0.9 * cache.max_disk_bytes)
+        self.assertEqual([cache.get(f'm{index}') is not None for index in range(4)], [True, False, False, True])
+
+
+class GetMessageTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        index = SearchIndex(Path(work_dir.name) / 'search.sqlite3')
+        self.addCleanup(index._db.close)
+        patcher = mock.patch.object(search_index, '_index', index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api, self.service = start_fake(self, message_count=3)
+        self.cache = MessageCache(db_path=None)
+
+    def test_content_is_fetched_once_and_state_on_request(self):
+        message_id = synthetic_message_id(0)
+        fetched = get_message(self.service, message_id, cache=self.cache)
+        self.assertIn('labelIds', fetched)
+
+        cached = get_message(self.service, message_id, cache=self.cache)
+        self.assertNotIn('labelIds', cached)
+        self.assertEqual(cached['payload'], fetched['payload'])
+
+        self.api.modify_labels(message_id, add=['STARRED'])
+        refreshed = get_message(self.service, message_id, refresh_state=True, cache=self.cache)
+        self.assertIn('STARRED', refreshed['labelIds'])
+        self.assertEqual(self.cache.stats()['misses'], 1)
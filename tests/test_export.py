@@ -0,0 +1,89 @@
+"""Tests for the streaming export pipeline against the fake Gmail API."""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gmail_extractor import fetch, search_index
+from gmail_extractor.export import iter_export_rows, iter_merged_export_rows
+from gmail_extractor.search_index import SearchIndex
+from tests.fake_service import service_factory, start_fake
+
+
+class ExportTestCase(unittest.TestCase):
+    """Keeps the search index the exports feed out of private/."""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        index = SearchIndex(Path(work_dir.name) / 'search.sqlite3')
+        self.addCleanup(index._db.close)
+        patcher = mock.patch.object(search_index, '_index', index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class IterExportRowsTest(ExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Small pages, so a 30-message mailbox spans several of them
+        patcher = mock.patch.object(fetch, 'MAX_PAGE_SIZE', 7)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.api, _ = start_fake(self, message_count=30)
+        self.factory = service_factory(self, self.api)
+
+    def test_every_page_is_exported_in_list_order(self):
+        stats = {}
+        rows = list(iter_export_rows(self.factory, stats=stats))
+        self.assertEqual([row['Message ID'] for row in rows], [message['id'] for message in self.api.messages])
+        self.assertEqual(stats, {'exported': 30, 'failed': 0})
+
+    def test_max_results_stops_part_way_through_a_page(self):
+        rows = list(iter_export_rows(self.factory, max_results=10))
+        self.assertEqual([row['Message ID'] for row in rows], [message['id'] for message in self.api.messages[:10]])
+
+    def test_failed_fetches_are_counted_and_skipped(self):
+        gone = self.api.messages[3]['id']
+        listed = [message['id'] for message in self.api.messages]
+        stats = {}
+        with mock.patch('gmail_extractor.export.iter_message_ids', return_value=iter(listed)):
+            self.api.delete_message(gone)
+            rows = list(iter_export_rows(self.factory, stats=stats))
+        self.assertNotIn(gone, [row['Message ID'] for row in rows])
+        self.assertEqual(stats, {'exported': 29, 'failed': 1})
+
+
+class IterMergedExportRowsTest(ExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Two mailboxes whose messages alternate in time: home's are on the minute, work's half a minute earlier
+        self.factories = {}
+        for account, offset in (('home', 0), ('work', 30_000)):
+            api, _ = start_fake(self, message_count=20)
+            for index, message in enumerate(api.messages):
+                message['internalDate'] = str(1_700_000_000_000 - index * 60_000 - offset)
+            self.factories[account] = service_factory(self, api)
+
+    def test_rows_are_merged_newest_first_across_accounts(self):
+        stats = {}
+        rows = list(iter_merged_export_rows(self.factories, stats=stats, max_concurrency=2))
+        self.assertEqual([row['Account'] for row in rows], ['home', 'work'] * 20)
+        self.assertEqual(stats['exported'], 40)
+        self.assertEqual({account: counts['exported'] for account, counts in stats['accounts'].items()},
+                         {'home': 20, 'work': 20})
+
+    def test_max_results_caps_the_merged_total(self):
+        rows = list(iter_merged_export_rows(self.factories, max_results=5))
+        self.assertEqual([row['Account'] for row in rows], ['home', 'work', 'home', 'work', 'home'])
+
+    def test_a_failing_account_does_not_stop_the_others(self):
+        def broken():
+            raise RuntimeError('token revoked')
+
+        stats = {}
+        rows = list(iter_merged_export_rows({**self.factories, 'broken': broken}, stats=stats))
+        self.assertEqual(len(rows), 40)
+        self.assertEqual(stats['accounts']['broken'], {'exported': 0, 'failed': 0, 'error': 'token revoked'})
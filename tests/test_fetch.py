@@ -0,0 +1,41 @@
+"""Tests for the bounded-concurrency message fetch engine."""
+import random
+import unittest
+
+from benchmarks.fake_gmail_api import synthetic_message_id
+from gmail_extractor.fetch import fetch_messages
+from gmail_extractor.ratelimit import http_status
+from tests.fake_service import service_factory, start_fake
+
+
+class FetchMessagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api, _ = start_fake(self, message_count=40)
+        self.factory = service_factory(self, self.api)
+
+    def test_results_are_yielded_in_input_order(self):
+        ids = [synthetic_message_id(i) for i in range(40)]
+        random.Random(1).shuffle(ids)
+        results = list(fetch_messages(self.factory, iter(ids), max_concurrency=4, format='minimal'))
+        self.assertEqual([message_id for message_id, _ in results], ids)
+        self.assertEqual([message['id'] for _, message in results], ids)
+
+    def test_a_failed_message_is_yielded_as_its_error(self):
+        ids = [synthetic_message_id(0), 'deleted', synthetic_message_id(1)]
+        results = dict(fetch_messages(self.factory, ids, max_concurrency=2, format='minimal'))
+        self.assertEqual(http_status(results['deleted']), 404)
+        self.assertEqual(results[ids[0]]['id'], ids[0])
+        self.assertEqual(results[ids[2]]['id'], ids[2])
+
+    def test_transform_errors_are_yielded_like_fetch_errors(self):
+        def transform(message):
+            if message['id'] == synthetic_message_id(1):
+                raise ValueError('bad message')
+            return message['id'].upper()
+
+        ids = [synthetic_message_id(i) for i in range(3)]
+        results = [result for _, result in fetch_messages(self.factory, ids, transform=transform, format='minimal')]
+        self.assertEqual(results[0], ids[0].upper())
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], ids[2].upper())
@@ -0,0 +1,86 @@
+"""Tests for the streaming text reduction and paged body reads."""
+import base64
+import unittest
+
+from gmail_extractor.mime import (DECODE_BLOCK_CHARS, TextReducer, html_to_text, read_body, shorten_url,
+                                  strip_tracking_params)
+
+HTML = ('<html><head><title>T</title><style>p{color:red}</style></head><body>'
+        '<p>Hello&nbsp;&amp; welcome</p><div>Line   two</div>'
+        '<table><tr><td>a</td><td>b</td></tr></table><script>var x=1;</script>'
+        '<a href="x">https://ex.com/p?utm_source=nl&id=3</a><!-- c --></body></html>')
+
+
+def encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def text_part(text: str, mime_type: str = 'text/plain') -> dict:
+    return {'mimeType': mime_type, 'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset=utf-8'}],
+            'body': {'size': len(text.encode()), 'data': encode(text)}}
+
+
+def reduce_in_slices(text: str, size: int, is_html: bool) -> str:
+    reducer = TextReducer(is_html=is_html)
+    return ''.join(reducer.feed(text[i:i + size]) for i in range(0, len(text), size)) + reducer.close()
+
+
+class TextReducerTest(unittest.TestCase):
+
+    def test_html_is_reduced_to_text(self):
+        self.assertEqual(html_to_text(HTML), 'Hello & welcome\n\nLine two\n\na b\n\nhttps://ex.com/p?id=3')
+
+    def test_output_does_not_depend_on_how_input_is_split(self):
+        plain = '  First   line\n\n\nsecond https://ex.com/q?id=1&utm_medium=mail  end '
+        whole = reduce_in_slices(plain, len(plain), is_html=False)
+        for size in (1, 2, 3, 7, 50):
+            with self.subTest(size=size):
+                self.assertEqual(reduce_in_slices(HTML, size, is_html=True), html_to_text(HTML))
+                self.assertEqual(reduce_in_slices(plain, size, is_html=False), whole)
+
+    def test_unterminated_tag_is_dropped_on_close(self):
+        reducer = TextReducer(is_html=True)
+        text = reducer.feed('<p>kept text</p><a href="http://ex') + reducer.close()
+        self.assertEqual(text.strip(), 'kept text')
+
+    def test_urls_lose_tracking_params_and_long_ones_are_shortened(self):
+        self.assertEqual(strip_tracking_params('https://a.com/x?utm_source=a&id=1&fbclid=z#frag'),
+                         'https://a.com/x?id=1#frag')
+        self.assertEqual(shorten_url('https://track.example.com/' + 'a' * 120), 'https://track.example.com/...')
+
+
+class ReadBodyTest(unittest.TestCase):
+
+    def setUp(self):
+        # Multi-byte text spanning several decode blocks
+        self.payload = text_part('שלום עולם ' * (DECODE_BLOCK_CHARS // 3))
+        self.full, self.next_offset = read_body(self.payload)
+
+    def test_whole_body_has_no_next_offset(self):
+        self.assertIsNone(self.next_offset)
+        self.assertTrue(self.full.startswith('שלום עולם שלום'))
+
+    def test_pages_concatenate_to_the_whole_body(self):
+        offset, pages = 0, []
+        while offset is not None:
+            page, next_offset = read_body(self.payload, offset, 7000)
+            if next_offset is not None:
+                self.assertEqual(next_offset, offset + 7000)
+            pages.append(page)
+            offset = next_offset
+        self.assertGreater(len(pages), 2)
+        self.assertEqual(''.join(pages), self.full)
+
+    def test_page_bounds(self):
+        self.assertEqual(read_body(self.payload, 0, 20), ('שלום עולם שלום עולם ', 20))
+        self.assertEqual(read_body(self.payload, len(self.full) + 5, 10), ('', None))
+
+    def test_plain_part_is_preferred_and_reduce_can_be_disabled(self):
+        payload = {'mimeType': 'multipart/alternative', 'headers': [],
+                   'parts': [text_part(HTML, 'text/html'), text_part('plain   body')]}
+        self.assertEqual(read_body(payload), ('plain body', None))
+        self.assertEqual(read_body(payload, reduce=False)[0], 'plain   body')
+
+
+if __name__ == '__main__':
+    unittest.main()
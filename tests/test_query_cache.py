@@ -0,0 +1,131 @@
+"""Tests for the coalescing, historyId-validated query cache."""
+import threading
+import time
+import types
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from gmail_extractor.query_cache import QueryCache
+
+
+class Clock:
+    """A monotonic clock moved by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.history_id = '100'
+        self.clock = Clock()
+        patcher = mock.patch('gmail_extractor.query_cache.time', types.SimpleNamespace(monotonic=self.clock.monotonic))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = QueryCache(ttl=60, fresh_seconds=2, history_id=self.read_history_id)
+        self.fetches = 0
+
+    def read_history_id(self) -> str:
+        if isinstance(self.history_id, Exception):
+            raise self.history_id
+        return self.history_id
+
+    def fetch(self):
+        self.fetches += 1
+        return f'result {self.fetches}'
+
+    def test_fresh_entry_is_served_without_any_call(self):
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 1')
+        self.clock.now += 1
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 1')
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_stale_entry_is_revalidated_against_the_history_id(self):
+        self.cache.get_or_fetch('q', self.fetch)
+        self.clock.now += 5
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 1')
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+        self.history_id = '101'
+        self.clock.now += 5
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 2')
+        self.assertEqual(self.cache.stats()['invalidated'], 1)
+
+    def test_failed_revalidation_falls_back_to_a_fetch(self):
+        self.cache.get_or_fetch('q', self.fetch)
+        self.clock.now += 5
+        self.history_id = RuntimeError('getProfile failed')
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 2')
+        self.assertEqual(self.cache.stats()['revalidated'], 0)
+
+        # The entry is kept, and revalidated once the mailbox can be read again
+        self.history_id = '100'
+        self.clock.now += 5
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 1')
+        self.assertEqual(self.cache.stats()['revalidated'], 1)
+
+    def test_entry_expires_after_the_ttl(self):
+        self.cache.get_or_fetch('q', self.fetch)
+        self.clock.now += 61
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 2')
+        self.assertEqual(self.cache.stats()['revalidated'], 0)
+
+    def test_uncacheable_results_and_errors_are_not_kept(self):
+        self.cache.get_or_fetch('q', self.fetch, cacheable=lambda value: False)
+        self.assertEqual(self.cache.get_or_fetch('q', self.fetch), 'result 2')
+
+        def fail():
+            raise RuntimeError('quota')
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_fetch('other', fail)
+        self.assertEqual(self.cache.stats()['entries'], 1)
+
+    def test_concurrent_identical_calls_share_one_fetch(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_fetch():
+            started.set()
+            release.wait(5)
+            return self.fetch()
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            owner = pool.submit(self.cache.get_or_fetch, 'q', slow_fetch)
+            started.wait(5)
+            waiters = [pool.submit(self.cache.get_or_fetch, 'q', slow_fetch) for _ in range(3)]
+            while self.cache.stats()['coalesced'] < 3:
+                time.sleep(0.001)
+            release.set()
+            results = [owner.result(5)] + [waiter.result(5) for waiter in waiters]
+
+        self.assertEqual(results, ['result 1'] * 4)
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_waiters_get_the_owner_exception(self):
+        started, release = threading.Event(), threading.Event()
+
+        def failing_fetch():
+            started.set()
+            release.wait(5)
+            raise RuntimeError('quota')
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            owner = pool.submit(self.cache.get_or_fetch, 'q', failing_fetch)
+            started.wait(5)
+            waiter = pool.submit(self.cache.get_or_fetch, 'q', failing_fetch)
+            while self.cache.stats()['coalesced'] < 1:
+                time.sleep(0.001)
+            release.set()
+            for future in (owner, waiter):
+                with self.assertRaises(RuntimeError):
+                    future.result(5)
+
+
+if __name__ == '__main__':
+    unittest.main()
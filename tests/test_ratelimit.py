@@ -0,0 +1,139 @@
+"""Tests for quota metering, adaptive concurrency and retries."""
+import json
+import threading
+import unittest
+from unittest import mock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from gmail_extractor import ratelimit
+from gmail_extractor.ratelimit import AIMDLimiter, GmailScheduler, TokenBucket, is_retryable, is_throttled
+
+
+def http_error(status: int, reason: str = '') -> HttpError:
+    content = json.dumps({'error': {'code': status, 'errors': [{'reason': reason}] if reason else []}})
+    return HttpError(httplib2.Response({'status': status}), content.encode('utf-8'))
+
+
+class Clock:
+    """A monotonic clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        # Rates below are powers of two, so every wait is exact in floating point
+        self.clock = Clock()
+        patcher = mock.patch.object(ratelimit, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_a_full_burst_is_available_then_callers_wait_for_refill(self):
+        bucket = TokenBucket(rate=128)
+        bucket.acquire(128)
+        self.assertEqual(self.clock.slept, [])
+        bucket.acquire(32)
+        self.assertEqual(self.clock.slept, [0.25])
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(rate=128, capacity=64)
+        self.clock.now += 60
+        bucket.acquire(64)
+        bucket.acquire(16)
+        self.assertEqual(self.clock.slept, [0.125])
+
+    def test_charges_larger_than_a_burst_are_taken_in_slices(self):
+        bucket = TokenBucket(rate=128)
+        bucket.acquire(320)
+        self.assertEqual(self.clock.slept, [1.0, 0.5])
+
+
+class AIMDLimiterTest(unittest.TestCase):
+
+    def test_throttling_halves_the_limit_down_to_the_minimum(self):
+        limiter = AIMDLimiter(initial=10, minimum=2)
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 5)
+        for _ in range(3):
+            limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+
+    def test_a_window_of_successes_adds_about_one(self):
+        limiter = AIMDLimiter(initial=4, maximum=5)
+        for _ in range(4):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 4)
+        limiter.on_success()
+        self.assertEqual(limiter.limit, 5)
+        for _ in range(20):
+            limiter.on_success()
+        self.assertEqual(limiter.limit, 5)
+
+    def test_slots_beyond_the_limit_wait_for_a_release(self):
+        limiter = AIMDLimiter(initial=1)
+        entered = threading.Event()
+
+        def second():
+            with limiter.slot():
+                entered.set()
+
+        with limiter.slot():
+            thread = threading.Thread(target=second)
+            thread.start()
+            self.assertFalse(entered.wait(0.1))
+        self.assertTrue(entered.wait(5))
+        thread.join()
+
+
+class GmailSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(ratelimit, 'backoff_delay', lambda attempt, error=None: 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = GmailScheduler(units_per_second=1e6, max_retries=3)
+
+    def failing(self, *errors):
+        errors = list(errors)
+
+        def call():
+            if errors:
+                raise errors.pop(0)
+            return 'ok'
+        return call
+
+    def test_throttled_and_server_errors_are_retried(self):
+        self.assertEqual(self.scheduler.call(self.failing(http_error(429), http_error(503)), 5), 'ok')
+        self.assertEqual((self.scheduler.retries, self.scheduler.throttled), (2, 1))
+        self.assertEqual(self.scheduler.limiter.limit, 5)
+
+    def test_other_errors_are_raised_at_once(self):
+        with self.assertRaises(HttpError):
+            self.scheduler.call(self.failing(http_error(404), http_error(404)), 5)
+        self.assertEqual(self.scheduler.retries, 0)
+
+    def test_the_last_error_is_raised_once_retries_run_out(self):
+        errors = [http_error(500) for _ in range(4)]
+        with self.assertRaises(HttpError) as raised:
+            self.scheduler.call(self.failing(*errors), 5)
+        self.assertIs(raised.exception, errors[-1])
+        self.assertEqual(self.scheduler.retries, 3)
+
+    def test_rate_limit_reasons_mark_403s_as_throttling(self):
+        self.assertTrue(is_throttled(http_error(403, 'userRateLimitExceeded')))
+        self.assertFalse(is_retryable(http_error(403, 'insufficientPermissions')))
+        self.assertTrue(is_retryable(ConnectionError()))
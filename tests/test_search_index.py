@@ -0,0 +1,141 @@
+"""Tests for the Gmail query translation and the local FTS5 search index."""
+import base64
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+from gmail_extractor.search_index import SearchIndex, UnsupportedQueryError, translate_query
+
+LABEL_CLAUSE = 'EXISTS (SELECT 1 FROM json_each(message_meta.label_ids) WHERE upper(value) = upper(?))'
+
+
+def make_message(message_id: str, sender: str, subject: str, internal_date: int, label_ids: list[str],
+                 body: str | None = None, recipient: str = 'me@example.com') -> dict:
+    """A metadata-format message resource, or a full-format one when body is given."""
+    payload = {'mimeType': 'text/plain', 'headers': [
+        {'name': 'From', 'value': sender},
+        {'name': 'To', 'value': recipient},
+        {'name': 'Subject', 'value': subject},
+        {'name': 'Date', 'value': 'Mon, 1 Jan 2024 09:00:00 +0000'},
+    ]}
+    if body is not None:
+        payload['body'] = {'size': len(body), 'data': base64.urlsafe_b64encode(body.encode()).decode()}
+    return {'id': message_id, 'labelIds': label_ids, 'internalDate': str(internal_date), 'payload': payload}
+
+
+class TranslateQueryTest(unittest.TestCase):
+
+    def test_free_text_terms_are_and_ed_phrases(self):
+        self.assertEqual(translate_query('invoice paid'), ('"invoice" AND "paid"', [], '', []))
+
+    def test_field_operators_map_to_columns(self):
+        match, _, _, _ = translate_query('from:alice@example.com to:bob Subject:"quarterly report"')
+        self.assertEqual(match, 'sender : "alice@example.com" AND recipient : "bob" AND subject : "quarterly report"')
+
+    def test_apostrophes_are_letters_and_only_double_quotes_group(self):
+        match, _, _, _ = translate_query("from:o'brien don't 'two words'")
+        self.assertEqual(match, 'sender : "o\'brien" AND "don\'t" AND "\'two" AND "words\'"')
+        # An unbalanced double quote is dropped rather than failing the query
+        self.assertEqual(translate_query('"unclosed phrase')[0], '"unclosed" AND "phrase"')
+
+    def test_phrases_and_urls_with_colons_are_text(self):
+        self.assertEqual(translate_query('"re: meeting"')[0], '"re: meeting"')
+        self.assertEqual(translate_query('http://example.com/a')[0], '"http://example.com/a"')
+
+    def test_negated_terms_are_excluded_separately(self):
+        match, negated, _, _ = translate_query('invoice -newsletter -from:carol')
+        self.assertEqual(match, '"invoice"')
+        self.assertEqual(negated, ['"newsletter"', 'sender : "carol"'])
+
+    def test_or_joins_the_neighbouring_terms(self):
+        self.assertEqual(translate_query('a OR b c')[0], '("a" OR "b") AND "c"')
+        # A leading OR has nothing to join
+        self.assertEqual(translate_query('OR a')[0], '"a"')
+
+    def test_label_and_is_filter_on_label_ids(self):
+        with mock.patch('gmail_extractor.search_index.get_label_cache') as get_label_cache:
+            get_label_cache.return_value.cached_id.side_effect = {'Work': 'Label_7'}.get
+            _, _, where, params = translate_query('label:Work is:unread -label:INBOX is:read', account='work')
+        get_label_cache.assert_called_with('work')
+        self.assertEqual(where, ' AND '.join([LABEL_CLAUSE, LABEL_CLAUSE, f'NOT {LABEL_CLAUSE}', f'NOT {LABEL_CLAUSE}']))
+        self.assertEqual(params, ['Label_7', 'UNREAD', 'INBOX', 'UNREAD'])
+
+    def test_or_next_to_a_filter_or_negation_is_unsupported(self):
+        for query in ('label:INBOX OR invoice', 'invoice OR is:unread', 'after:2024/01/01 OR invoice',
+                      'invoice OR -newsletter', '-newsletter OR invoice'):
+            with self.subTest(query=query), self.assertRaises(UnsupportedQueryError):
+                translate_query(query)
+
+    def test_unknown_user_label_is_unsupported(self):
+        with mock.patch('gmail_extractor.search_index.get_label_cache') as get_label_cache:
+            get_label_cache.return_value.cached_id.return_value = None
+            with self.assertRaises(UnsupportedQueryError):
+                translate_query('label:Work')
+            # System label and category IDs are their names in every mailbox
+            _, _, _, params = translate_query('label:inbox label:CATEGORY_PROMOTIONS')
+        self.assertEqual(params, ['inbox', 'CATEGORY_PROMOTIONS'])
+
+    def test_date_operators(self):
+        _, _, where, params = translate_query('after:2024/01/02 before:1700000000')
+        self.assertEqual(where, 'internal_date >= ? AND internal_date < ?')
+        self.assertEqual(params, [int(datetime(2024, 1, 2).timestamp() * 1000), 1700000000000])
+
+        before = time.time()
+        _, _, where, params = translate_query('newer_than:7d')
+        self.assertEqual(where, 'internal_date >= ?')
+        self.assertAlmostEqual(params[0] / 1000, before - 7 * 86400, delta=5)
+
+    def test_unsupported_operators_raise(self):
+        for query in ('has:attachment', 'is:spam', 'newer_than:7w', 'larger:5M'):
+            with self.subTest(query=query), self.assertRaises(UnsupportedQueryError):
+                translate_query(query)
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.index = SearchIndex(Path(self.work_dir.name) / 'search.sqlite3')
+        self.index.add_messages([
+            make_message('m1', 'Alice <alice@example.com>', 'Quarterly report', 3000, ['INBOX', 'UNREAD'],
+                         body='Numbers for the quarter are attached.'),
+            make_message('m2', 'Bob <bob@example.com>', 'Weekly newsletter', 2000, ['INBOX']),
+            make_message('m3', 'Alice <alice@example.com>', 'Lunch?', 1000, ['Label_7']),
+        ])
+
+    def tearDown(self):
+        self.index._db.close()
+        self.work_dir.cleanup()
+
+    def ids(self, query: str) -> list[str]:
+        return [result['id'] for result in self.index.search(query)]
+
+    def test_results_are_newest_first(self):
+        self.assertEqual(self.ids('from:alice'), ['m1', 'm3'])
+        self.assertEqual(self.ids(''), ['m1', 'm2', 'm3'])
+
+    def test_body_subject_negation_and_labels(self):
+        self.assertEqual(self.ids('quarter'), ['m1'])
+        self.assertEqual(self.ids('subject:"quarterly report"'), ['m1'])
+        self.assertEqual(self.ids('from:alice -lunch'), ['m1'])
+        self.assertEqual(self.ids('is:unread'), ['m1'])
+        self.assertEqual(self.ids('is:read label:inbox'), ['m2'])
+        self.assertEqual(self.ids('newsletter OR lunch'), ['m2', 'm3'])
+
+    def test_metadata_update_keeps_the_indexed_body(self):
+        self.index.add_messages([make_message('m1', 'Alice <alice@example.com>', 'Quarterly report', 3000, ['INBOX'])])
+        self.assertEqual(self.ids('quarter'), ['m1'])
+        self.assertEqual(self.ids('is:unread'), [])
+
+    def test_remove_and_set_labels(self):
+        self.index.remove(['m2'])
+        self.index.set_labels('m3', ['UNREAD'])
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.ids('is:unread'), ['m1', 'm3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
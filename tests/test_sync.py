@@ -0,0 +1,73 @@
+"""Tests for the incremental mailbox sync against the fake Gmail API."""
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from gmail_extractor import search_index
+from gmail_extractor.search_index import SearchIndex
+from gmail_extractor.sync import MailboxMirror, sync_mailbox
+from tests.fake_service import start_fake
+
+
+class SyncMailboxTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = Path(work_dir.name)
+        self.mirror = MailboxMirror(self.work_dir / 'mirror.sqlite3')
+        self.index = SearchIndex(self.work_dir / 'search.sqlite3')
+        self.work_index = SearchIndex(self.work_dir / 'work-search.sqlite3', 'work')
+        for store in (self.mirror, self.index, self.work_index):
+            self.addCleanup(store._db.close)
+        for patcher in (mock.patch.object(search_index, '_index', self.index),
+                        mock.patch.dict(search_index._account_indexes, {'work': self.work_index})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def indexed_ids(index: SearchIndex) -> set[str]:
+        return {row[0] for row in index._db.execute('SELECT id FROM message_meta')}
+
+    def test_history_is_replayed_incrementally(self):
+        api, service = start_fake(self, message_count=20)
+        self.assertEqual(sync_mailbox(service, self.mirror)['mode'], 'full')
+
+        added = api.add_message()
+        removed = api.messages[-1]['id']
+        api.delete_message(removed)
+        relabeled = api.messages[1]['id']
+        api.modify_labels(relabeled, add=['STARRED'])
+
+        result = sync_mailbox(service, self.mirror)
+        self.assertEqual((result['mode'], result['added'], result['deleted'], result['labels_changed']),
+                         ('incremental', 1, 1, 1))
+        self.assertEqual(self.mirror.message_ids(), set(api.by_id))
+        self.assertEqual(self.indexed_ids(self.index), set(api.by_id))
+        self.assertIn(added['id'], self.indexed_ids(self.index))
+        self.assertEqual([message['id'] for message in self.index.search('is:starred')], [relabeled])
+
+    def test_expired_history_falls_back_to_a_full_resync(self):
+        api, service = start_fake(self, message_count=20)
+        sync_mailbox(service, self.mirror)
+
+        api.add_message()
+        removed = api.messages[-1]['id']
+        api.delete_message(removed)
+        api.expire_history()
+
+        result = sync_mailbox(service, self.mirror)
+        self.assertEqual((result['mode'], result['added'], result['deleted']), ('full', 1, 1))
+        self.assertEqual(result['history_id'], str(api.history_id))
+        self.assertEqual(self.mirror.message_ids(), set(api.by_id))
+        self.assertNotIn(removed, self.indexed_ids(self.index))
+
+    def test_named_account_syncs_into_its_own_index(self):
+        api, service = start_fake(self, account='work', message_count=10)
+        sync_mailbox(service, self.mirror)
+        api.delete_message(api.messages[0]['id'])
+        sync_mailbox(service, self.mirror)
+
+        self.assertEqual(self.indexed_ids(self.work_index), set(api.by_id))
+        self.assertEqual(self.indexed_ids(self.index), set())
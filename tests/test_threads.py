@@ -0,0 +1,44 @@
+"""Tests for collapsing quoted replies in a thread."""
+import unittest
+
+from gmail_extractor.threads import _normalize, collapse_quoted
+
+FIRST = 'Hi team,\nThe report is ready.\nSee the numbers below.\nThanks, Alice'
+QUOTED = '\n'.join('> ' + line for line in FIRST.split('\n'))
+
+
+class CollapseQuotedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.earlier = {_normalize(line) for line in FIRST.split('\n')}
+
+    def test_attributed_quote_of_earlier_message_is_collapsed(self):
+        for attribution in ('On Mon, 1 Jan 2024 at 09:00, Alice <alice@example.com> wrote:',
+                            'On Mon, 1 Jan 2024 at 09:00, Alice <alice@example.com>\nwrote:',
+                            '-----Original Message-----'):
+            with self.subTest(attribution=attribution):
+                reply = f'Looks good.\n\n{attribution}\n{QUOTED}'
+                count = len(attribution.split('\n')) + 4
+                self.assertEqual(collapse_quoted(reply, self.earlier),
+                                 (f'Looks good.\n\n[{count} quoted lines from earlier in the thread collapsed]', count))
+
+    def test_quote_of_new_text_is_kept(self):
+        reply = 'On Mon, Alice wrote:\n> something new\n> other new'
+        self.assertEqual(collapse_quoted(reply, self.earlier), (reply, 0))
+
+    def test_inline_quote_runs_are_collapsed_only_when_seen(self):
+        reply = 'Inline:\n> The report is ready.\n>> See the numbers below.\nAgreed.\n> brand new\n> also new'
+        self.assertEqual(collapse_quoted(reply, self.earlier),
+                         ('Inline:\n[2 quoted lines collapsed]\nAgreed.\n> brand new\n> also new', 2))
+
+    def test_mostly_seen_run_is_collapsed(self):
+        # Four of five lines seen meets the 0.8 ratio; blank quoted lines are not counted
+        reply = QUOTED + '\n>\n> one new line'
+        self.assertEqual(collapse_quoted(reply, self.earlier), ('[6 quoted lines collapsed]', 6))
+
+    def test_text_without_quotes_is_unchanged(self):
+        self.assertEqual(collapse_quoted('No quotes here\n', self.earlier), ('No quotes here', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()